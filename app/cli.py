@@ -0,0 +1,482 @@
+# app/cli.py
+"""
+Batch screener: score a directory or ZIP archive of resumes against one
+or more JDs, offline.
+
+Files stream through a process pool running the same extraction and
+parsing as /upload (app.pipeline.extract_and_parse); finished files are
+scored in batches with app.jd_match.score_grid (every JD against every
+resume in a batch in a few matrix products) and written to the output
+as each batch completes:
+
+    *.db / *.sqlite   SQLite table "screening" (one transaction per batch)
+    *.csv             appended and fsynced per batch, with a .checkpoint
+                      sidecar recording the byte offset after every batch
+    *.parquet         a directory with one part file per batch, each
+                      written to a temporary name and renamed into place
+
+Each output doubles as the checkpoint: rerunning the same command after
+a crash (or Ctrl-C) skips the files already written, and a partly written
+CSV tail is cut off first. Files that failed extraction (status "error"
+rows) are not counted as done, so a rerun tries them again; SQLite
+replaces their rows, while CSV and Parquet append new ones, so there the
+last row for an (item_id, jd) pair is the one that counts. Progress and
+throughput go to stderr. AI feedback is off unless --feedback is given,
+so a run needs no network.
+
+    python -m app.cli resumes.zip --jd-file role.txt --out screening.csv
+    python -m app.cli ./cvs --jd-file a.txt --jd-file b.txt --out run.parquet --workers 8
+    python -m app.cli ./cvs --jd "Python data engineer ..." --out run.db --feedback
+"""
+import argparse
+import asyncio
+import csv
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Iterator, List, Optional, Set, Tuple
+
+from app.extract import pool_ocr_workers, set_ocr_workers
+from app.pipeline import content_digest, extract_and_parse
+from app.uploads import PDF_HEADER_WINDOW, UPLOAD_MAX_BYTES, sniff_kind
+from app.workers import CPU_START_METHOD, CPU_WORKERS
+
+RESUME_EXTENSIONS = (".pdf", ".docx", ".png", ".jpg", ".jpeg")
+DEFAULT_BATCH_SIZE = 64
+# files extracted ahead of scoring, per extraction worker
+READ_AHEAD_PER_WORKER = 4
+PROGRESS_SECONDS = 2.0
+
+COLUMNS = [
+    "item_id", "jd", "filename", "sha256", "status", "error", "final_score", "rank_in_batch",
+    "keyword_overlap", "semantic_similarity", "skill_coverage", "experience_relevance",
+    "matched_skills", "missing_skills", "missing_nice_to_have", "experience_matches",
+    "email", "phone", "linkedin", "pages", "extract_seconds", "ai_feedback", "screened_at",
+]
+NUMERIC_COLUMNS = ("final_score", "rank_in_batch", "keyword_overlap", "semantic_similarity", "skill_coverage",
+                   "experience_relevance", "pages", "extract_seconds")
+# list-valued columns are stored as "; "-joined text
+LIST_SEPARATOR = "; "
+
+
+# ---------------------------------------------------------
+#  INPUT
+# ---------------------------------------------------------
+def iter_inputs(path: str, read: bool = True) -> Iterator[Tuple[str, object]]:
+    """
+    (item id, source) for every resume file: a path in a directory, or
+    the bytes of a ZIP member (None with read=False, for listing only).
+    """
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+            for name in sorted(files):
+                if not name.startswith(".") and name.lower().endswith(RESUME_EXTENSIONS):
+                    full = os.path.join(root, name)
+                    yield os.path.relpath(full, path).replace(os.sep, "/"), full
+        return
+    if not zipfile.is_zipfile(path):
+        raise ValueError(f"{path} is neither a directory nor a ZIP archive")
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            name = info.filename
+            base = name.rsplit("/", 1)[-1]
+            if info.is_dir() or name.startswith("__MACOSX/") or base.startswith(".") \
+                    or not base.lower().endswith(RESUME_EXTENSIONS):
+                continue
+            if info.file_size > UPLOAD_MAX_BYTES:
+                # checked before reading, so a huge (or zip-bomb) member is never inflated
+                yield name, ValueError(f"file is larger than {UPLOAD_MAX_BYTES} bytes")
+                continue
+            yield name, archive.read(info) if read else None
+
+
+def extract_item(item_id: str, source) -> dict:
+    """Extraction + parsing of one file (runs in a pool process); failures come back as {"error"}."""
+    try:
+        if isinstance(source, Exception):
+            raise source
+        if isinstance(source, (bytes, bytearray)):
+            head = source[:PDF_HEADER_WINDOW]
+        else:
+            if os.path.getsize(source) > UPLOAD_MAX_BYTES:
+                raise ValueError(f"file is larger than {UPLOAD_MAX_BYTES} bytes")
+            with open(source, "rb") as f:
+                head = f.read(PDF_HEADER_WINDOW)
+        kind = sniff_kind(head)
+        if kind is None:
+            raise ValueError("not a PDF, DOCX or PNG/JPEG image")
+        filename = item_id.rsplit("/", 1)[-1]
+        parsed = extract_and_parse(source, filename, None, kind)
+        if not parsed["text"].strip():
+            raise ValueError("no text could be extracted")
+        parsed.pop("timings", None)
+        return {"item_id": item_id, "filename": filename, "sha256": content_digest(source), **parsed}
+    except Exception as e:
+        return {"item_id": item_id, "filename": item_id.rsplit("/", 1)[-1], "error": str(e) or type(e).__name__}
+
+
+# ---------------------------------------------------------
+#  OUTPUT (each writer is its own checkpoint)
+# ---------------------------------------------------------
+def _cell(value):
+    if isinstance(value, (list, tuple)):
+        return LIST_SEPARATOR.join(str(v) for v in value)
+    return value
+
+
+class SQLiteOutput:
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path)
+        columns = ", ".join(f"{c} {'REAL' if c in NUMERIC_COLUMNS else 'TEXT'}" for c in COLUMNS)
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS screening ({columns}, PRIMARY KEY (item_id, jd))")
+        self.conn.commit()
+
+    def done(self) -> Tuple[Set[str], Set[str]]:
+        rows = self.conn.execute("SELECT DISTINCT item_id, jd, status FROM screening").fetchall()
+        return {r[0] for r in rows if r[2] != "error"}, {r[1] for r in rows}
+
+    def write(self, rows: List[dict]):
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        with self.conn:
+            # OR REPLACE: a batch retried after a crash overwrites its own rows
+            self.conn.executemany(f"INSERT OR REPLACE INTO screening ({', '.join(COLUMNS)}) VALUES ({placeholders})",
+                                  [[_cell(row.get(c)) for c in COLUMNS] for row in rows])
+
+    def close(self):
+        self.conn.close()
+
+
+class CSVOutput:
+    def __init__(self, path: str):
+        self.path = path
+        self.checkpoint_path = path + ".checkpoint"
+        self._done: Set[str] = set()
+        self._jds: Set[str] = set()
+        offset = 0
+        checkpoint_end = 0
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, "rb") as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("unterminated")
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # torn last line: that batch is redone
+                    checkpoint_end += len(line)
+                    offset = entry["offset"]
+                    # batches are replayed in order: a retried file moves from errors to items
+                    self._done.difference_update(entry.get("errors", ()))
+                    self._done.update(entry["items"])
+                    self._jds.update(entry["jds"])
+        elif os.path.exists(path) and os.path.getsize(path):
+            raise ValueError(f"{path} exists but has no checkpoint; remove it or pick another --out")
+        self.file = open(path, "a+", newline="", encoding="utf-8")
+        # drop rows written after the last checkpoint (the batch that was in flight at the crash)
+        self.file.truncate(offset)
+        self.file.seek(offset)
+        self.writer = csv.DictWriter(self.file, fieldnames=COLUMNS)
+        if offset == 0:
+            self.writer.writeheader()
+        self.checkpoint = open(self.checkpoint_path, "a", encoding="utf-8")
+        # and the torn checkpoint line, so the next entry starts on a line of its own
+        self.checkpoint.truncate(checkpoint_end)
+
+    def done(self) -> Tuple[Set[str], Set[str]]:
+        return set(self._done), set(self._jds)
+
+    def write(self, rows: List[dict]):
+        self.writer.writerows({c: _cell(row.get(c)) for c in COLUMNS} for row in rows)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        items = sorted({row["item_id"] for row in rows if row.get("status") != "error"})
+        errors = sorted({row["item_id"] for row in rows if row.get("status") == "error"})
+        jds = sorted({row["jd"] for row in rows})
+        self.checkpoint.write(json.dumps({"offset": self.file.tell(), "items": items, "errors": errors,
+                                          "jds": jds}) + "\n")
+        self.checkpoint.flush()
+        os.fsync(self.checkpoint.fileno())
+
+    def close(self):
+        self.file.close()
+        self.checkpoint.close()
+
+
+class ParquetOutput:
+    def __init__(self, path: str):
+        try:
+            import pyarrow  # noqa: F401
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise ValueError("Parquet output needs pyarrow (pip install pyarrow)")
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.parts = sorted(p for p in os.listdir(path) if p.startswith("part-") and p.endswith(".parquet"))
+
+    def done(self) -> Tuple[Set[str], Set[str]]:
+        import pyarrow.parquet as pq
+
+        items, jds = set(), set()
+        for part in self.parts:
+            table = pq.read_table(os.path.join(self.path, part), columns=["item_id", "jd", "status"])
+            for item_id, status in zip(table.column("item_id").to_pylist(), table.column("status").to_pylist()):
+                if status == "error":
+                    items.discard(item_id)
+                else:
+                    items.add(item_id)
+            jds.update(table.column("jd").to_pylist())
+        return items, jds
+
+    def write(self, rows: List[dict]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([(c, pa.float64() if c in NUMERIC_COLUMNS else pa.string()) for c in COLUMNS])
+        table = pa.Table.from_pylist([{c: _cell(row.get(c)) for c in COLUMNS} for row in rows], schema=schema)
+        name = f"part-{len(self.parts):05d}.parquet"
+        tmp = os.path.join(self.path, f".{name}.tmp")
+        pq.write_table(table, tmp)
+        os.replace(tmp, os.path.join(self.path, name))  # a part is either complete or absent
+        self.parts.append(name)
+
+    def close(self):
+        pass
+
+
+def open_output(path: str, fmt: Optional[str] = None):
+    fmt = fmt or {".db": "sqlite", ".sqlite": "sqlite", ".sqlite3": "sqlite", ".csv": "csv",
+                  ".parquet": "parquet"}.get(os.path.splitext(path)[1].lower())
+    if fmt == "sqlite":
+        return SQLiteOutput(path)
+    if fmt == "csv":
+        return CSVOutput(path)
+    if fmt == "parquet":
+        return ParquetOutput(path)
+    raise ValueError(f"cannot tell the output format of {path!r}; pass --format sqlite|csv|parquet")
+
+
+# ---------------------------------------------------------
+#  SCORING
+# ---------------------------------------------------------
+def _error_rows(item: dict, jd_names: List[str], now: str) -> List[dict]:
+    return [{"item_id": item["item_id"], "jd": name, "filename": item["filename"], "status": "error",
+             "error": item["error"], "screened_at": now} for name in jd_names]
+
+
+def score_batch(items: List[dict], jds: list, jd_names: List[str], jd_texts: List[str], weights=None,
+                semantic_mode: Optional[str] = None) -> List[dict]:
+    """One output row per (file, JD); files that failed extraction get error rows."""
+    from app.jd_match import score_grid
+    from app.suggestions import generate_skill_suggestions
+
+    now = datetime.utcnow().isoformat()
+    ok = [item for item in items if "error" not in item]
+    rows = [row for item in items if "error" in item for row in _error_rows(item, jd_names, now)]
+    if not ok:
+        return rows
+    grid = score_grid(jds, ok, weights=weights, semantic_mode=semantic_mode)
+    for j, (jd, name, jd_text) in enumerate(zip(jds, jd_names, jd_texts)):
+        requirements = jd.get_requirements()
+        for ranked in grid.ranked(j):
+            item = ok[ranked["index"]]
+            skills = generate_skill_suggestions(requirements, item["skills"])
+            extraction = item["extraction"]
+            rows.append({
+                "item_id": item["item_id"],
+                "jd": name,
+                "filename": item["filename"],
+                "sha256": item["sha256"],
+                "status": "ok",
+                "final_score": ranked["final_score"],
+                "rank_in_batch": ranked["rank"],
+                **ranked["breakdown"],
+                "matched_skills": skills["matched_skills"],
+                "missing_skills": skills["missing_skills"],
+                "missing_nice_to_have": skills["missing_nice_to_have"],
+                "experience_matches": ranked.get("experience_matches", []),
+                "email": item["contact"].get("email"),
+                "phone": item["contact"].get("phone"),
+                "linkedin": item["contact"].get("linkedin"),
+                "pages": extraction.get("total_pages"),
+                "extract_seconds": extraction.get("seconds"),
+                "screened_at": now,
+                # kept for the feedback prompt, not written
+                "_text": item["text"],
+                "_jd_text": jd_text,
+                "_skill_suggestions": skills,
+            })
+    return rows
+
+
+async def _add_feedback(rows: List[dict]):
+    from app.feedback import feedback_service
+    from app.suggestions import generate_text_suggestions
+
+    async def one(row: dict):
+        jd_match = {"final_score": row["final_score"],
+                    "breakdown": {k: row[k] for k in ("keyword_overlap", "semantic_similarity", "skill_coverage",
+                                                      "experience_relevance")}}
+        suggestions = {
+            "skill_suggestions": row["_skill_suggestions"],
+            "text_suggestions": generate_text_suggestions(row["final_score"], row["missing_skills"]),
+        }
+        try:
+            row["ai_feedback"] = await feedback_service.generate(row["_jd_text"], row["_text"], jd_match, suggestions)
+        except Exception as e:
+            row["ai_feedback"] = f"⚠️ Gemini feedback could not be generated: {e}"
+
+    # FeedbackService bounds concurrency and caches per prompt
+    await asyncio.gather(*(one(row) for row in rows if row["status"] == "ok"))
+
+
+# ---------------------------------------------------------
+#  RUN
+# ---------------------------------------------------------
+class Progress:
+    def __init__(self, total: int, skipped: int, stream=sys.stderr, every: float = PROGRESS_SECONDS):
+        self.total = total
+        self.skipped = skipped
+        self.stream = stream
+        self.every = every
+        self.done = 0
+        self.errors = 0
+        self.started = time.perf_counter()
+        self._last = 0.0
+        self._reported = -1
+
+    def update(self, files: int, errors: int, force: bool = False):
+        self.done += files
+        self.errors += errors
+        now = time.perf_counter()
+        if self.done == self._reported or (not force and now - self._last < self.every):
+            return
+        self._last, self._reported = now, self.done
+        elapsed = now - self.started
+        rate = self.done / elapsed if elapsed else 0.0
+        left = self.total - self.done
+        eta = f"{left / rate:.0f}s" if rate and left else "-"
+        print(f"[{self.done}/{self.total}] {rate:.1f} files/s, {self.errors} errors, "
+              f"{elapsed:.0f}s elapsed, eta {eta}", file=self.stream, flush=True)
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {"files": self.done, "errors": self.errors, "skipped": self.skipped,
+                "seconds": round(elapsed, 2), "files_per_s": round(self.done / elapsed, 2) if elapsed else 0.0}
+
+
+def _new_executor(workers: int):
+    if workers <= 0:
+        return ThreadPoolExecutor(max_workers=1)  # in-process (debugging)
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(CPU_START_METHOD),
+                               initializer=set_ocr_workers, initargs=(pool_ocr_workers(workers),))
+
+
+def screen(input_path: str, jd_texts: List[str], jd_names: List[str], out: str, fmt: Optional[str] = None,
+           workers: int = CPU_WORKERS, batch_size: int = DEFAULT_BATCH_SIZE, weights=None,
+           semantic_mode: Optional[str] = None, feedback: bool = False, progress_stream=sys.stderr) -> dict:
+    """Screen every resume under input_path (directory or ZIP) into out; returns the run summary."""
+    from app.jd_match import prepare_jd
+    from app.scoring import parse_weights
+
+    parse_weights(weights)  # bad weights fail before any work
+    output = open_output(out, fmt)
+    try:
+        done, done_jds = output.done()
+        if done_jds and done_jds != set(jd_names):
+            raise ValueError(f"{out} holds results for other JDs ({', '.join(sorted(done_jds))}); "
+                             f"pick another --out")
+        pending = [item_id for item_id, _ in iter_inputs(input_path, read=False) if item_id not in done]
+        progress = Progress(len(pending), len(done), progress_stream)
+        if done:
+            print(f"resuming: {len(done)} files already screened, {len(pending)} to go",
+                  file=progress_stream, flush=True)
+        jds = [prepare_jd(text) for text in jd_texts]
+        todo = set(pending)
+        sources = ((item_id, source) for item_id, source in iter_inputs(input_path) if item_id in todo)
+
+        executor = _new_executor(workers)
+        read_ahead = max(1, workers) * READ_AHEAD_PER_WORKER
+        in_flight, batch = set(), []
+        try:
+            while True:
+                # keep the pool fed without reading the whole archive into memory
+                while len(in_flight) < read_ahead:
+                    nxt = next(sources, None)
+                    if nxt is None:
+                        break
+                    in_flight.add(executor.submit(extract_item, *nxt))
+                if not in_flight:
+                    break
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                batch.extend(f.result() for f in finished)
+                if len(batch) >= batch_size:
+                    _flush(batch, jds, jd_names, jd_texts, output, progress, weights, semantic_mode, feedback)
+                    batch = []
+            if batch:
+                _flush(batch, jds, jd_names, jd_texts, output, progress, weights, semantic_mode, feedback)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        progress.update(0, 0, force=True)
+        return progress.summary()
+    finally:
+        output.close()
+
+
+def _flush(batch: List[dict], jds: list, jd_names: List[str], jd_texts: List[str], output, progress: Progress,
+           weights, semantic_mode: Optional[str], feedback: bool):
+    rows = score_batch(batch, jds, jd_names, jd_texts, weights, semantic_mode)
+    if feedback:
+        asyncio.run(_add_feedback(rows))
+    output.write([{k: v for k, v in row.items() if not k.startswith("_")} for row in rows])
+    progress.update(len(batch), sum(1 for item in batch if "error" in item))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Screen a directory or ZIP of resumes against one or more JDs.")
+    parser.add_argument("input", help="directory (searched recursively) or .zip archive")
+    parser.add_argument("--jd", action="append", default=[], help="JD text (repeatable)")
+    parser.add_argument("--jd-file", action="append", default=[], help="file holding one JD (repeatable)")
+    parser.add_argument("--out", required=True, help="output: .db / .sqlite, .csv or .parquet (a directory)")
+    parser.add_argument("--format", choices=("sqlite", "csv", "parquet"), default=None,
+                        help="output format (default: from the --out extension)")
+    parser.add_argument("--workers", type=int, default=CPU_WORKERS,
+                        help="extraction processes (0: extract in-process)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="files scored per batch")
+    parser.add_argument("--weights", default=None, help="weights profile or keyword=..,semantic=.. (see /score/grid)")
+    parser.add_argument("--semantic-mode", choices=("whole", "chunked"), default=None)
+    parser.add_argument("--feedback", action="store_true", help="add AI feedback per row (needs the backend)")
+    args = parser.parse_args(argv)
+
+    jd_texts = list(args.jd)
+    jd_names = [f"jd{i + 1}" for i in range(len(args.jd))]
+    for path in args.jd_file:
+        with open(path, encoding="utf-8") as f:
+            jd_texts.append(f.read())
+        jd_names.append(os.path.basename(path))
+    if not jd_texts or not all(t.strip() for t in jd_texts):
+        parser.error("at least one non-empty --jd or --jd-file is required")
+    if len(set(jd_names)) != len(jd_names):
+        parser.error("JD file names must be unique (they label the output rows)")
+    if not os.path.exists(args.input):
+        parser.error(f"{args.input} does not exist")
+
+    try:
+        summary = screen(args.input, jd_texts, jd_names, args.out, args.format, args.workers, args.batch_size,
+                         args.weights, args.semantic_mode, args.feedback)
+    except ValueError as e:
+        parser.error(str(e))
+    except KeyboardInterrupt:
+        print("interrupted: rerun the same command to continue from the last written batch", file=sys.stderr)
+        sys.exit(130)
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
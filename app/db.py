@@ -1,13 +1,189 @@
 # app/db.py
+"""
+SQLite persistence.
+
+Connections are long-lived: one per thread (and process), opened on first
+use with WAL journaling, so readers never wait for the writer and a write
+is one fsync-free commit (synchronous=NORMAL). Result rows are written by
+a single background writer that drains a queue and commits whatever has
+accumulated (up to WRITE_BATCH_SIZE rows) in one transaction; callers get
+a Future with the new row id and never wait on the disk themselves.
+
+JSON-valued columns hold real JSON (json.dumps) so they can be queried
+with SQLite's json functions; init_db migrates rows written by older
+versions (breakdown as str(dict), skills as comma-joined strings).
+
+Every result insert also bumps two rollup tables in the same transaction
+(per day and JD: score histogram buckets, and missing / matched skill
+counts), so dashboard aggregates read a few hundred rollup rows instead of
+scanning results.
+"""
+import ast
+import hashlib
+import json
+import os
+import queue
 import sqlite3
-from datetime import datetime
-from typing import Optional
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from typing import Callable, Optional
 
 DB_PATH = "resume_results.db"
 
+# Extraction cache bounds (rows / total stored text characters)
+EXTRACTION_CACHE_MAX_ITEMS = int(os.getenv("EXTRACTION_CACHE_MAX_ITEMS", "5000"))
+EXTRACTION_CACHE_MAX_CHARS = int(os.getenv("EXTRACTION_CACHE_MAX_CHARS", str(200 * 1024 * 1024)))
+# cache hits are counted in memory and written (last_access, hits) by the background writer in batches
+EXTRACTION_HIT_FLUSH_ITEMS = int(os.getenv("EXTRACTION_HIT_FLUSH_ITEMS", "100"))
+EXTRACTION_HIT_FLUSH_SECONDS = float(os.getenv("EXTRACTION_HIT_FLUSH_SECONDS", "30"))
+
+# Background writer: rows per transaction, and how long to wait for more rows to batch with
+WRITE_BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", "500"))
+WRITE_BATCH_WAIT_SECONDS = float(os.getenv("DB_WRITE_BATCH_WAIT_MS", "5")) / 1000
+WRITE_QUEUE_SIZE = int(os.getenv("DB_WRITE_QUEUE_SIZE", "50000"))
+BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "30000"))
+
+# PRAGMA user_version after all migrations in init_db
+SCHEMA_VERSION = 2
+
+# Score histogram rollups are kept at this resolution (scores are 0-100);
+# coarser histograms are merged from it
+ROLLUP_BUCKET_WIDTH = 5
+ROLLUP_BUCKETS = 100 // ROLLUP_BUCKET_WIDTH
+
+# ---------------------------------------------------------
+#  CONNECTIONS (one per thread, WAL)
+# ---------------------------------------------------------
+_local = threading.local()
+
+def _open(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    return conn
+
+def get_connection(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """This thread's connection to db_path (opened once, reused for every call)."""
+    path = db_path or DB_PATH
+    conns = getattr(_local, "conns", None)
+    # a forked child must not reuse its parent's connections
+    if conns is None or _local.pid != os.getpid():
+        conns = _local.conns = {}
+        _local.pid = os.getpid()
+    conn = conns.get(path)
+    if conn is None:
+        conn = conns[path] = _open(path)
+    return conn
+
+def close_connection(db_path: Optional[str] = None):
+    """Close this thread's connection (e.g. before deleting the database file)."""
+    conns = getattr(_local, "conns", None) or {}
+    conn = conns.pop(db_path or DB_PATH, None)
+    if conn is not None:
+        conn.close()
+
+# ---------------------------------------------------------
+#  BATCHED BACKGROUND WRITER
+# ---------------------------------------------------------
+class BatchWriter:
+    """
+    Single writer thread. submit(fn, *args) queues fn(conn, *args); queued
+    tasks are run back to back inside one transaction (each under its own
+    savepoint, so one failing row does not undo the rest) and the returned
+    Future resolves once that transaction has committed.
+    """
+    def __init__(self, db_path: Optional[str] = None, batch_size: int = WRITE_BATCH_SIZE,
+                 batch_wait: float = WRITE_BATCH_WAIT_SECONDS, max_queue: int = WRITE_QUEUE_SIZE):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                    self._thread.start()
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """
+        Queue a write; blocks only if WRITE_QUEUE_SIZE writes are already
+        waiting (so async code calls it through asyncio.to_thread).
+        """
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((fn, args, future))
+        return future
+
+    def flush(self, timeout: Optional[float] = None):
+        """Wait until everything queued so far is committed."""
+        self.submit(lambda conn: None).result(timeout)
+
+    def _take_batch(self) -> list:
+        batch = [self._queue.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get(timeout=self.batch_wait))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        conn = _open(self.db_path or DB_PATH)
+        while True:
+            batch = self._take_batch()
+            results = []
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for fn, args, future in batch:
+                    conn.execute("SAVEPOINT row")
+                    try:
+                        results.append((future, fn(conn, *args), None))
+                        conn.execute("RELEASE row")
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO row")
+                        conn.execute("RELEASE row")
+                        results.append((future, None, e))
+                conn.commit()
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                results = [(future, None, e) for _, _, future in batch]
+            self.batches += 1
+            for future, value, error in results:
+                if error is None:
+                    self.written += 1
+                    future.set_result(value)
+                else:
+                    self.failed += 1
+                    future.set_exception(error)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+            "avg_batch": round(self.written / self.batches, 2) if self.batches else 0.0,
+        }
+
+writer = BatchWriter()
+
+# ---------------------------------------------------------
+#  SCHEMA / MIGRATIONS
+# ---------------------------------------------------------
 def init_db(db_path: Optional[str] = None):
     path = db_path or DB_PATH
-    conn = sqlite3.connect(path)
+    conn = get_connection(path)
     c = conn.cursor()
     c.execute("""
         CREATE TABLE IF NOT EXISTS results (
@@ -19,48 +195,910 @@ def init_db(db_path: Optional[str] = None):
             breakdown TEXT,
             missing_skills TEXT,
             matched_skills TEXT,
-            ai_feedback TEXT
+            ai_feedback TEXT,
+            jd_hash TEXT
+        )
+    """)
+    if "jd_hash" not in {row[1] for row in c.execute("PRAGMA table_info(results)")}:
+        c.execute("ALTER TABLE results ADD COLUMN jd_hash TEXT")
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS extraction_cache (
+            sha256 TEXT PRIMARY KEY,
+            version TEXT,
+            text TEXT,
+            sections TEXT,
+            contact TEXT,
+            skills TEXT,
+            extraction TEXT,
+            text_chars INTEGER,
+            created_at TEXT,
+            last_access TEXT,
+            hits INTEGER DEFAULT 0
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_results_timestamp ON results(timestamp)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_results_filename ON results(filename)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_results_ats_score ON results(ats_score)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_results_jd_hash ON results(jd_hash, id)")
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_scores (
+            day TEXT,
+            jd_hash TEXT,
+            bucket INTEGER,
+            count INTEGER,
+            score_sum REAL,
+            PRIMARY KEY (day, jd_hash, bucket)
+        ) WITHOUT ROWID
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_skills (
+            day TEXT,
+            jd_hash TEXT,
+            kind TEXT,
+            skill TEXT,
+            count INTEGER,
+            PRIMARY KEY (day, jd_hash, kind, skill)
+        ) WITHOUT ROWID
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_extraction_cache_last_access ON extraction_cache(last_access)")
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS jds (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TEXT,
+            title TEXT,
+            text TEXT,
+            text_hash TEXT,
+            embedding_model TEXT,
+            embedding BLOB,
+            nouns TEXT,
+            terms TEXT,
+            skills TEXT
+        )
+    """)
+    jd_columns = {row[1] for row in c.execute("PRAGMA table_info(jds)")}
+    if "nice_skills" not in jd_columns:
+        c.execute("ALTER TABLE jds ADD COLUMN nice_skills TEXT")
+    if "features_version" not in jd_columns:
+        c.execute("ALTER TABLE jds ADD COLUMN features_version TEXT")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_jds_text_hash ON jds(text_hash)")
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS resumes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TEXT,
+            filename TEXT,
+            content_sha256 TEXT,
+            result_id INTEGER,
+            text TEXT,
+            skills TEXT,
+            embedding_model TEXT,
+            embedding BLOB
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_resumes_sha ON resumes(content_sha256)")
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            created_at TEXT,
+            updated_at TEXT,
+            status TEXT,
+            stage TEXT,
+            attempts INTEGER DEFAULT 0,
+            filename TEXT,
+            content_type TEXT,
+            file BLOB,
+            params TEXT,
+            callback_url TEXT,
+            stages TEXT,
+            result TEXT,
+            error TEXT
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs(status, created_at)")
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS feedback_cache (
+            prompt_hash TEXT PRIMARY KEY,
+            backend TEXT,
+            feedback TEXT,
+            created_at TEXT
         )
     """)
+    # lazy feedback state shared by all server processes: 'ready' rows hold the text,
+    # 'pending' / 'failed' rows mark a generation in progress / gone wrong
+    feedback_columns = {row[1] for row in c.execute("PRAGMA table_info(feedback_cache)")}
+    if "status" not in feedback_columns:
+        c.execute("ALTER TABLE feedback_cache ADD COLUMN status TEXT DEFAULT 'ready'")
+    if "error" not in feedback_columns:
+        c.execute("ALTER TABLE feedback_cache ADD COLUMN error TEXT")
     conn.commit()
-    conn.close()
+
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version < 1:
+        _migrate_results_to_json(conn)
+    if version < 2:
+        _backfill_jd_hash(conn)
+        rebuild_rollups(path)
+    if version < SCHEMA_VERSION:
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+def _legacy_breakdown(value: str):
+    try:
+        return ast.literal_eval(value) if value else {}
+    except (ValueError, SyntaxError):
+        return {"raw": value}
+
+def _legacy_skills(value: str) -> list:
+    return [s.strip() for s in (value or "").split(",") if s.strip()]
+
+def _as_json(value: Optional[str], legacy: Callable) -> Optional[str]:
+    """value itself if it is NULL or already JSON, else the legacy format converted."""
+    if value is None:
+        return None
+    try:
+        json.loads(value)
+        return value
+    except ValueError:
+        return json.dumps(legacy(value))
+
+def _migrate_results_to_json(conn, batch_size: int = 1000):
+    """Rewrite results columns stored as str(dict) / comma-joined skills as JSON (column by column)."""
+    last_id = 0
+    while True:
+        rows = conn.execute("""
+            SELECT id, breakdown, missing_skills, matched_skills FROM results
+            WHERE id > ? AND (json_valid(breakdown) = 0 OR json_valid(missing_skills) = 0
+                              OR json_valid(matched_skills) = 0)
+            ORDER BY id LIMIT ?
+        """, (last_id, batch_size)).fetchall()
+        if not rows:
+            break
+        with conn:
+            conn.executemany(
+                "UPDATE results SET breakdown = ?, missing_skills = ?, matched_skills = ? WHERE id = ?",
+                [(_as_json(b, _legacy_breakdown), _as_json(m, _legacy_skills), _as_json(k, _legacy_skills), i)
+                 for i, b, m, k in rows],
+            )
+        last_id = rows[-1][0]
+
+def _backfill_jd_hash(conn, batch_size: int = 1000):
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, jd_text FROM results WHERE id > ? AND jd_hash IS NULL ORDER BY id LIMIT ?",
+            (last_id, batch_size),
+        ).fetchall()
+        if not rows:
+            break
+        with conn:
+            conn.executemany("UPDATE results SET jd_hash = ? WHERE id = ?",
+                             [(result_jd_hash(jd), i) for i, jd in rows])
+        last_id = rows[-1][0]
+
+# ---------------------------------------------------------
+#  RESULTS
+# ---------------------------------------------------------
+_RESULT_INSERT = """
+    INSERT INTO results
+    (timestamp, filename, jd_text, ats_score, breakdown, missing_skills, matched_skills, ai_feedback, jd_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+def result_jd_hash(jd_text: Optional[str]) -> str:
+    """Key grouping results by JD (sha256 of the JD text as stored; '' when there was none)."""
+    return hashlib.sha256(jd_text.encode("utf-8")).hexdigest() if jd_text else ""
+
+def score_bucket(score: float) -> int:
+    return min(max(int((score or 0) // ROLLUP_BUCKET_WIDTH), 0), ROLLUP_BUCKETS - 1)
+
+def _result_row(filename: str, jd_text: str, ats_score: float, breakdown: dict,
+                missing_skills: list, matched_skills: list, ai_feedback: str) -> tuple:
+    return (
+        datetime.utcnow().isoformat(),
+        filename,
+        jd_text,
+        ats_score,
+        json.dumps(breakdown or {}),
+        json.dumps(list(missing_skills or [])),
+        json.dumps(list(matched_skills or [])),
+        ai_feedback or "",
+        result_jd_hash(jd_text),
+    )
+
+def _bump_rollups(conn, row: tuple):
+    timestamp, score, missing, matched, jd_hash = row[0], row[3], row[5], row[6], row[8]
+    day = timestamp[:10]
+    conn.execute("""
+        INSERT INTO rollup_scores (day, jd_hash, bucket, count, score_sum) VALUES (?, ?, ?, 1, ?)
+        ON CONFLICT (day, jd_hash, bucket) DO UPDATE SET count = count + 1, score_sum = score_sum + excluded.score_sum
+    """, (day, jd_hash, score_bucket(score), score or 0))
+    skills = [(day, jd_hash, "missing", s) for s in set(json.loads(missing))]
+    skills += [(day, jd_hash, "matched", s) for s in set(json.loads(matched))]
+    conn.executemany("""
+        INSERT INTO rollup_skills (day, jd_hash, kind, skill, count) VALUES (?, ?, ?, ?, 1)
+        ON CONFLICT (day, jd_hash, kind, skill) DO UPDATE SET count = count + 1
+    """, skills)
+
+def _insert_result(conn, row: tuple) -> int:
+    result_id = conn.execute(_RESULT_INSERT, row).lastrowid
+    _bump_rollups(conn, row)
+    return result_id
+
+def _insert_results(conn, rows: list) -> list:
+    return [_insert_result(conn, row) for row in rows]
+
+def enqueue_result(filename: str, jd_text: str, ats_score: float, breakdown: dict,
+                   missing_skills: list, matched_skills: list, ai_feedback: str) -> Future:
+    """Queue one result for the background writer; the Future resolves to its row id."""
+    row = _result_row(filename, jd_text, ats_score, breakdown, missing_skills, matched_skills, ai_feedback)
+    return writer.submit(_insert_result, row)
+
+def enqueue_results(results: list) -> Future:
+    """
+    Queue many results (dicts with save_result's keyword arguments) as one
+    write; the Future resolves to their row ids.
+    """
+    rows = [_result_row(**r) for r in results]
+    return writer.submit(_insert_results, rows)
 
 def save_result(filename: str, jd_text: str, ats_score: float, breakdown: dict,
                 missing_skills: list, matched_skills: list, ai_feedback: str,
                 db_path: Optional[str] = None):
     """
-    Save a single result. This is transactional; it commits only if insert succeeds.
+    Save a single result and return its id. Goes through the batched
+    writer (so it shares a transaction with concurrent saves) unless a
+    different db_path is given.
+    """
+    row = _result_row(filename, jd_text, ats_score, breakdown, missing_skills, matched_skills, ai_feedback)
+    if db_path and db_path != DB_PATH:
+        conn = get_connection(db_path)
+        with conn:
+            return _insert_result(conn, row)
+    return writer.submit(_insert_result, row).result()
+
+def fetch_recent(limit: int = 100, db_path: Optional[str] = None):
+    conn = get_connection(db_path)
+    rows = conn.execute(
+        "SELECT id, timestamp, filename, ats_score, missing_skills, matched_skills FROM results "
+        "ORDER BY id DESC LIMIT ?", (limit,)
+    ).fetchall()
+    return [(i, ts, fn, score, json.loads(missing or "[]"), json.loads(matched or "[]"))
+            for i, ts, fn, score, missing, matched in rows]
+
+# ---------------------------------------------------------
+#  ANALYTICS (filtered listing + rollup aggregates)
+# ---------------------------------------------------------
+def _day_after(day: str) -> str:
+    return (datetime.strptime(day, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+
+def _is_day(value: Optional[str]) -> bool:
+    return value is None or len(value) == 10
+
+def _result_filters(date_from: Optional[str] = None, date_to: Optional[str] = None,
+                    min_score: Optional[float] = None, max_score: Optional[float] = None,
+                    jd_hash: Optional[str] = None, filename: Optional[str] = None) -> tuple:
+    """WHERE clause over results. Dates are ISO strings; a plain YYYY-MM-DD date_to includes that whole day."""
+    clauses, params = [], []
+    if date_from:
+        clauses.append("timestamp >= ?")
+        params.append(date_from)
+    if date_to:
+        if len(date_to) == 10:
+            clauses.append("timestamp < ?")
+            params.append(_day_after(date_to))
+        else:
+            clauses.append("timestamp <= ?")
+            params.append(date_to)
+    if min_score is not None:
+        clauses.append("ats_score >= ?")
+        params.append(min_score)
+    if max_score is not None:
+        clauses.append("ats_score <= ?")
+        params.append(max_score)
+    if jd_hash is not None:
+        clauses.append("jd_hash = ?")
+        params.append(jd_hash)
+    if filename:
+        clauses.append("filename = ?")
+        params.append(filename)
+    return clauses, params
+
+def _rollup_filters(date_from: Optional[str], date_to: Optional[str], jd_hash: Optional[str]) -> tuple:
+    clauses, params = [], []
+    if date_from:
+        clauses.append("day >= ?")
+        params.append(date_from)
+    if date_to:
+        clauses.append("day <= ?")
+        params.append(date_to)
+    if jd_hash is not None:
+        clauses.append("jd_hash = ?")
+        params.append(jd_hash)
+    return clauses, params
+
+def _where(clauses: list) -> str:
+    return ("WHERE " + " AND ".join(clauses)) if clauses else ""
+
+def query_results(limit: int = 50, cursor: Optional[int] = None, date_from: Optional[str] = None,
+                  date_to: Optional[str] = None, min_score: Optional[float] = None,
+                  max_score: Optional[float] = None, jd_hash: Optional[str] = None,
+                  filename: Optional[str] = None, db_path: Optional[str] = None) -> dict:
+    """
+    Newest-first page of results matching the filters. cursor is the
+    next_cursor of the previous page (an id: the page continues below it),
+    so deep pages cost the same as the first one.
+    """
+    clauses, params = _result_filters(date_from, date_to, min_score, max_score, jd_hash, filename)
+    if cursor is not None:
+        clauses.append("id < ?")
+        params.append(cursor)
+    conn = get_connection(db_path)
+    rows = conn.execute(f"""
+        SELECT id, timestamp, filename, ats_score, breakdown, missing_skills, matched_skills, jd_hash
+        FROM results {_where(clauses)} ORDER BY id DESC LIMIT ?
+    """, params + [limit + 1]).fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    items = [{
+        "id": r[0],
+        "timestamp": r[1],
+        "filename": r[2],
+        "ats_score": r[3],
+        "breakdown": json.loads(r[4] or "{}"),
+        "missing_skills": json.loads(r[5] or "[]"),
+        "matched_skills": json.loads(r[6] or "[]"),
+        "jd_hash": r[7],
+    } for r in rows]
+    return {"items": items, "next_cursor": items[-1]["id"] if more else None}
+
+def score_histogram(bucket_width: int = 10, date_from: Optional[str] = None, date_to: Optional[str] = None,
+                    min_score: Optional[float] = None, max_score: Optional[float] = None,
+                    jd_hash: Optional[str] = None, db_path: Optional[str] = None) -> dict:
+    """
+    Count / mean score per score bucket of bucket_width points. Served from
+    rollup_scores when the filters line up with it (whole days, a multiple
+    of ROLLUP_BUCKET_WIDTH and score bounds on bucket edges); otherwise
+    from an indexed scan of results.
+    """
+    conn = get_connection(db_path)
+    aligned = (
+        bucket_width % ROLLUP_BUCKET_WIDTH == 0
+        and _is_day(date_from) and _is_day(date_to)
+        and (min_score is None or min_score % ROLLUP_BUCKET_WIDTH == 0)
+        and (max_score is None or max_score >= 100)
+    )
+    if aligned:
+        clauses, params = _rollup_filters(date_from, date_to, jd_hash)
+        if min_score is not None:
+            clauses.append("bucket >= ?")
+            params.append(int(min_score // ROLLUP_BUCKET_WIDTH))
+        rows = conn.execute(f"""
+            SELECT bucket * {ROLLUP_BUCKET_WIDTH} / ? AS b, SUM(count), SUM(score_sum)
+            FROM rollup_scores {_where(clauses)} GROUP BY b ORDER BY b
+        """, [bucket_width] + params).fetchall()
+    else:
+        clauses, params = _result_filters(date_from, date_to, min_score, max_score, jd_hash)
+        rows = conn.execute(f"""
+            SELECT MAX(0, MIN(CAST(ats_score / ? AS INTEGER), ?)) AS b, COUNT(*), SUM(ats_score)
+            FROM results {_where(clauses)} GROUP BY b ORDER BY b
+        """, [bucket_width, (100 - 1) // bucket_width] + params).fetchall()
+    buckets = [{
+        "from": b * bucket_width,
+        "to": min((b + 1) * bucket_width, 100),
+        "count": count,
+        "mean_score": round(total / count, 2) if count else None,
+    } for b, count, total in rows]
+    return {
+        "bucket_width": bucket_width,
+        "total": sum(b["count"] for b in buckets),
+        "buckets": buckets,
+        "source": "rollup" if aligned else "scan",
+    }
+
+def top_skills(kind: str = "missing", limit: int = 20, date_from: Optional[str] = None,
+               date_to: Optional[str] = None, min_score: Optional[float] = None,
+               max_score: Optional[float] = None, jd_hash: Optional[str] = None,
+               db_path: Optional[str] = None) -> dict:
     """
+    Most frequent missing or matched skills (share = fraction of results
+    listing the skill). Served from rollup_skills unless a score range or
+    a sub-day date bound is given.
+    """
+    if kind not in ("missing", "matched"):
+        raise ValueError("kind must be 'missing' or 'matched'")
+    conn = get_connection(db_path)
+    aligned = min_score is None and max_score is None and _is_day(date_from) and _is_day(date_to)
+    if aligned:
+        clauses, params = _rollup_filters(date_from, date_to, jd_hash)
+        rows = conn.execute(f"""
+            SELECT skill, SUM(count) AS n FROM rollup_skills {_where(clauses + ["kind = ?"])}
+            GROUP BY skill ORDER BY n DESC, skill LIMIT ?
+        """, params + [kind, limit]).fetchall()
+        total = conn.execute(f"SELECT COALESCE(SUM(count), 0) FROM rollup_scores {_where(clauses)}",
+                             params).fetchone()[0]
+    else:
+        clauses, params = _result_filters(date_from, date_to, min_score, max_score, jd_hash)
+        column = f"{kind}_skills"
+        rows = conn.execute(f"""
+            SELECT s.value AS skill, COUNT(DISTINCT results.id) AS n
+            FROM results, json_each(results.{column}) AS s {_where(clauses)}
+            GROUP BY skill ORDER BY n DESC, skill LIMIT ?
+        """, params + [limit]).fetchall()
+        total = conn.execute(f"SELECT COUNT(*) FROM results {_where(clauses)}", params).fetchone()[0]
+    return {
+        "kind": kind,
+        "total_results": total,
+        "skills": [{"skill": s, "count": n, "share": round(n / total, 4) if total else 0.0} for s, n in rows],
+        "source": "rollup" if aligned else "scan",
+    }
+
+def rebuild_rollups(db_path: Optional[str] = None):
+    """Recompute both rollup tables from results (migration / repair)."""
+    conn = get_connection(db_path)
+    with conn:
+        conn.execute("DELETE FROM rollup_scores")
+        conn.execute("DELETE FROM rollup_skills")
+        conn.execute(f"""
+            INSERT INTO rollup_scores (day, jd_hash, bucket, count, score_sum)
+            SELECT substr(timestamp, 1, 10), COALESCE(jd_hash, ''),
+                   MIN(MAX(CAST(COALESCE(ats_score, 0) / {ROLLUP_BUCKET_WIDTH} AS INTEGER), 0), {ROLLUP_BUCKETS - 1}),
+                   COUNT(*), SUM(COALESCE(ats_score, 0))
+            FROM results GROUP BY 1, 2, 3
+        """)
+        for kind in ("missing", "matched"):
+            conn.execute(f"""
+                INSERT INTO rollup_skills (day, jd_hash, kind, skill, count)
+                SELECT substr(timestamp, 1, 10), COALESCE(jd_hash, ''), '{kind}', s.value, COUNT(DISTINCT results.id)
+                FROM results, json_each(results.{kind}_skills) AS s
+                WHERE json_valid(results.{kind}_skills)
+                GROUP BY 1, 2, 4
+            """)
+
+# ---------------------------------------------------------
+#  EXTRACTION CACHE (keyed by sha256 of the uploaded bytes)
+# ---------------------------------------------------------
+_extraction_hits: dict = {}          # db path -> {sha256: [last_access, hits]}
+_extraction_hits_lock = threading.Lock()
+_extraction_hits_flushed = time.monotonic()
+
+def _apply_extraction_hits(conn, hits: dict):
+    conn.executemany("UPDATE extraction_cache SET last_access = ?, hits = hits + ? WHERE sha256 = ?",
+                     [(last_access, n, sha) for sha, (last_access, n) in hits.items()])
+
+def flush_extraction_hits():
+    """Write the pending cache-hit bookkeeping (through the background writer for the main database)."""
+    global _extraction_hits, _extraction_hits_flushed
+    with _extraction_hits_lock:
+        pending, _extraction_hits = _extraction_hits, {}
+        _extraction_hits_flushed = time.monotonic()
+    for path, hits in pending.items():
+        if path == (writer.db_path or DB_PATH):
+            writer.submit(_apply_extraction_hits, hits)
+        else:
+            conn = get_connection(path)
+            with conn:
+                _apply_extraction_hits(conn, hits)
+
+def _record_extraction_hit(path: str, sha256: str):
+    with _extraction_hits_lock:
+        hits = _extraction_hits.setdefault(path, {})
+        entry = hits.setdefault(sha256, [None, 0])
+        entry[0] = datetime.utcnow().isoformat()
+        entry[1] += 1
+        due = (sum(len(h) for h in _extraction_hits.values()) >= EXTRACTION_HIT_FLUSH_ITEMS
+               or time.monotonic() - _extraction_hits_flushed >= EXTRACTION_HIT_FLUSH_SECONDS)
+    if due:
+        flush_extraction_hits()
+
+def get_cached_extraction(sha256: str, version: str, db_path: Optional[str] = None) -> Optional[dict]:
+    """Return the cached extract/parse output for these bytes, or None on a miss."""
     path = db_path or DB_PATH
-    conn = sqlite3.connect(path)
-    try:
+    conn = get_connection(path)
+    row = conn.execute("""
+        SELECT text, sections, contact, skills, extraction FROM extraction_cache
+        WHERE sha256 = ? AND version = ?
+    """, (sha256, version)).fetchone()
+    if row is None:
+        return None
+    # read-only here: the LRU bookkeeping is batched (see flush_extraction_hits)
+    _record_extraction_hit(path, sha256)
+    return {
+        "text": row[0],
+        "sections": json.loads(row[1]),
+        "contact": json.loads(row[2]),
+        "skills": json.loads(row[3]),
+        "extraction": json.loads(row[4]),
+    }
+
+def save_cached_extraction(sha256: str, version: str, parsed: dict, db_path: Optional[str] = None):
+    """Store an extract/parse result and evict least recently used rows past the size bounds."""
+    path = db_path or DB_PATH
+    now = datetime.utcnow().isoformat()
+    text = parsed.get("text") or ""
+    conn = get_connection(path)
+    with conn:
+        c = conn.cursor()
+        c.execute("""
+            INSERT OR REPLACE INTO extraction_cache
+            (sha256, version, text, sections, contact, skills, extraction, text_chars, created_at, last_access, hits)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
+        """, (
+            sha256,
+            version,
+            text,
+            json.dumps(parsed.get("sections") or {}),
+            json.dumps(parsed.get("contact") or {}),
+            json.dumps(parsed.get("skills") or []),
+            json.dumps(parsed.get("extraction") or {}),
+            len(text),
+            now,
+            now,
+        ))
+        _prune_extraction_cache(c)
+
+def _prune_extraction_cache(c):
+    c.execute("SELECT COUNT(*), COALESCE(SUM(text_chars), 0) FROM extraction_cache")
+    count, chars = c.fetchone()
+    if count <= EXTRACTION_CACHE_MAX_ITEMS and chars <= EXTRACTION_CACHE_MAX_CHARS:
+        return
+    # walk from the least recently used end until both bounds hold
+    c.execute("SELECT sha256, text_chars FROM extraction_cache ORDER BY last_access ASC")
+    evict = []
+    for sha, n in c.fetchall():
+        if count <= EXTRACTION_CACHE_MAX_ITEMS and chars <= EXTRACTION_CACHE_MAX_CHARS:
+            break
+        evict.append((sha,))
+        count -= 1
+        chars -= n or 0
+    c.executemany("DELETE FROM extraction_cache WHERE sha256 = ?", evict)
+
+# ---------------------------------------------------------
+#  FEEDBACK CACHE (AI feedback keyed by prompt hash)
+# ---------------------------------------------------------
+def get_cached_feedback(prompt_hash: str, not_before: str, db_path: Optional[str] = None) -> Optional[str]:
+    """Cached feedback for a prompt, ignoring entries created before not_before (ISO timestamp)."""
+    path = db_path or DB_PATH
+    conn = get_connection(path)
+    row = conn.execute("SELECT feedback FROM feedback_cache WHERE prompt_hash = ? AND created_at >= ? "
+                       "AND status = 'ready'", (prompt_hash, not_before)).fetchone()
+    return row[0] if row else None
+
+def save_cached_feedback(prompt_hash: str, backend: str, feedback: str, db_path: Optional[str] = None):
+    path = db_path or DB_PATH
+    conn = get_connection(path)
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO feedback_cache (prompt_hash, backend, feedback, created_at, status) "
+                     "VALUES (?, ?, ?, ?, 'ready')", (prompt_hash, backend, feedback, datetime.utcnow().isoformat()))
+
+def mark_feedback(prompt_hash: str, backend: str, status: str, not_before: str, error: Optional[str] = None,
+                  db_path: Optional[str] = None):
+    """
+    Record that generation for a prompt is 'pending' or has 'failed'. A
+    ready answer created at or after not_before is never replaced.
+    """
+    path = db_path or DB_PATH
+    conn = get_connection(path)
+    with conn:
+        conn.execute(
+            "INSERT INTO feedback_cache (prompt_hash, backend, feedback, created_at, status, error) "
+            "VALUES (?, ?, NULL, ?, ?, ?) "
+            "ON CONFLICT(prompt_hash) DO UPDATE SET backend = excluded.backend, feedback = NULL, "
+            "created_at = excluded.created_at, status = excluded.status, error = excluded.error "
+            "WHERE feedback_cache.status != 'ready' OR feedback_cache.created_at < ?",
+            (prompt_hash, backend, datetime.utcnow().isoformat(), status, error, not_before))
+
+def get_feedback_state(prompt_hash: str, not_before: str, db_path: Optional[str] = None) -> Optional[tuple]:
+    """(status, error, created_at) of a persisted pending / failed marker, or None."""
+    path = db_path or DB_PATH
+    conn = get_connection(path)
+    row = conn.execute("SELECT status, error, created_at FROM feedback_cache WHERE prompt_hash = ? "
+                       "AND created_at >= ? AND status IN ('pending', 'failed')",
+                       (prompt_hash, not_before)).fetchone()
+    return tuple(row) if row else None
+
+def prune_feedback_cache(not_before: str, db_path: Optional[str] = None) -> int:
+    path = db_path or DB_PATH
+    conn = get_connection(path)
+    with conn:
+        n = conn.execute("DELETE FROM feedback_cache WHERE created_at < ?", (not_before,)).rowcount
+    return n
+
+# ---------------------------------------------------------
+#  JD REGISTRY (JD text + precomputed features)
+# ---------------------------------------------------------
+_JD_COLUMNS = ("id, created_at, title, text, text_hash, embedding_model, embedding, nouns, terms, skills, "
+               "nice_skills, features_version")
+
+def _jd_row_to_dict(row) -> dict:
+    return {
+        "id": row[0],
+        "created_at": row[1],
+        "title": row[2],
+        "text": row[3],
+        "text_hash": row[4],
+        "embedding_model": row[5],
+        "embedding": row[6],
+        "nouns": json.loads(row[7] or "[]"),
+        "terms": json.loads(row[8] or "{}"),
+        "skills": json.loads(row[9] or "[]"),
+        "nice_skills": json.loads(row[10] or "[]"),
+        "features_version": row[11],
+    }
+
+def save_jd(title: Optional[str], text: str, text_hash: str, embedding_model: str, embedding: bytes,
+            nouns: list, terms: dict, skills: list, nice_skills: list = (),
+            features_version: Optional[str] = None, db_path: Optional[str] = None) -> int:
+    """skills holds every skill the JD names, nice_skills the nice-to-have subset."""
+    path = db_path or DB_PATH
+    conn = get_connection(path)
+    with conn:
         c = conn.cursor()
         c.execute("""
-            INSERT INTO results
-            (timestamp, filename, jd_text, ats_score, breakdown, missing_skills, matched_skills, ai_feedback)
+            INSERT INTO jds (created_at, title, text, text_hash, embedding_model, embedding, nouns, terms, skills,
+                             nice_skills, features_version)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            datetime.utcnow().isoformat(),
+            title,
+            text,
+            text_hash,
+            embedding_model,
+            sqlite3.Binary(embedding),
+            json.dumps(nouns),
+            json.dumps(terms),
+            json.dumps(skills),
+            json.dumps(list(nice_skills)),
+            features_version,
+        ))
+        return c.lastrowid
+
+def update_jd_features(jd_id: int, nouns: list, skills: list, nice_skills: list, features_version: str,
+                       db_path: Optional[str] = None):
+    path = db_path or DB_PATH
+    conn = get_connection(path)
+    with conn:
+        conn.execute("UPDATE jds SET nouns = ?, skills = ?, nice_skills = ?, features_version = ? WHERE id = ?",
+                     (json.dumps(nouns), json.dumps(skills), json.dumps(nice_skills), features_version, jd_id))
+
+def update_jd_embedding(jd_id: int, embedding_model: str, embedding: bytes, db_path: Optional[str] = None):
+    path = db_path or DB_PATH
+    conn = get_connection(path)
+    with conn:
+        conn.execute("UPDATE jds SET embedding_model = ?, embedding = ? WHERE id = ?",
+                     (embedding_model, sqlite3.Binary(embedding), jd_id))
+
+def get_jd(jd_id: int, db_path: Optional[str] = None) -> Optional[dict]:
+    path = db_path or DB_PATH
+    conn = get_connection(path)
+    row = conn.execute(f"SELECT {_JD_COLUMNS} FROM jds WHERE id = ?", (jd_id,)).fetchone()
+    return _jd_row_to_dict(row) if row else None
+
+def find_jd_by_hash(text_hash: str, db_path: Optional[str] = None) -> Optional[int]:
+    path = db_path or DB_PATH
+    conn = get_connection(path)
+    row = conn.execute("SELECT id FROM jds WHERE text_hash = ? ORDER BY id LIMIT 1", (text_hash,)).fetchone()
+    return row[0] if row else None
+
+def list_jds(limit: int = 50, offset: int = 0, db_path: Optional[str] = None) -> list:
+    path = db_path or DB_PATH
+    conn = get_connection(path)
+    rows = conn.execute(
+        "SELECT id, created_at, title, substr(text, 1, 200), skills FROM jds ORDER BY id DESC LIMIT ? OFFSET ?",
+        (limit, offset),
+    ).fetchall()
+    return [
+        {"id": r[0], "created_at": r[1], "title": r[2], "snippet": r[3], "skills": json.loads(r[4] or "[]")}
+        for r in rows
+    ]
+
+# ---------------------------------------------------------
+#  RESUME STORE (text, skills and embedding for reverse search)
+# ---------------------------------------------------------
+def save_resume(filename: str, content_sha256: Optional[str], text: str, skills: list,
+                embedding_model: str, embedding: bytes, result_id: Optional[int] = None,
+                db_path: Optional[str] = None) -> tuple:
+    """Returns (resume id, True if a new row was inserted)."""
+    path = db_path or DB_PATH
+    conn = get_connection(path)
+    with conn:
+        c = conn.cursor()
+        if content_sha256:
+            # the same file saved again: refresh the stored copy instead of duplicating it
+            row = c.execute("SELECT id FROM resumes WHERE content_sha256 = ?", (content_sha256,)).fetchone()
+            if row:
+                c.execute("UPDATE resumes SET result_id = ?, filename = ? WHERE id = ?",
+                          (result_id, filename, row[0]))
+                return row[0], False
+        c.execute("""
+            INSERT INTO resumes (created_at, filename, content_sha256, result_id, text, skills, embedding_model, embedding)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             datetime.utcnow().isoformat(),
             filename,
-            jd_text,
-            ats_score,
-            str(breakdown),
-            ", ".join(missing_skills) if missing_skills else "",
-            ", ".join(matched_skills) if matched_skills else "",
-            ai_feedback or ""
+            content_sha256,
+            result_id,
+            text,
+            json.dumps(skills or []),
+            embedding_model,
+            sqlite3.Binary(embedding),
         ))
-        conn.commit()
-    except Exception:
-        conn.rollback()
-        raise
-    finally:
-        conn.close()
+        return c.lastrowid, True
 
-def fetch_recent(limit: int = 100, db_path: Optional[str] = None):
+def iter_resume_embeddings(embedding_model: str, after_id: int = 0, batch_size: int = 5000,
+                           db_path: Optional[str] = None):
+    """Yield (ids, embedding blobs) with id > after_id in id order, in batches, for one embedding model."""
     path = db_path or DB_PATH
-    conn = sqlite3.connect(path)
-    c = conn.cursor()
-    c.execute("SELECT id, timestamp, filename, ats_score, missing_skills, matched_skills FROM results ORDER BY id DESC LIMIT ?", (limit,))
-    rows = c.fetchall()
-    conn.close()
-    return rows
+    conn = get_connection(path)
+    last_id = after_id
+    while True:
+        rows = conn.execute(
+            "SELECT id, embedding FROM resumes WHERE embedding_model = ? AND id > ? ORDER BY id LIMIT ?",
+            (embedding_model, last_id, batch_size),
+        ).fetchall()
+        if not rows:
+            break
+        yield [r[0] for r in rows], [r[1] for r in rows]
+        last_id = rows[-1][0]
+
+def get_resumes(ids: list, db_path: Optional[str] = None) -> list:
+    if not ids:
+        return []
+    path = db_path or DB_PATH
+    conn = get_connection(path)
+    marks = ",".join("?" * len(ids))
+    rows = conn.execute(
+        f"SELECT id, created_at, filename, result_id, text, skills FROM resumes WHERE id IN ({marks})",
+        list(ids),
+    ).fetchall()
+    return [
+        {"id": r[0], "created_at": r[1], "filename": r[2], "result_id": r[3], "text": r[4],
+         "skills": json.loads(r[5] or "[]")}
+        for r in rows
+    ]
+
+def count_corpus(db_path: Optional[str] = None) -> int:
+    """Number of stored resumes + JDs."""
+    path = db_path or DB_PATH
+    conn = get_connection(path)
+    return sum(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in ("resumes", "jds"))
+
+def iter_corpus_texts(batch_size: int = 1000, db_path: Optional[str] = None):
+    """Yield the text of every stored resume and JD (the keyword model's corpus)."""
+    path = db_path or DB_PATH
+    conn = get_connection(path)
+    for table in ("resumes", "jds"):
+        last_id = 0
+        while True:
+            rows = conn.execute(f"SELECT id, text FROM {table} WHERE id > ? ORDER BY id LIMIT ?",
+                                (last_id, batch_size)).fetchall()
+            if not rows:
+                break
+            for _, text in rows:
+                yield text or ""
+            last_id = rows[-1][0]
+
+# ---------------------------------------------------------
+#  JOB QUEUE (async /jobs uploads; survives restarts)
+# ---------------------------------------------------------
+_JOB_COLUMNS = ("id, created_at, updated_at, status, stage, attempts, filename, content_type, "
+                "params, callback_url, stages, result, error")
+
+def _job_row_to_dict(row) -> dict:
+    return {
+        "id": row[0],
+        "created_at": row[1],
+        "updated_at": row[2],
+        "status": row[3],
+        "stage": row[4],
+        "attempts": row[5],
+        "filename": row[6],
+        "content_type": row[7],
+        "params": json.loads(row[8] or "{}"),
+        "callback_url": row[9],
+        "stages": json.loads(row[10] or "{}"),
+        "result": json.loads(row[11]) if row[11] else None,
+        "error": row[12],
+    }
+
+def save_job(job_id: str, filename: str, content_type: Optional[str], file_bytes: bytes, params: dict,
+             callback_url: Optional[str] = None, db_path: Optional[str] = None):
+    path = db_path or DB_PATH
+    now = datetime.utcnow().isoformat()
+    conn = get_connection(path)
+    with conn:
+        conn.execute("""
+            INSERT INTO jobs (id, created_at, updated_at, status, stage, attempts, filename, content_type,
+                              file, params, callback_url, stages)
+            VALUES (?, ?, ?, 'queued', NULL, 0, ?, ?, ?, ?, ?, '{}')
+        """, (job_id, now, now, filename, content_type, sqlite3.Binary(file_bytes), json.dumps(params),
+              callback_url))
+
+def claim_next_job(db_path: Optional[str] = None) -> Optional[dict]:
+    """Atomically move the oldest queued job to running; returns it with its file bytes, or None."""
+    path = db_path or DB_PATH
+    conn = get_connection(path)
+    with conn:
+        # IMMEDIATE takes the write lock up front, so two workers cannot claim the same row
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            f"SELECT {_JOB_COLUMNS}, file FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                     (datetime.utcnow().isoformat(), row[0]))
+    job = _job_row_to_dict(row[:-1])
+    job["status"] = "running"
+    job["attempts"] += 1
+    job["file"] = row[-1]
+    return job
+
+def update_job_stage(job_id: str, stage: str, stages: dict, db_path: Optional[str] = None):
+    path = db_path or DB_PATH
+    conn = get_connection(path)
+    with conn:
+        conn.execute("UPDATE jobs SET stage = ?, stages = ?, updated_at = ? WHERE id = ?",
+                     (stage, json.dumps(stages), datetime.utcnow().isoformat(), job_id))
+
+def finish_job(job_id: str, status: str, result: Optional[dict] = None, error: Optional[str] = None,
+               db_path: Optional[str] = None):
+    """Mark a job done/failed and drop its uploaded bytes."""
+    path = db_path or DB_PATH
+    conn = get_connection(path)
+    with conn:
+        conn.execute("""
+            UPDATE jobs SET status = ?, result = ?, error = ?, file = NULL, updated_at = ? WHERE id = ?
+        """, (status, json.dumps(result) if result is not None else None, error,
+              datetime.utcnow().isoformat(), job_id))
+
+def requeue_job(job_id: str, db_path: Optional[str] = None):
+    """Put a claimed job back on the queue without using up an attempt (it never ran)."""
+    path = db_path or DB_PATH
+    conn = get_connection(path)
+    with conn:
+        conn.execute("UPDATE jobs SET status = 'queued', attempts = MAX(attempts - 1, 0), updated_at = ? "
+                     "WHERE id = ?", (datetime.utcnow().isoformat(), job_id))
+
+def recover_jobs(max_attempts: int, db_path: Optional[str] = None) -> int:
+    """
+    After a restart, put jobs that were running back on the queue, or fail
+    them once they have used up their attempts. Returns the number requeued.
+    """
+    path = db_path or DB_PATH
+    now = datetime.utcnow().isoformat()
+    conn = get_connection(path)
+    with conn:
+        conn.execute("""
+            UPDATE jobs SET status = 'failed', error = 'interrupted by a restart', file = NULL, updated_at = ?
+            WHERE status = 'running' AND attempts >= ?
+        """, (now, max_attempts))
+        requeued = conn.execute("UPDATE jobs SET status = 'queued', updated_at = ? WHERE status = 'running'",
+                                (now,)).rowcount
+    return requeued
+
+def get_job(job_id: str, db_path: Optional[str] = None) -> Optional[dict]:
+    path = db_path or DB_PATH
+    conn = get_connection(path)
+    row = conn.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = _job_row_to_dict(row)
+    if job["status"] == "queued":
+        job["queue_position"] = conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at < ?", (job["created_at"],)
+        ).fetchone()[0] + 1
+    return job
+
+def count_jobs(db_path: Optional[str] = None) -> dict:
+    """Number of jobs per status."""
+    path = db_path or DB_PATH
+    conn = get_connection(path)
+    rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+    return dict(rows)
+
+def prune_jobs(older_than: str, db_path: Optional[str] = None) -> int:
+    """Delete finished jobs last updated before the given ISO timestamp."""
+    path = db_path or DB_PATH
+    conn = get_connection(path)
+    with conn:
+        n = conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?",
+                         (older_than,)).rowcount
+    return n
@@ -0,0 +1,259 @@
+# app/embed_cache.py
+"""
+Two-tier embedding cache keyed by a hash of (model name, normalized text).
+
+- memory tier: small in-process LRU of recently used vectors
+- disk tier: a memory-mapped float32 matrix plus an append-only index
+  file (key -> row), stored next to resume_results.db and shared by
+  every process (appends are serialized with flock)
+
+Vectors are stored exactly as returned by the encoder (we always ask for
+L2-normalized embeddings), so a hit can be used as-is.
+"""
+import fcntl
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.db import DB_PATH
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), "embedding_cache")
+CACHE_DIR = os.getenv("EMBED_CACHE_DIR", DEFAULT_CACHE_DIR)
+MEMORY_ITEMS = int(os.getenv("EMBED_CACHE_MEMORY_ITEMS", "4096"))
+DISK_ENABLED = os.getenv("EMBED_CACHE_DISK", "true").lower() in ("1", "true", "yes")
+
+_INITIAL_ROWS = 1024
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+class EmbeddingCache:
+    def __init__(self, model_name: str, cache_dir: Optional[str] = CACHE_DIR,
+                 memory_items: int = MEMORY_ITEMS, disk: bool = DISK_ENABLED):
+        self.model_name = model_name
+        self.memory_items = memory_items
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+        # disk tier state (lazily sized once we know the embedding dim)
+        self._disk = bool(disk and cache_dir)
+        self._index: Dict[str, int] = {}
+        self._matrix: Optional[np.memmap] = None
+        self._dim: Optional[int] = None
+        self._capacity = 0
+        if self._disk:
+            os.makedirs(cache_dir, exist_ok=True)
+            safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+            self._matrix_path = os.path.join(cache_dir, f"{safe}.f32")
+            self._index_path = os.path.join(cache_dir, f"{safe}.idx")
+            self._load_index()
+
+    # -------------------------------------------------------
+    #  KEYS
+    # -------------------------------------------------------
+    def key(self, text: str) -> str:
+        h = hashlib.sha256()
+        h.update(self.model_name.encode("utf-8"))
+        h.update(b"\0")
+        h.update(normalize_text(text).encode("utf-8"))
+        return h.hexdigest()
+
+    # -------------------------------------------------------
+    #  DISK TIER
+    # -------------------------------------------------------
+    # Several processes (uvicorn workers, pool processes) share the files:
+    # rows are handed out from _next_row - one past the highest row any
+    # index line names - under an exclusive flock on the index file, after
+    # catching up with the lines other processes appended. A vector is
+    # written before its index line, so a key is never visible before its row.
+    def _load_index(self):
+        self._index_offset = 0
+        self._next_row = 0
+        if not os.path.exists(self._index_path):
+            return
+        with open(self._index_path, "rb") as f:
+            fcntl.flock(f, fcntl.LOCK_SH)
+            try:
+                self._read_tail(f)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        if self._dim is None:
+            return
+        rows = self._rows_on_disk()
+        # drop index entries that point past the end of a truncated matrix (their rows stay allocated)
+        self._index = {k: r for k, r in self._index.items() if r < rows}
+        if rows:
+            self._open_matrix(rows)
+
+    def _read_tail(self, f) -> bool:
+        """Index lines appended since the last read; True if the file ends in a torn line."""
+        f.seek(self._index_offset)
+        data = f.read()
+        end = data.rfind(b"\n") + 1  # a torn last line (crashed writer) is not parsed
+        for line in data[:end].decode("utf-8", "replace").splitlines():
+            if line.startswith("# dim="):
+                self._dim = int(line.split("=", 1)[1])
+                continue
+            parts = line.split()
+            if len(parts) == 2 and parts[1].isdigit():
+                row = int(parts[1])
+                self._index[parts[0]] = row
+                self._next_row = max(self._next_row, row + 1)
+        self._index_offset += end
+        return end < len(data)
+
+    def _refresh_index(self):
+        """Pick up keys other processes stored since we last looked."""
+        try:
+            if os.path.getsize(self._index_path) <= self._index_offset:
+                return
+        except FileNotFoundError:
+            return
+        with open(self._index_path, "rb") as f:
+            fcntl.flock(f, fcntl.LOCK_SH)
+            try:
+                self._read_tail(f)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _open_matrix(self, rows: int):
+        nbytes = rows * self._dim * 4
+        if not os.path.exists(self._matrix_path) or os.path.getsize(self._matrix_path) < nbytes:
+            with open(self._matrix_path, "ab") as f:
+                f.truncate(nbytes)
+        if self._matrix is not None:
+            self._matrix.flush()
+            del self._matrix
+        self._matrix = np.memmap(self._matrix_path, dtype=np.float32, mode="r+", shape=(rows, self._dim))
+        self._capacity = rows
+
+    def _rows_on_disk(self) -> int:
+        return os.path.getsize(self._matrix_path) // (4 * self._dim) if os.path.exists(self._matrix_path) else 0
+
+    def _ensure_rows(self, rows: int):
+        """Map at least rows rows (call with the index lock held): the file as other processes grew it, or doubled."""
+        if rows <= self._capacity:
+            return
+        on_disk = self._rows_on_disk()
+        self._open_matrix(on_disk if on_disk >= rows else max(rows, self._capacity * 2, _INITIAL_ROWS))
+
+    def _disk_put_many(self, items: List[tuple]):
+        with open(self._index_path, "a+b") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                torn = self._read_tail(f)
+                if self._dim is None:
+                    self._dim = int(items[0][1].shape[0])
+                    header = f"# dim={self._dim}\n".encode("utf-8")
+                    f.write(header)
+                    self._index_offset = len(header)
+                lines = []
+                for key, vec in items:
+                    if key in self._index or vec.shape[0] != self._dim:
+                        continue  # stored meanwhile by another process, or another model's width
+                    row = self._next_row
+                    self._ensure_rows(row + 1)
+                    self._matrix[row] = vec
+                    self._index[key] = row
+                    self._next_row = row + 1
+                    lines.append(f"{key} {row}\n")
+                if lines:
+                    self._matrix.flush()
+                    # close a torn line with an extra field so it never parses as "key row"
+                    f.write((b" torn\n" if torn else b"") + "".join(lines).encode("utf-8"))
+                    f.flush()
+                    self._index_offset = f.tell()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    # -------------------------------------------------------
+    #  MEMORY TIER
+    # -------------------------------------------------------
+    def _memory_put(self, key: str, vec: np.ndarray):
+        self._memory[key] = vec
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    # -------------------------------------------------------
+    #  PUBLIC API
+    # -------------------------------------------------------
+    def get(self, text: str) -> Optional[np.ndarray]:
+        k = self.key(text)
+        with self._lock:
+            return self._lookup(k)
+
+    def _lookup(self, k: str) -> Optional[np.ndarray]:
+        vec = self._memory.get(k)
+        if vec is not None:
+            self._memory.move_to_end(k)
+            self.hits_memory += 1
+            return vec
+        if self._disk and k not in self._index:
+            self._refresh_index()
+        if self._disk and k in self._index:
+            row = self._index[k]
+            if row >= self._capacity and self._rows_on_disk() > row:
+                self._open_matrix(self._rows_on_disk())  # another process grew the file past our mapping
+            if row >= self._capacity:
+                return None
+            vec = np.array(self._matrix[row])
+            self._memory_put(k, vec)
+            self.hits_disk += 1
+            return vec
+        return None
+
+    def encode(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Return one embedding row per text, calling encode_fn only for the
+        texts that are not cached yet (in a single batched call).
+        """
+        keys = [self.key(t) for t in texts]
+        found: Dict[str, np.ndarray] = {}
+        missing: Dict[str, str] = {}
+        with self._lock:
+            for k, t in zip(keys, texts):
+                if k in found or k in missing:
+                    continue
+                vec = self._lookup(k)
+                if vec is None:
+                    missing[k] = t
+                else:
+                    found[k] = vec
+            self.misses += len(missing)
+
+        if missing:
+            vectors = np.asarray(encode_fn(list(missing.values())), dtype=np.float32)
+            with self._lock:
+                for k, vec in zip(missing.keys(), vectors):
+                    found[k] = vec
+                    self._memory_put(k, vec)
+                if self._disk:
+                    self._disk_put_many([(k, found[k]) for k in missing])
+
+        if not keys:
+            return np.zeros((0, self._dim or 0), dtype=np.float32)
+        return np.vstack([found[k] for k in keys])
+
+    def stats(self) -> dict:
+        hits = self.hits_memory + self.hits_disk
+        total = hits + self.misses
+        return {
+            "model": self.model_name,
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "memory_items": len(self._memory),
+            "disk_items": len(self._index),
+        }
@@ -0,0 +1,114 @@
+# app/embeddings.py
+"""
+Embedding backends.
+
+The sentence-transformers model behind semantic_similarity_score can run
+on CPU in several ways, picked with EMBED_BACKEND:
+
+    torch       PyTorch fp32 (the default)
+    torch-int8  PyTorch with every Linear layer dynamically quantized to
+                int8 (no extra dependencies)
+    onnx        ONNX Runtime (needs optimum[onnxruntime]); the model is
+                exported on first load unless the model repo ships one
+    onnx-int8   ONNX Runtime running the int8 export EMBED_ONNX_INT8_FILE
+                from the model repo
+
+EMBED_THREADS sets the intra-op thread count (0 keeps the library
+default) and EMBED_BATCH_SIZE how many texts go through the model at
+once. All backends share one interface - encode(texts, batch_size)
+returns L2-normalized float32 rows - and every backend but torch tags its
+vectors with its own model id, so cached and stored embeddings from
+different backends are never mixed.
+"""
+import os
+from typing import List, Optional
+
+import numpy as np
+
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", "0"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+# int8 ONNX file inside the model repo (sentence-transformers repos ship several, one per CPU family)
+EMBED_ONNX_INT8_FILE = os.getenv("EMBED_ONNX_INT8_FILE", "onnx/model_quint8_avx2.onnx")
+
+
+def model_id(model_name: str, backend: str = EMBED_BACKEND) -> str:
+    """Identity of the vectors a backend produces (plain model name for torch fp32)."""
+    return model_name if backend == "torch" else f"{model_name}+{backend}"
+
+
+class TorchBackend:
+    name = "torch"
+
+    def __init__(self, model_name: str, threads: int = EMBED_THREADS):
+        self.model_name = model_name
+        self.threads = threads
+        self.model = self._load()
+
+    @property
+    def model_id(self) -> str:
+        return model_id(self.model_name, self.name)
+
+    def _load(self):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if self.threads:
+            # process-wide: every torch model in this process shares the setting
+            torch.set_num_threads(self.threads)
+        return SentenceTransformer(self.model_name, device="cpu")
+
+    def encode(self, texts: List[str], batch_size: int = EMBED_BATCH_SIZE) -> np.ndarray:
+        embeddings = self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True,
+                                       normalize_embeddings=True)
+        return np.asarray(embeddings, dtype=np.float32)
+
+
+class TorchInt8Backend(TorchBackend):
+    name = "torch-int8"
+
+    def _load(self):
+        import torch
+
+        model = super()._load()
+        # weights stored as int8, activations quantized on the fly; embeddings drift slightly from fp32
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+class OnnxBackend(TorchBackend):
+    name = "onnx"
+    file_name: Optional[str] = None
+
+    def _load(self):
+        import onnxruntime
+        from sentence_transformers import SentenceTransformer
+
+        options = onnxruntime.SessionOptions()
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+        model_kwargs = {"provider": "CPUExecutionProvider", "session_options": options}
+        if self.file_name:
+            model_kwargs["file_name"] = self.file_name
+        return SentenceTransformer(self.model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+
+
+class OnnxInt8Backend(OnnxBackend):
+    name = "onnx-int8"
+    file_name = EMBED_ONNX_INT8_FILE
+
+
+BACKENDS = {
+    "torch": TorchBackend,
+    "torch-int8": TorchInt8Backend,
+    "onnx": OnnxBackend,
+    "onnx-int8": OnnxInt8Backend,
+}
+
+
+def get_backend(name: str, model_name: str, threads: int = EMBED_THREADS):
+    """Load model_name on the named backend."""
+    try:
+        backend = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown embedding backend {name!r}; choose from {sorted(BACKENDS)}")
+    return backend(model_name, threads=threads)
@@ -0,0 +1,182 @@
+# app/experience.py
+"""
+Experience-relevance engine.
+
+A JD's experience terms are its distinct noun lemmas plus its multi-word
+noun phrases ("machine learning", "data pipeline"); a resume is reduced
+once to the set of its lemmas, words and noun phrases. Relevance is then
+a set intersection: JD terms found in the resume over
+max(MIN_NOUN_DENOMINATOR, JD term count), capped at 1, together with the
+terms that matched.
+
+All spaCy work goes through nlp.pipe - batched, over SPACY_N_PROCESS
+processes for large batches - with every component that does not feed
+POS tags or lemmas disabled. The pipeline is loaded without a parser
+(see app.models), so noun phrases are runs of adjectives and nouns that
+end in a noun, as tagged, rather than dependency-parse noun chunks.
+Results are cached by text hash: JD terms for the last
+JD_TERMS_CACHE_ITEMS JDs, resume term sets for the last
+EXPERIENCE_CACHE_ITEMS resumes.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, FrozenSet, Iterable, List, Optional, Tuple
+
+from app.models import get_nlp
+from app.scoring import MIN_NOUN_DENOMINATOR
+from app.timing import span
+
+SPACY_BATCH_SIZE = int(os.getenv("SPACY_BATCH_SIZE", "64"))
+# worker processes for nlp.pipe; only used for batches larger than SPACY_BATCH_SIZE
+SPACY_N_PROCESS = int(os.getenv("SPACY_N_PROCESS", "1"))
+JD_TERMS_CACHE_ITEMS = int(os.getenv("JD_TERMS_CACHE_ITEMS", "512"))
+EXPERIENCE_CACHE_ITEMS = int(os.getenv("EXPERIENCE_CACHE_ITEMS", "1024"))
+# noun phrases longer than this are usually comma-less lists ("python sql spark aws"), not terms
+MAX_PHRASE_WORDS = 3
+
+# components that never feed POS tags or lemmas (disabled if the loaded pipeline has them)
+UNUSED_COMPONENTS = ("parser", "ner", "senter", "entity_ruler", "entity_linker", "textcat",
+                     "textcat_multilabel", "spancat")
+_NOUN_POS = ("NOUN", "PROPN")
+_PHRASE_POS = ("ADJ", "NOUN", "PROPN")
+
+
+# -------------------------------------------------------
+#  TERMS OF ONE DOC
+# -------------------------------------------------------
+def _noun_runs(doc) -> List[List[str]]:
+    """Lemmas of every run of adjectives / nouns that ends in a noun and holds 2+ words."""
+    runs, run = [], []
+    for token in list(doc) + [None]:
+        if token is not None and token.pos_ in _PHRASE_POS and token.is_alpha:
+            run.append(token)
+            continue
+        while run and run[-1].pos_ not in _NOUN_POS:
+            run.pop()
+        if len(run) > 1:
+            runs.append([t.lemma_ for t in run])
+        run = []
+    return runs
+
+
+def _jd_terms_of(doc) -> Tuple[str, ...]:
+    terms = dict.fromkeys(t.lemma_ for t in doc if t.pos_ in _NOUN_POS)
+    for run in _noun_runs(doc):
+        if len(run) <= MAX_PHRASE_WORDS:
+            terms.setdefault(" ".join(run))
+    return tuple(terms)
+
+
+def _resume_terms_of(doc) -> FrozenSet[str]:
+    terms = {t.lemma_ for t in doc}
+    terms.update(t.lower_ for t in doc)
+    # every 2..MAX_PHRASE_WORDS window of a run, so "data pipeline" is found in "scalable data pipelines"
+    for run in _noun_runs(doc):
+        for n in range(2, min(len(run), MAX_PHRASE_WORDS) + 1):
+            terms.update(" ".join(run[i:i + n]) for i in range(len(run) - n + 1))
+    return frozenset(terms)
+
+
+# -------------------------------------------------------
+#  BATCHED, CACHED PROCESSING
+# -------------------------------------------------------
+def pipe(texts: List[str], batch_size: int = SPACY_BATCH_SIZE, n_process: Optional[int] = None):
+    """Docs for texts (lower-cased, as all experience terms are) in one nlp.pipe pass."""
+    nlp = get_nlp()
+    n_process = SPACY_N_PROCESS if n_process is None else n_process
+    if len(texts) <= batch_size:
+        n_process = 1  # starting worker processes costs more than a single batch
+    disable = [name for name in UNUSED_COMPONENTS if name in nlp.pipe_names]
+    return nlp.pipe((t.lower() for t in texts), batch_size=batch_size, n_process=n_process, disable=disable)
+
+
+class _TermCache:
+    """Per-text-hash LRU in front of one nlp.pipe pass over the texts it does not hold."""
+
+    def __init__(self, terms_of: Callable, items: int):
+        self.terms_of = terms_of
+        self.items = items
+        self._entries: "OrderedDict[str, object]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, texts: List[str], batch_size: int = SPACY_BATCH_SIZE,
+                 n_process: Optional[int] = None) -> list:
+        keys = [hashlib.sha256((t or "").encode("utf-8")).hexdigest() for t in texts]
+        found = {}
+        with self._lock:
+            for key in keys:
+                value = self._entries.get(key)
+                if value is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = value
+        todo = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                todo.setdefault(key, text or "")
+        self.hits += len(keys) - sum(1 for key in keys if key in todo)
+        self.misses += len(todo)
+        if todo:
+            with span("spacy"):
+                computed = [self.terms_of(doc) for doc in pipe(list(todo.values()), batch_size, n_process)]
+            found.update(zip(todo, computed))
+            with self._lock:
+                for key, value in zip(todo, computed):
+                    self._entries[key] = value
+                while len(self._entries) > self.items:
+                    self._entries.popitem(last=False)
+        return [found[key] for key in keys]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "items": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_jd_terms = _TermCache(_jd_terms_of, JD_TERMS_CACHE_ITEMS)
+_resume_terms = _TermCache(_resume_terms_of, EXPERIENCE_CACHE_ITEMS)
+
+
+def jd_terms(text: str) -> Tuple[str, ...]:
+    """Distinct noun lemmas and noun phrases of a JD, in order of first mention."""
+    return _jd_terms.get_many([text])[0]
+
+
+def jd_terms_batch(texts: List[str], batch_size: int = SPACY_BATCH_SIZE,
+                   n_process: Optional[int] = None) -> List[Tuple[str, ...]]:
+    return _jd_terms.get_many(texts, batch_size, n_process)
+
+
+def resume_terms(text: str) -> FrozenSet[str]:
+    """Lemmas, words and noun phrases of a resume."""
+    return _resume_terms.get_many([text])[0]
+
+
+def resume_terms_batch(texts: List[str], batch_size: int = SPACY_BATCH_SIZE,
+                       n_process: Optional[int] = None) -> List[FrozenSet[str]]:
+    return _resume_terms.get_many(texts, batch_size, n_process)
+
+
+# -------------------------------------------------------
+#  MATCHING
+# -------------------------------------------------------
+def experience_match(jd_terms: Iterable[str], resume_terms: FrozenSet[str]) -> Tuple[float, List[str]]:
+    """(relevance 0-1, JD terms found in the resume)."""
+    jd_terms = list(jd_terms)
+    matched = [t for t in jd_terms if t in resume_terms]
+    return min(1.0, len(matched) / max(MIN_NOUN_DENOMINATOR, len(jd_terms))), matched
+
+
+def experience_relevance(jd_text: str, resume_text: str) -> Tuple[float, List[str]]:
+    return experience_match(jd_terms(jd_text), resume_terms(resume_text))
+
+
+def stats() -> dict:
+    return {"jd_terms": _jd_terms.stats(), "resume_terms": _resume_terms.stats()}
@@ -1,36 +1,198 @@
 # app/extract.py
 import io
-from typing import Optional
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Union
 from PIL import Image
 import pdfplumber
 import docx2txt
 import pytesseract
 
-def extract_text_from_pdf_bytes(file_bytes: bytes) -> str:
+# -------------------------------------------------------
+#  PDF: PAGE-LEVEL TEXT LAYER + PARALLEL OCR
+# -------------------------------------------------------
+# Extractors take either the file's bytes or a path to it (a spooled
+# upload, see app.uploads); a path is opened directly, without a copy.
+Source = Union[bytes, str, os.PathLike]
+
+def _open_source(source: Source):
+    return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+OCR_DPI = int(os.getenv("OCR_DPI", "300"))
+# fast first pass; pages that come back (nearly) empty are redone at OCR_DPI
+OCR_FAST_DPI = int(os.getenv("OCR_FAST_DPI", "150"))
+# OCR threads per extraction. Unset: one per core, or in a pool of extraction processes an
+# equal share of the cores per process (see pool_ocr_workers), so the pool runs ~one tesseract per core
+_OCR_WORKERS_ENV = os.getenv("OCR_WORKERS")
+OCR_WORKERS = int(_OCR_WORKERS_ENV or os.cpu_count() or 2)
+# scanned pages OCR'd per PDF; the text layer is always read from every page
+OCR_MAX_PAGES = int(os.getenv("OCR_MAX_PAGES", "10"))
+# pages read at all per PDF (0 = no limit)
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "0"))
+OCR_MAX_SECONDS = float(os.getenv("OCR_MAX_SECONDS", "60"))
+# a page whose text layer has fewer characters than this is treated as scanned
+MIN_TEXT_LAYER_CHARS = int(os.getenv("MIN_TEXT_LAYER_CHARS", "20"))
+# a fast-pass OCR result shorter than this is retried at full resolution
+MIN_OCR_CHARS = int(os.getenv("MIN_OCR_CHARS", "40"))
+
+def pool_ocr_workers(pool_size: int) -> int:
+    """OCR threads for each of pool_size extraction processes."""
+    if _OCR_WORKERS_ENV:
+        return int(_OCR_WORKERS_ENV)
+    return max(1, (os.cpu_count() or 2) // max(1, pool_size))
+
+def set_ocr_workers(workers: int):
+    """Process-wide OCR thread count (initializer of the extraction process pools)."""
+    global OCR_WORKERS
+    OCR_WORKERS = max(1, workers)
+
+def _render_page(page, dpi: int) -> Image.Image:
+    # grayscale is plenty for tesseract and quicker to hand over
+    return page.to_image(resolution=dpi).original.convert("L")
+
+def _ocr_image(img: Image.Image, timeout: float) -> tuple:
+    t0 = time.perf_counter()
+    txt = pytesseract.image_to_string(img, timeout=max(1, int(timeout)))
+    return txt, time.perf_counter() - t0
+
+def extract_pdf_pages(source: Source, dpi: int = OCR_DPI, fast_dpi: int = OCR_FAST_DPI,
+                      max_ocr_pages: int = OCR_MAX_PAGES, max_seconds: float = OCR_MAX_SECONDS,
+                      workers: Optional[int] = None, max_pages: int = PDF_MAX_PAGES) -> dict:
+    """
+    Extract a PDF page by page.
+
+    Every page's text layer is read (up to max_pages, if set); only pages
+    without a usable one are rasterized and OCR'd, in parallel (tesseract
+    runs as a subprocess, so threads are enough). OCR starts at fast_dpi
+    and only pages that come back short are redone at dpi. OCR stops after
+    max_ocr_pages pages or once max_seconds is spent; pages it skips keep
+    their (short) text layer. Returns the text plus per-page timings.
+    """
+    workers = workers or OCR_WORKERS
+    start = time.perf_counter()
+    deadline = start + max_seconds if max_seconds else None
+    results = {}
+
+    def remaining():
+        return (deadline - time.perf_counter()) if deadline else 3600.0
+
+    with pdfplumber.open(_open_source(source)) as pdf:
+        total_pages = len(pdf.pages)
+        pages = pdf.pages[:max_pages] if max_pages else pdf.pages
+
+        # 1) text layer, per page
+        needs_ocr = []
+        short_text = {}
+        for i, page in enumerate(pages):
+            t0 = time.perf_counter()
+            txt = page.extract_text() or ""
+            if len(txt.strip()) >= MIN_TEXT_LAYER_CHARS:
+                results[i] = {"text": txt, "method": "text", "dpi": None,
+                              "seconds": time.perf_counter() - t0}
+            else:
+                needs_ocr.append(i)
+                short_text[i] = txt
+        if max_ocr_pages:
+            needs_ocr = needs_ocr[:max_ocr_pages]
+
+        # 2) OCR the rest in parallel: fast pass first, full resolution for the misses
+        if needs_ocr:
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+                passes = [(fast_dpi, "ocr_fast"), (dpi, "ocr")] if 0 < fast_dpi < dpi else [(dpi, "ocr")]
+                for pass_dpi, method in passes:
+                    futures = {}
+                    for i in needs_ocr:
+                        if remaining() <= 0:
+                            break
+                        t0 = time.perf_counter()
+                        img = _render_page(pages[i], pass_dpi)
+                        futures[i] = (ex.submit(_ocr_image, img, remaining()),
+                                      time.perf_counter() - t0)
+                    retry = []
+                    for i, (fut, render_s) in futures.items():
+                        prev = results.get(i, {"seconds": 0.0})
+                        try:
+                            txt, ocr_s = fut.result(timeout=max(0.0, remaining()) + 1)
+                        except Exception:
+                            # tesseract timeout / failure: keep whatever the earlier pass found
+                            continue
+                        results[i] = {"text": txt, "method": method, "dpi": pass_dpi,
+                                      "seconds": prev["seconds"] + render_s + ocr_s}
+                        if len(txt.strip()) < MIN_OCR_CHARS:
+                            retry.append(i)
+                    needs_ocr = retry
+                    if not needs_ocr:
+                        break
+
+    page_info = []
     text_parts = []
-    with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
-        for page in pdf.pages:
-            txt = page.extract_text()
-            if txt:
+    for i in range(len(pages)):
+        r = results.get(i)
+        if r is None:
+            # not OCR'd (page / time budget, tesseract failure): keep what the text layer had
+            txt = short_text.get(i, "")
+            if txt.strip():
                 text_parts.append(txt)
-    # fallback: if no text extracted (scanned PDF), run OCR on each page as image
-    if not text_parts:
-        # simple OCR fallback: convert pages to images via pdfplumber
-        with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
-            for page in pdf.pages:
-                pil = page.to_image(resolution=300).original
-                text_parts.append(pytesseract.image_to_string(pil))
-    return "\n\n".join(text_parts).strip()
-
-def extract_text_from_docx_bytes(file_bytes: bytes) -> str:
-    # docx2txt expects a path; write bytes to temp file
-    import tempfile
-    with tempfile.NamedTemporaryFile(suffix=".docx", delete=True) as tmp:
-        tmp.write(file_bytes)
-        tmp.flush()
-        text = docx2txt.process(tmp.name)
-    return text or ""
-
-def extract_text_from_image_bytes(file_bytes: bytes) -> str:
-    img = Image.open(io.BytesIO(file_bytes))
-    return pytesseract.image_to_string(img)
+            page_info.append({"page": i + 1, "method": "skipped", "dpi": None, "chars": len(txt), "seconds": 0.0})
+            continue
+        if r["text"].strip():
+            text_parts.append(r["text"])
+        page_info.append({"page": i + 1, "method": r["method"], "dpi": r["dpi"],
+                          "chars": len(r["text"]), "seconds": round(r["seconds"], 4)})
+
+    return {
+        "text": "\n\n".join(text_parts).strip(),
+        "pages": page_info,
+        "total_pages": total_pages,
+        "truncated": total_pages > len(pages) or any(p["method"] == "skipped" for p in page_info),
+        "seconds": round(time.perf_counter() - start, 4),
+    }
+
+def extract_text_from_pdf_bytes(file_bytes: bytes) -> str:
+    return extract_pdf_pages(file_bytes)["text"]
+
+def extract_text_from_docx_bytes(source: Source) -> str:
+    # docx2txt reads a path or file object (it opens the document as a zip)
+    return docx2txt.process(_open_source(source)) or ""
+
+def extract_text_from_image_bytes(source: Source) -> str:
+    with Image.open(_open_source(source)) as img:
+        return pytesseract.image_to_string(img)
+
+# -------------------------------------------------------
+#  DISPATCH BY FILE TYPE
+# -------------------------------------------------------
+def guess_kind(filename: str, content_type: Optional[str] = None) -> str:
+    content_type = content_type or ""
+    name = (filename or "").lower()
+    if "pdf" in content_type or name.endswith(".pdf"):
+        return "pdf"
+    if name.endswith((".docx", ".doc")):
+        return "docx"
+    if content_type.startswith("image/") or name.endswith((".png", ".jpg", ".jpeg")):
+        return "image"
+    return "pdf"
+
+def extract_document(source: Source, filename: str, content_type: Optional[str] = None,
+                     kind: Optional[str] = None) -> dict:
+    """
+    Dispatch to the right extractor: kind ("pdf" / "docx" / "image", e.g.
+    sniffed from the file's magic bytes) or else content type / file
+    extension. Returns {"text", "kind", "seconds"} and, for PDFs, the
+    per-page details.
+    """
+    kind = kind or guess_kind(filename, content_type)
+    t0 = time.perf_counter()
+    if kind == "docx":
+        return {"text": extract_text_from_docx_bytes(source), "kind": "docx",
+                "seconds": round(time.perf_counter() - t0, 4)}
+    if kind == "image":
+        return {"text": extract_text_from_image_bytes(source), "kind": "image",
+                "seconds": round(time.perf_counter() - t0, 4)}
+    result = extract_pdf_pages(source)
+    result["kind"] = "pdf"
+    return result
+
+def extract_text_from_bytes(source: Source, filename: str, content_type: Optional[str] = None) -> str:
+    return extract_document(source, filename, content_type)["text"]
@@ -0,0 +1,442 @@
+# app/feedback.py
+"""
+AI feedback service.
+
+Sits between the API and the remote model so that feedback is only paid
+for once per distinct prompt:
+
+- responses are cached by the SHA-256 of (backend, prompt) for
+  FEEDBACK_CACHE_TTL seconds, in memory and in the feedback_cache table
+- concurrent requests for the same prompt share one in-flight call
+- at most FEEDBACK_MAX_CONCURRENCY backend calls run at once; waiting for
+  a slot is bounded by FEEDBACK_QUEUE_TIMEOUT and each call by
+  FEEDBACK_TIMEOUT
+- submit() starts generation in the background and returns the feedback
+  id straight away (the API's "lazy" feedback mode, see GET /feedback/{id});
+  pending / failed markers in feedback_cache let any server process answer
+  for an id another one is working on
+- stream() yields the text piece by piece as the backend produces it (the
+  API's "stream" feedback mode, see POST /upload/stream); the finished text
+  is cached like any other answer
+
+The backend is chosen with FEEDBACK_BACKEND: "gemini" (default) or "stub",
+a local deterministic model for tests and benchmarks.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Iterator, Optional
+
+from app.db import get_cached_feedback, save_cached_feedback, prune_feedback_cache, mark_feedback, get_feedback_state
+from app.gemini_feedback import GEMINI_MODEL, build_feedback_prompt, gemini_generate, gemini_stream
+from app.profiling import wrap_for_thread
+from app.timing import span
+
+FEEDBACK_BACKEND = os.getenv("FEEDBACK_BACKEND", "gemini")
+FEEDBACK_CACHE_TTL = float(os.getenv("FEEDBACK_CACHE_TTL", str(24 * 3600)))
+FEEDBACK_CACHE_ITEMS = int(os.getenv("FEEDBACK_CACHE_ITEMS", "1024"))
+FEEDBACK_CACHE_PERSIST = os.getenv("FEEDBACK_CACHE_PERSIST", "true").lower() in ("1", "true", "yes")
+FEEDBACK_MAX_CONCURRENCY = int(os.getenv("FEEDBACK_MAX_CONCURRENCY", "4"))
+FEEDBACK_QUEUE_TIMEOUT = float(os.getenv("FEEDBACK_QUEUE_TIMEOUT", "10"))
+FEEDBACK_TIMEOUT = float(os.getenv("FEEDBACK_TIMEOUT", "30"))
+# simulated latency of the stub backend
+FEEDBACK_STUB_DELAY = float(os.getenv("FEEDBACK_STUB_DELAY", "0"))
+# failed lazy requests remembered for GET /feedback/{id}
+FAILURES_KEPT = 256
+# slack on top of queue timeout + call timeout before another process's pending marker counts as abandoned
+PENDING_GRACE_SECONDS = 30
+
+_STREAM_END = object()
+
+
+class FeedbackBusy(Exception):
+    """No backend slot became free within FEEDBACK_QUEUE_TIMEOUT."""
+
+
+class FeedbackTimeout(Exception):
+    """The backend call took longer than FEEDBACK_TIMEOUT."""
+
+
+# ---------------------------------------------------------
+#  BACKENDS
+# ---------------------------------------------------------
+# A backend has a name, generate(prompt, timeout) -> str and optionally
+# stream(prompt, timeout) -> iterator of text pieces (without it, stream()
+# sends the whole answer as one piece).
+class GeminiBackend:
+    name = f"gemini:{GEMINI_MODEL}"
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        return gemini_generate(prompt, timeout=timeout)
+
+    def stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        return gemini_stream(prompt, timeout=timeout)
+
+
+class StubBackend:
+    """Offline stand-in: a short deterministic paragraph, after an optional fixed delay."""
+    name = "stub"
+
+    def __init__(self, delay: float = FEEDBACK_STUB_DELAY):
+        self.delay = delay
+
+    @staticmethod
+    def _text(prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        return (f"[stub feedback {digest}] Your resume covers part of this role. Lead with the most "
+                f"relevant experience, quantify results, and add the missing skills you can back up.")
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        if self.delay:
+            time.sleep(self.delay)
+        return self._text(prompt)
+
+    def stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        """Word by word, the delay spread over the words."""
+        words = self._text(prompt).split(" ")
+        for i, word in enumerate(words):
+            if self.delay:
+                time.sleep(self.delay / len(words))
+            yield word if i == 0 else " " + word
+
+
+BACKENDS = {
+    "gemini": GeminiBackend,
+    "stub": StubBackend,
+}
+
+
+def get_backend(name: str = FEEDBACK_BACKEND):
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown feedback backend {name!r}; choose from {sorted(BACKENDS)}")
+
+
+# ---------------------------------------------------------
+#  SERVICE
+# ---------------------------------------------------------
+class FeedbackService:
+    def __init__(self, backend=None, ttl: float = FEEDBACK_CACHE_TTL, memory_items: int = FEEDBACK_CACHE_ITEMS,
+                 persist: bool = FEEDBACK_CACHE_PERSIST, max_concurrency: int = FEEDBACK_MAX_CONCURRENCY,
+                 queue_timeout: float = FEEDBACK_QUEUE_TIMEOUT, timeout: float = FEEDBACK_TIMEOUT):
+        self._backend = backend
+        self.ttl = ttl
+        self.memory_items = memory_items
+        self.persist = persist
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()   # key -> (created, feedback)
+        self._failures: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        # asyncio state is bound to the loop that created it (a test client may run several loops)
+        self._loop = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._in_flight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = get_backend()
+        return self._backend
+
+    def key(self, prompt: str) -> str:
+        return hashlib.sha256(f"{self.backend.name}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._in_flight = {}
+
+    # -------------------------------------------------------
+    #  CACHE
+    # -------------------------------------------------------
+    def _memory_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            created, feedback = entry
+            if time.time() - created > self.ttl:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return feedback
+
+    def _memory_put(self, key: str, feedback: str, created: Optional[float] = None):
+        with self._lock:
+            self._memory[key] = (created or time.time(), feedback)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    async def _cache_get(self, key: str) -> Optional[str]:
+        feedback = self._memory_get(key)
+        if feedback is None and self.persist:
+            try:
+                feedback = await asyncio.to_thread(get_cached_feedback, key, self._not_before())
+            except Exception as e:
+                print("Warning: feedback cache lookup failed:", e)
+            if feedback is not None:
+                self._memory_put(key, feedback)
+        return feedback
+
+    def _not_before(self) -> str:
+        return (datetime.utcnow() - timedelta(seconds=self.ttl)).isoformat()
+
+    async def _mark(self, key: str, status: str, error: Optional[str] = None):
+        """Persist a pending / failed marker so other server processes can report it."""
+        if self.persist:
+            try:
+                await asyncio.to_thread(mark_feedback, key, self.backend.name, status, self._not_before(), error)
+            except Exception as e:
+                print("Warning: feedback state store failed:", e)
+
+    async def _cache_put(self, key: str, feedback: str):
+        self._memory_put(key, feedback)
+        if self.persist:
+            try:
+                await asyncio.to_thread(save_cached_feedback, key, self.backend.name, feedback)
+            except Exception as e:
+                print("Warning: feedback cache store failed:", e)
+
+    # -------------------------------------------------------
+    #  GENERATION
+    # -------------------------------------------------------
+    async def _call(self, prompt: str) -> str:
+        semaphore = self._semaphore
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise FeedbackBusy(f"feedback backend busy ({self.max_concurrency} calls running)")
+        self.calls += 1
+        call = asyncio.ensure_future(asyncio.to_thread(wrap_for_thread(self.backend.generate), prompt, self.timeout))
+        # the slot is held until the backend thread really finishes, even after a timeout
+        call.add_done_callback(lambda _: semaphore.release())
+        try:
+            with span("feedback.backend"):
+                return await asyncio.wait_for(asyncio.shield(call), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise FeedbackTimeout(f"feedback backend did not answer within {self.timeout}s")
+
+    async def _call_stream(self, prompt: str) -> AsyncIterator[str]:
+        """Like _call, piece by piece; the timeout covers the whole answer."""
+        semaphore = self._semaphore
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise FeedbackBusy(f"feedback backend busy ({self.max_concurrency} calls running)")
+        self.calls += 1
+        loop = asyncio.get_running_loop()
+        pieces: asyncio.Queue = asyncio.Queue()
+        backend = self.backend
+
+        def put(item):
+            try:
+                loop.call_soon_threadsafe(pieces.put_nowait, item)
+            except RuntimeError:
+                pass  # loop closed: nobody is listening any more
+
+        def produce():
+            # runs in a worker thread; hands each piece (then the end marker or the error) to the loop
+            try:
+                if hasattr(backend, "stream"):
+                    for piece in backend.stream(prompt, self.timeout):
+                        put(piece)
+                else:
+                    put(backend.generate(prompt, self.timeout))
+                put(_STREAM_END)
+            except Exception as e:
+                put(e)
+
+        call = asyncio.ensure_future(asyncio.to_thread(wrap_for_thread(produce)))
+        # the slot is held until the backend thread really finishes, even after a timeout
+        call.add_done_callback(lambda _: semaphore.release())
+        deadline = loop.time() + self.timeout
+        with span("feedback.backend"):
+            while True:
+                try:
+                    piece = await asyncio.wait_for(pieces.get(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    raise FeedbackTimeout(f"feedback backend did not answer within {self.timeout}s")
+                if piece is _STREAM_END:
+                    return
+                if isinstance(piece, Exception):
+                    raise piece
+                yield piece
+
+    async def _record_failure(self, key: str, error: Exception):
+        self.errors += 1
+        message = str(error) or type(error).__name__
+        with self._lock:
+            self._failures[key] = message
+            while len(self._failures) > FAILURES_KEPT:
+                self._failures.popitem(last=False)
+        await self._mark(key, "failed", message)
+
+    async def _fetch(self, key: str, prompt: str) -> str:
+        feedback = await self._cache_get(key)
+        if feedback is not None:
+            self.hits += 1
+            return feedback
+        self.misses += 1
+        await self._mark(key, "pending")
+        try:
+            feedback = await self._call(prompt)
+        except Exception as e:
+            await self._record_failure(key, e)
+            raise
+        with self._lock:
+            self._failures.pop(key, None)
+        await self._cache_put(key, feedback)
+        return feedback
+
+    async def _fetch_streaming(self, key: str, prompt: str, listener: asyncio.Queue) -> str:
+        """_fetch for a cache miss, handing every piece to listener as it arrives."""
+        self.misses += 1
+        await self._mark(key, "pending")
+        parts = []
+        try:
+            async for piece in self._call_stream(prompt):
+                parts.append(piece)
+                listener.put_nowait(piece)
+        except Exception as e:
+            await self._record_failure(key, e)
+            raise
+        feedback = "".join(parts)
+        with self._lock:
+            self._failures.pop(key, None)
+        await self._cache_put(key, feedback)
+        return feedback
+
+    def _track(self, key: str, task: asyncio.Task) -> asyncio.Task:
+        self._in_flight[key] = task
+
+        def _done(t, in_flight=self._in_flight):
+            in_flight.pop(key, None)
+            if not t.cancelled():
+                t.exception()  # mark retrieved; lazy requests may never be awaited
+
+        task.add_done_callback(_done)
+        return task
+
+    def _start(self, key: str, prompt: str) -> asyncio.Task:
+        self._bind_loop()
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task
+        return self._track(key, asyncio.ensure_future(self._fetch(key, prompt)))
+
+    async def generate(self, jd_text: str, resume_text: str, jd_match: dict, suggestions: dict) -> str:
+        """Feedback text for one analysis (cached / coalesced / rate-limited)."""
+        prompt = build_feedback_prompt(jd_text, resume_text, jd_match, suggestions)
+        # shield: one caller giving up must not cancel the call other callers are waiting on
+        return await asyncio.shield(self._start(self.key(prompt), prompt))
+
+    async def stream(self, jd_text: str, resume_text: str, jd_match: dict, suggestions: dict) -> AsyncIterator[str]:
+        """
+        Feedback for one analysis as it is generated. A cached answer, or
+        one another request is already waiting for, comes as a single piece.
+        The generation runs on if the caller stops listening, so the text
+        still lands in the cache.
+        """
+        prompt = build_feedback_prompt(jd_text, resume_text, jd_match, suggestions)
+        key = self.key(prompt)
+        feedback = await self._cache_get(key)
+        if feedback is not None:
+            self.hits += 1
+            yield feedback
+            return
+        self._bind_loop()
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            yield await asyncio.shield(task)
+            return
+        listener: asyncio.Queue = asyncio.Queue()
+        task = self._track(key, asyncio.ensure_future(self._fetch_streaming(key, prompt, listener)))
+        task.add_done_callback(lambda _: listener.put_nowait(_STREAM_END))
+        while True:
+            piece = await listener.get()
+            if piece is _STREAM_END:
+                break
+            yield piece
+        await task  # re-raises a failed / timed out call
+
+    def submit(self, jd_text: str, resume_text: str, jd_match: dict, suggestions: dict) -> str:
+        """Start generating in the background; returns the feedback id (must run inside the event loop)."""
+        prompt = build_feedback_prompt(jd_text, resume_text, jd_match, suggestions)
+        key = self.key(prompt)
+        if self._memory_get(key) is None:
+            self._start(key, prompt)
+        return key
+
+    async def status(self, feedback_id: str) -> Optional[dict]:
+        """State of a feedback id: ready / pending / failed, or None if unknown."""
+        if feedback_id in self._in_flight:
+            return {"feedback_id": feedback_id, "status": "pending", "feedback": None}
+        feedback = await self._cache_get(feedback_id)
+        if feedback is not None:
+            return {"feedback_id": feedback_id, "status": "ready", "feedback": feedback}
+        error = self._failures.get(feedback_id)
+        if error is None and self.persist:
+            # another server process may own this id
+            try:
+                state = await asyncio.to_thread(get_feedback_state, feedback_id, self._not_before())
+            except Exception as e:
+                print("Warning: feedback state lookup failed:", e)
+                state = None
+            if state is not None:
+                status, error, created_at = state
+                if status == "pending":
+                    # a process that died mid-call leaves its marker behind
+                    age = (datetime.utcnow() - datetime.fromisoformat(created_at)).total_seconds()
+                    if age <= self.queue_timeout + self.timeout + PENDING_GRACE_SECONDS:
+                        return {"feedback_id": feedback_id, "status": "pending", "feedback": None}
+                    error = "feedback generation was interrupted"
+        if error is not None:
+            return {"feedback_id": feedback_id, "status": "failed", "feedback": None, "error": error}
+        return None
+
+    async def prune(self):
+        """Drop persisted entries older than the TTL."""
+        if self.persist:
+            await asyncio.to_thread(prune_feedback_cache, self._not_before())
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "coalesced": self.coalesced,
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "in_flight": len(self._in_flight),
+            "memory_items": len(self._memory),
+        }
+
+
+feedback_service = FeedbackService()
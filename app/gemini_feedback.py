@@ -1,15 +1,29 @@
 # app/gemini_feedback.py
 import os
-import google.generativeai as genai
+import threading
 
-# Set your Gemini API key (environment variable recommended)
-genai.configure(api_key=os.getenv(API-KEY)
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
 
-def generate_resume_feedback(jd_text: str, resume_text: str, jd_match: dict, suggestions: dict):
-    """
-    Generate AI-based feedback using Gemini, based on ATS analysis results.
-    """
-    prompt = f"""
+_model = None
+_model_lock = threading.Lock()
+
+
+def _get_model():
+    """One GenerativeModel per process; the SDK is only imported on first use."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                import google.generativeai as genai
+
+                # Set your Gemini API key (environment variable recommended)
+                genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+                _model = genai.GenerativeModel(GEMINI_MODEL)
+    return _model
+
+
+def build_feedback_prompt(jd_text: str, resume_text: str, jd_match: dict, suggestions: dict) -> str:
+    return f"""
     You are an expert ATS and career coach.
     Below are the extracted details:
 
@@ -35,6 +49,28 @@ def generate_resume_feedback(jd_text: str, resume_text: str, jd_match: dict, sug
     - Avoids repeating the same skill list mechanically.
     """
 
-    model = genai.GenerativeModel("gemini-2.5-flash")
-    response = model.generate_content(prompt)
+
+def gemini_generate(prompt: str, timeout: float = None) -> str:
+    request_options = {"timeout": timeout} if timeout else None
+    response = _get_model().generate_content(prompt, request_options=request_options)
     return response.text
+
+
+def gemini_stream(prompt: str, timeout: float = None):
+    """Yield the feedback text piece by piece as Gemini generates it."""
+    request_options = {"timeout": timeout} if timeout else None
+    for chunk in _get_model().generate_content(prompt, stream=True, request_options=request_options):
+        # chunks without text (e.g. safety / finish metadata only) raise on .text
+        try:
+            text = chunk.text
+        except ValueError:
+            continue
+        if text:
+            yield text
+
+
+def generate_resume_feedback(jd_text: str, resume_text: str, jd_match: dict, suggestions: dict):
+    """
+    Generate AI-based feedback using Gemini, based on ATS analysis results.
+    """
+    return gemini_generate(build_feedback_prompt(jd_text, resume_text, jd_match, suggestions))
@@ -1,12 +1,30 @@
 # app/jd_match.py
-from sentence_transformers import SentenceTransformer, util
-from sklearn.feature_extraction.text import TfidfVectorizer
+import os
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional
 import numpy as np
 import re
-import spacy
 
-nlp = spacy.load("en_core_web_sm")
-embed_model = SentenceTransformer("all-MiniLM-L6-v2")
+from app.embed_cache import EmbeddingCache
+from app.embeddings import EMBED_BATCH_SIZE
+from app.experience import experience_match, jd_terms, resume_terms, resume_terms_batch
+from app.keyword_model import get_keyword_model, term_counts
+from app.models import EMBED_MODEL_ID, get_embed_model
+from app.parse import split_into_sections
+from app.skills import JDSkills, extract_jd_skills
+from app.scoring import (ScoreGrid, parse_weights, weights_matrix, keyword_grid, semantic_grid,
+                         skill_coverage_grid, experience_grid)
+from app.timing import span
+
+# keyed by model and backend: int8 / ONNX vectors never answer for fp32 ones
+embed_cache = EmbeddingCache(EMBED_MODEL_ID)
+
+# "whole": one embedding per document (the model truncates at 256 word pieces)
+# "chunked": section / sliding-window chunks, pooled against JD chunks
+SEMANTIC_MODE = os.getenv("SEMANTIC_MODE", "whole")
+# ~180 words stays under the 256 word-piece limit of all-MiniLM-L6-v2
+CHUNK_WORDS = int(os.getenv("CHUNK_WORDS", "180"))
+CHUNK_STRIDE = int(os.getenv("CHUNK_STRIDE", "120"))
 
 # -------------------------------------------------------
 #  BASIC TEXT PREPROCESSING
@@ -19,53 +37,122 @@ def preprocess(text: str) -> str:
 #  KEYWORD & SEMANTIC MATCHING
 # -------------------------------------------------------
 def keyword_overlap_score(jd_text: str, resume_text: str) -> float:
-    vec = TfidfVectorizer(stop_words="english", max_features=2000)
-    tfidf = vec.fit_transform([jd_text, resume_text])
-    sim = (tfidf[0] @ tfidf[1].T).toarray()[0][0]  # ✅ fixed
-    return float(sim)
+    """TF-IDF cosine with document frequencies from the stored corpus (see app.keyword_model)."""
+    return get_keyword_model().similarity(term_counts(jd_text), term_counts(resume_text))
+
+def embed_texts(texts: List[str], batch_size: int = EMBED_BATCH_SIZE) -> np.ndarray:
+    """L2-normalized embeddings for texts, served from the embedding cache when possible."""
+    def _encode(missing):
+        with span("embedding.encode"):
+            return get_embed_model().encode(missing, batch_size=batch_size)
+    return embed_cache.encode(texts, _encode)
 
 def semantic_similarity_score(jd_text: str, resume_text: str) -> float:
-    jd_emb = embed_model.encode(jd_text, convert_to_tensor=True)
-    res_emb = embed_model.encode(resume_text, convert_to_tensor=True)
-    sim = util.cos_sim(jd_emb, res_emb).item()
-    return float(sim)
+    jd_emb, res_emb = embed_texts([jd_text, resume_text])
+    # embeddings are normalized, so the dot product is the cosine similarity
+    sim = float(np.dot(jd_emb, res_emb))
+    return sim
+
+# -------------------------------------------------------
+#  CHUNKED (SECTION-AWARE) SEMANTIC MATCHING
+# -------------------------------------------------------
+def chunk_text(text: str, max_words: int = CHUNK_WORDS, stride: int = CHUNK_STRIDE) -> List[str]:
+    """Sliding windows of at most max_words words, overlapping by max_words - stride."""
+    words = text.split()
+    if len(words) <= max_words:
+        return [" ".join(words)] if words else []
+    chunks = []
+    for start in range(0, len(words), stride):
+        chunks.append(" ".join(words[start:start + max_words]))
+        if start + max_words >= len(words):
+            break
+    return chunks
+
+def section_chunks(sections: Dict[str, str]) -> List[tuple]:
+    """[(section name, chunk text)] for every non-empty section."""
+    out = []
+    for name, body in sections.items():
+        for chunk in chunk_text(body):
+            out.append((name, chunk))
+    return out
+
+def _pool_chunk_similarity(sim: np.ndarray, owners: List[str]) -> tuple:
+    """
+    sim is JD chunks x resume chunks. The score is the mean over JD chunks
+    of the best matching resume chunk (every part of the JD looks for its
+    strongest evidence); a section's score is its best chunk's mean
+    similarity to the JD chunks.
+    """
+    if sim.size == 0:
+        return 0.0, {}
+    score = float(sim.max(axis=1).mean())
+    per_chunk = sim.mean(axis=0)
+    per_section = {}
+    for name, value in zip(owners, per_chunk):
+        per_section[name] = max(per_section.get(name, -1.0), float(value))
+    return score, {k: round(v * 100, 1) for k, v in per_section.items()}
+
+def embed_chunks(resumes_chunks: List[List[tuple]], dim: int, batch_size: int = EMBED_BATCH_SIZE) -> np.ndarray:
+    """Embeddings of every chunk of every resume, stacked in order (one batched encode)."""
+    flat = [chunk for chunks in resumes_chunks for _, chunk in chunks]
+    return embed_texts(flat, batch_size=batch_size) if flat else np.zeros((0, dim), dtype=np.float32)
+
+def chunked_similarity_batch(jd_chunk_emb: np.ndarray, resumes_chunks: List[List[tuple]],
+                             batch_size: int = EMBED_BATCH_SIZE,
+                             chunk_embeddings: Optional[np.ndarray] = None) -> List[tuple]:
+    """
+    Chunked scores for many resumes with one batched encode over every
+    chunk of every resume (or the embed_chunks output, when scoring the
+    same resumes against several JDs). Returns [(score, per-section scores)].
+    """
+    if chunk_embeddings is None:
+        chunk_embeddings = embed_chunks(resumes_chunks, jd_chunk_emb.shape[1], batch_size)
+    sim = jd_chunk_emb @ chunk_embeddings.T
+    out = []
+    pos = 0
+    for chunks in resumes_chunks:
+        n = len(chunks)
+        out.append(_pool_chunk_similarity(sim[:, pos:pos + n], [name for name, _ in chunks]))
+        pos += n
+    return out
+
+def chunked_semantic_similarity(jd_text: str, resume_text: str,
+                                sections: Optional[Dict[str, str]] = None) -> tuple:
+    """(score, per-section scores) using section chunks instead of one truncated embedding."""
+    jd_emb = embed_texts(chunk_text(preprocess(jd_text)) or [""])
+    sections = sections if sections is not None else split_into_sections(resume_text)
+    return chunked_similarity_batch(jd_emb, [section_chunks(sections)])[0]
 
 # -------------------------------------------------------
 #  SKILL COVERAGE
 # -------------------------------------------------------
 def skill_coverage_score(jd_skills, resume_skills):
-    jd_skills = [s.lower() for s in jd_skills]
-    resume_skills = [s.lower() for s in resume_skills]
+    """Share of the JD's skills the resume has; jd_skills is a JDSkills (see extract_jd_skills) or a plain list."""
+    if isinstance(jd_skills, JDSkills):
+        return jd_skills.coverage(resume_skills)
     if not jd_skills:
         return 0.0
-    exact = len(set(jd_skills) & set(resume_skills))
+    exact = len({s.lower() for s in jd_skills} & {s.lower() for s in resume_skills})
     return exact / len(jd_skills)
 
 # -------------------------------------------------------
-#  EXPERIENCE RELEVANCE (very simple heuristic)
+#  EXPERIENCE RELEVANCE (JD noun terms in the resume, see app.experience)
 # -------------------------------------------------------
+def jd_noun_lemmas(jd_text: str) -> List[str]:
+    return list(jd_terms(jd_text))
+
+def noun_match_score(jd_nouns: List[str], resume_text: str) -> float:
+    return experience_match(jd_nouns, resume_terms(resume_text))[0]
+
 def experience_relevance_score(jd_text, resume_text):
-    jd_doc = nlp(jd_text.lower())
-    jd_nouns = [t.lemma_ for t in jd_doc if t.pos_ in ("NOUN", "PROPN")]
-    matches = sum(1 for noun in jd_nouns if noun in resume_text.lower())
-    return min(1.0, matches / max(10, len(jd_nouns)))
+    return noun_match_score(jd_noun_lemmas(jd_text), resume_text)
 
 # -------------------------------------------------------
 #  MAIN FUNCTION TO COMBINE ALL SCORES
 # -------------------------------------------------------
-def compute_jd_fit(jd_text, resume_text, jd_skills=None, resume_skills=None):
-    jd_text = preprocess(jd_text)
-    resume_text = preprocess(resume_text)
-    jd_skills = jd_skills or []
-    resume_skills = resume_skills or []
-
-    kw = keyword_overlap_score(jd_text, resume_text)
-    sem = semantic_similarity_score(jd_text, resume_text)
-    skill_cov = skill_coverage_score(jd_skills, resume_skills)
-    exp_rel = experience_relevance_score(jd_text, resume_text)
-
-    # Weight combination (tweak later)
-    w_kw, w_sem, w_skill, w_exp = 0.3, 0.3, 0.3, 0.1
+def combine_scores(kw: float, sem: float, skill_cov: float, exp_rel: float, weights=None) -> dict:
+    # weights: profile name / ScoreWeights / "keyword=..,..." (see app.scoring); default SCORE_WEIGHTS
+    w_kw, w_sem, w_skill, w_exp = parse_weights(weights)
     score = (w_kw * kw + w_sem * sem + w_skill * skill_cov + w_exp * exp_rel)
     final_score = round(score * 100, 1)
 
@@ -78,3 +165,173 @@ def compute_jd_fit(jd_text, resume_text, jd_skills=None, resume_skills=None):
             "experience_relevance": round(exp_rel * 100, 1),
         },
     }
+
+# -------------------------------------------------------
+#  JD FEATURES (everything that only depends on the JD)
+# -------------------------------------------------------
+@dataclass
+class JDFeatures:
+    """JD-side work, computed once and reused for every resume it is scored against."""
+    text: str
+    embedding: np.ndarray
+    nouns: List[str]
+    skills: List[str] = field(default_factory=list)
+    terms: Dict[str, int] = field(default_factory=dict)
+    chunk_embeddings: Optional[np.ndarray] = None
+    nice_skills: List[str] = field(default_factory=list)
+    requirements: Optional[JDSkills] = None
+
+    def get_chunk_embeddings(self) -> np.ndarray:
+        """JD chunk embeddings for chunked semantic mode (computed on first use)."""
+        if self.chunk_embeddings is None:
+            self.chunk_embeddings = embed_texts(chunk_text(self.text) or [""])
+        return self.chunk_embeddings
+
+    def get_requirements(self) -> JDSkills:
+        """skills (required) and nice_skills with their lookup sets, shared by coverage and suggestions."""
+        if self.requirements is None:
+            self.requirements = JDSkills.of(self.skills, self.nice_skills)
+        return self.requirements
+
+def prepare_jd(jd_text: str, jd_skills: Optional[List[str]] = None) -> JDFeatures:
+    """
+    JD-side features. Without jd_skills the skills come from the JD text
+    itself (required / nice-to-have, see app.skills.extract_jd_skills);
+    explicit jd_skills are all treated as required.
+    """
+    text = preprocess(jd_text)
+    # the raw text: line breaks tell headings and bullet lists apart
+    requirements = extract_jd_skills(jd_text) if jd_skills is None else JDSkills.of(jd_skills)
+    return JDFeatures(
+        text=text,
+        embedding=embed_texts([text])[0],
+        nouns=jd_noun_lemmas(text),
+        skills=list(requirements.required),
+        terms=term_counts(text),
+        nice_skills=list(requirements.nice_to_have),
+        requirements=requirements,
+    )
+
+def compute_jd_fit(jd_text, resume_text, jd_skills=None, resume_skills=None,
+                   jd_features: Optional[JDFeatures] = None, resume_sections: Optional[dict] = None,
+                   semantic_mode: Optional[str] = None, weights=None):
+    """
+    Score one resume against a JD. Pass jd_features (see prepare_jd /
+    app.jd_store) to skip all JD-side work; jd_skills then defaults to the
+    required / nice-to-have skills of the features. semantic_mode "chunked" scores
+    section chunks (resume_sections, or split from resume_text) and adds
+    per-section similarity to the result. weights picks the component
+    weights (see app.scoring.parse_weights).
+    """
+    semantic_mode = semantic_mode or SEMANTIC_MODE
+    if semantic_mode == "chunked" and resume_sections is None:
+        resume_sections = split_into_sections(resume_text)
+    resume_text = preprocess(resume_text)
+    resume_skills = resume_skills or []
+    if jd_features is None:
+        with span("jd_match.prepare_jd"):
+            jd_features = prepare_jd(jd_text, jd_skills)
+    if jd_skills is None:
+        jd_skills = jd_features.get_requirements()
+
+    with span("jd_match.keyword"):
+        keywords = get_keyword_model()
+        kw = float(keywords.score_batch(jd_features.terms, [resume_text])[0])
+    section_sim = None
+    with span("jd_match.semantic"):
+        if semantic_mode == "chunked":
+            sem, section_sim = chunked_similarity_batch(jd_features.get_chunk_embeddings(),
+                                                        [section_chunks(resume_sections)])[0]
+        else:
+            res_emb = embed_texts([resume_text])[0]
+            # embeddings are normalized, so the dot product is the cosine similarity
+            sem = float(np.dot(jd_features.embedding, res_emb))
+    with span("jd_match.skills"):
+        skill_cov = skill_coverage_score(jd_skills, resume_skills)
+    with span("jd_match.experience"):
+        exp_rel, exp_matches = experience_match(jd_features.nouns, resume_terms(resume_text))
+
+    result = combine_scores(kw, sem, skill_cov, exp_rel, weights)
+    result["experience_matches"] = exp_matches
+    if section_sim is not None:
+        result["section_similarity"] = section_sim
+    return result
+
+# -------------------------------------------------------
+#  GRID SCORING (many JDs against many resumes)
+# -------------------------------------------------------
+def score_grid(jds: List[JDFeatures], resumes: List[dict], weights=None,
+               semantic_mode: Optional[str] = None, batch_size: int = EMBED_BATCH_SIZE) -> ScoreGrid:
+    """
+    Every JD (rows) against every resume (columns) in a few matrix
+    operations (see app.scoring). Resumes are dicts with "text" and
+    optionally "skills" and "sections" (chunked semantic mode); weights is
+    one spec for all JDs or a list with one per JD.
+    """
+    texts = [preprocess(r.get("text") or "") for r in resumes]
+
+    # keyword overlap: count rows for both sides first so the tf-idf rows share one vocabulary width
+    with span("jd_match.keyword"):
+        keywords = get_keyword_model()
+        space = keywords.space()
+        jd_counts = keywords.counts_to_matrix([jd.terms for jd in jds], space)
+        resume_counts = keywords.count_matrix(texts, space)
+        kw = keyword_grid(space.tfidf(jd_counts), space.tfidf(resume_counts))
+
+    section_sims = None
+    with span("jd_match.semantic"):
+        if (semantic_mode or SEMANTIC_MODE) == "chunked":
+            chunks = [section_chunks(r.get("sections") or split_into_sections(r.get("text") or ""))
+                      for r in resumes]
+            jd_chunk_emb = [jd.get_chunk_embeddings() for jd in jds]
+            dim = jd_chunk_emb[0].shape[1] if jds else 0
+            chunk_emb = embed_chunks(chunks, dim, batch_size)
+            pooled = [chunked_similarity_batch(emb, chunks, chunk_embeddings=chunk_emb) for emb in jd_chunk_emb]
+            sem = np.asarray([[p[0] for p in row] for row in pooled], dtype=np.float64).reshape(len(jds), len(resumes))
+            section_sims = [[p[1] for p in row] for row in pooled]
+        else:
+            # batched encode, normalized -> dot product is cosine
+            resume_emb = embed_texts(texts, batch_size=batch_size) if texts else np.zeros((0, 0))
+            jd_emb = np.vstack([jd.embedding for jd in jds]) if jds else np.zeros((0, resume_emb.shape[1]))
+            sem = semantic_grid(jd_emb, resume_emb) if texts else np.zeros((len(jds), 0))
+
+    with span("jd_match.skills"):
+        requirements = [jd.get_requirements() for jd in jds]
+        skills = skill_coverage_grid([r.required for r in requirements], [r.get("skills") or [] for r in resumes],
+                                     [r.nice_to_have for r in requirements])
+    with span("jd_match.experience"):
+        # one nlp.pipe pass over the resumes not cached yet
+        jd_nouns = [jd.nouns for jd in jds]
+        resume_term_sets = resume_terms_batch(texts)
+        exp = experience_grid(jd_nouns, resume_term_sets)
+
+    components = {"keyword": kw, "semantic": sem, "skills": skills, "experience": exp}
+    return ScoreGrid(components, weights_matrix(weights, len(jds)), section_sims,
+                     experience_terms=(jd_nouns, resume_term_sets))
+
+# -------------------------------------------------------
+#  BATCH RANKING (one JD against many resumes)
+# -------------------------------------------------------
+def rank_resumes(jd_text: Optional[str], resumes: List[dict], jd_skills: Optional[List[str]] = None,
+                 top_k: Optional[int] = None, batch_size: int = EMBED_BATCH_SIZE,
+                 jd_features: Optional[JDFeatures] = None,
+                 semantic_mode: Optional[str] = None, weights=None) -> List[dict]:
+    """
+    Score one JD against many resumes and return them ranked by final_score.
+
+    Each resume is a dict with "text" and optionally "filename", "skills"
+    and "sections" (used by the chunked semantic mode).
+    This is the single-row case of score_grid: the JD is encoded and
+    parsed once, resumes are embedded in batches and every component is
+    one matrix product.
+    """
+    if not resumes:
+        return []
+    jd = jd_features or prepare_jd(jd_text, jd_skills)
+    if jd_features is not None and jd_skills is not None:
+        jd = replace(jd, skills=list(jd_skills), nice_skills=[], requirements=None)
+    grid = score_grid([jd], resumes, weights=weights, semantic_mode=semantic_mode, batch_size=batch_size)
+    ranked = grid.ranked(0, top_k)
+    for r in ranked:
+        r["filename"] = resumes[r["index"]].get("filename")
+    return ranked
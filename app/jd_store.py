@@ -0,0 +1,133 @@
+# app/jd_store.py
+"""
+JD registry: store a job description once, precompute everything the
+scorers need from it (embedding, TF-IDF term counts, noun lemmas, skills)
+and hand back a jd_id that scoring calls can use instead of the raw text.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from app.db import save_jd, get_jd, find_jd_by_hash, list_jds, update_jd_embedding, update_jd_features
+from app.experience import jd_terms
+from app.jd_match import JDFeatures, prepare_jd, preprocess, embed_texts
+from app.keyword_model import record_documents
+from app.models import EMBED_MODEL_ID
+from app.skills import JDSkills, extract_jd_skills
+
+# Recently used JDs kept decoded in memory
+FEATURE_CACHE_SIZE = 256
+# Bump when the stored experience terms (nouns) or the required / nice-to-have split change;
+# older rows are re-derived once on first use
+JD_FEATURES_VERSION = "3"
+
+_features: "OrderedDict[int, JDFeatures]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def jd_text_hash(text: str) -> str:
+    return hashlib.sha256(preprocess(text).encode("utf-8")).hexdigest()
+
+
+def _remember(jd_id: int, features: JDFeatures):
+    with _lock:
+        _features[jd_id] = features
+        _features.move_to_end(jd_id)
+        while len(_features) > FEATURE_CACHE_SIZE:
+            _features.popitem(last=False)
+
+
+def _summary(record: dict) -> dict:
+    return {
+        "jd_id": record["id"],
+        "created_at": record["created_at"],
+        "title": record["title"],
+        "text": record["text"],
+        "skills": record["skills"],
+        "noun_count": len(record["nouns"]),
+        "term_count": len(record["terms"]),
+        "embedding_model": record["embedding_model"],
+    }
+
+
+def create_jd(text: str, title: Optional[str] = None) -> dict:
+    """Store a JD (or return the existing entry for identical text) with all features precomputed."""
+    text_hash = jd_text_hash(text)
+    existing = find_jd_by_hash(text_hash)
+    if existing is not None:
+        return describe_jd(existing)
+
+    features = prepare_jd(text)
+    jd_id = save_jd(
+        title=title,
+        text=text,
+        text_hash=text_hash,
+        embedding_model=EMBED_MODEL_ID,
+        embedding=np.asarray(features.embedding, dtype=np.float32).tobytes(),
+        nouns=features.nouns,
+        terms=features.terms,
+        skills=features.skills + features.nice_skills,
+        nice_skills=features.nice_skills,
+        features_version=JD_FEATURES_VERSION,
+    )
+    _remember(jd_id, features)
+    record_documents([text])
+    return describe_jd(jd_id)
+
+
+def describe_jd(jd_id: int) -> Optional[dict]:
+    record = get_jd(jd_id)
+    return _summary(record) if record else None
+
+
+def get_jd_features(jd_id: int) -> Optional[JDFeatures]:
+    """Precomputed features for a stored JD (None if the id is unknown)."""
+    with _lock:
+        features = _features.get(jd_id)
+        if features is not None:
+            _features.move_to_end(jd_id)
+            return features
+
+    record = get_jd(jd_id)
+    if record is None:
+        return None
+    text = preprocess(record["text"])
+    if record["embedding_model"] == EMBED_MODEL_ID and record["embedding"]:
+        embedding = np.frombuffer(record["embedding"], dtype=np.float32)
+    else:
+        # embedding model changed since the JD was stored: re-embed once and persist
+        embedding = embed_texts([text])[0]
+        update_jd_embedding(jd_id, EMBED_MODEL_ID, np.asarray(embedding, dtype=np.float32).tobytes())
+    if record["features_version"] == JD_FEATURES_VERSION:
+        nice = set(record["nice_skills"])
+        requirements = JDSkills.of([s for s in record["skills"] if s not in nice], record["nice_skills"])
+        nouns = record["nouns"]
+    else:
+        # stored by an older version (before noun phrases / the skill split): re-derive once and persist
+        requirements = extract_jd_skills(record["text"])
+        nouns = list(jd_terms(text))
+        update_jd_features(jd_id, nouns, list(requirements.required + requirements.nice_to_have),
+                           list(requirements.nice_to_have), JD_FEATURES_VERSION)
+    features = JDFeatures(
+        text=text,
+        embedding=embedding,
+        nouns=nouns,
+        skills=list(requirements.required),
+        terms=record["terms"],
+        nice_skills=list(requirements.nice_to_have),
+        requirements=requirements,
+    )
+    _remember(jd_id, features)
+    return features
+
+
+def get_jd_text(jd_id: int) -> Optional[str]:
+    record = get_jd(jd_id)
+    return record["text"] if record else None
+
+
+def list_stored_jds(limit: int = 50, offset: int = 0) -> list:
+    return list_jds(limit=limit, offset=offset)
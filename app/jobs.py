@@ -0,0 +1,199 @@
+# app/jobs.py
+"""
+Persistent job queue for asynchronous uploads.
+
+POST /jobs stores the uploaded bytes and parameters in the jobs table and
+returns a job id straight away. A few asyncio consumers inside the API
+process claim queued rows one at a time and run the same analysis as
+/upload; every finished stage (extraction, jd_match, suggestions,
+ai_feedback) is written back to the row, so GET /jobs/{id} shows partial
+results while the job is still running. Jobs left "running" by a crash or
+restart are put back on the queue at startup.
+
+When a job finishes, an optional callback URL receives the final job
+document as a JSON POST. Only local hosts (JOB_CALLBACK_HOSTS) are
+allowed as callback targets.
+"""
+import asyncio
+import json
+import os
+import urllib.request
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional
+from urllib.parse import urlparse
+
+from app.db import (save_job, claim_next_job, update_job_stage, finish_job, requeue_job, recover_jobs,
+                    get_job, count_jobs, prune_jobs)
+from app.workers import PoolSaturated, PoolUnavailable, RETRY_AFTER_SECONDS
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "1000"))
+# consumers also re-check the table this often (jobs queued by another process)
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "72"))
+JOB_CALLBACK_HOSTS = {h.strip() for h in os.getenv("JOB_CALLBACK_HOSTS", "127.0.0.1,localhost,::1").split(",")
+                      if h.strip()}
+JOB_CALLBACK_TIMEOUT = float(os.getenv("JOB_CALLBACK_TIMEOUT", "5"))
+
+# handler(job, report_stage) -> final result; report_stage(name, partial_result)
+StageReporter = Callable[[str, object], Awaitable[None]]
+JobHandler = Callable[[dict, StageReporter], Awaitable[dict]]
+
+
+class QueueFull(Exception):
+    """Too many jobs are waiting (maps to HTTP 429)."""
+
+
+def check_callback_url(url: Optional[str]):
+    """Raise ValueError unless url is an http(s) URL on an allowed local host."""
+    if not url:
+        return
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or parsed.hostname not in JOB_CALLBACK_HOSTS:
+        raise ValueError(f"callback_url must be http(s) on one of: {', '.join(sorted(JOB_CALLBACK_HOSTS))}")
+
+
+def _post_callback(url: str, payload: dict):
+    req = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"), method="POST",
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=JOB_CALLBACK_TIMEOUT) as resp:
+        resp.read()
+
+
+def describe_job(job: dict) -> dict:
+    """Public view of a job row."""
+    out = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+        "attempts": job["attempts"],
+        "filename": job["filename"],
+        "stages": job["stages"],
+        "result": job["result"],
+        "error": job["error"],
+    }
+    if "queue_position" in job:
+        out["queue_position"] = job["queue_position"]
+    return out
+
+
+class JobQueue:
+    def __init__(self, workers: int = JOB_WORKERS, max_queued: int = JOB_MAX_QUEUED):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.completed = 0
+        self.failed = 0
+        self._handler: Optional[JobHandler] = None
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    # -------------------------------------------------------
+    #  LIFECYCLE
+    # -------------------------------------------------------
+    async def start(self, handler: JobHandler):
+        if self._tasks:
+            return
+        self._handler = handler
+        self._wakeup = asyncio.Event()
+        requeued = await asyncio.to_thread(recover_jobs, JOB_MAX_ATTEMPTS)
+        if requeued:
+            print(f"Job queue: requeued {requeued} interrupted job(s)")
+        cutoff = (datetime.utcnow() - timedelta(hours=JOB_RETENTION_HOURS)).isoformat()
+        await asyncio.to_thread(prune_jobs, cutoff)
+        self._tasks = [asyncio.create_task(self._consume(), name=f"job-worker-{i}") for i in range(self.workers)]
+
+    async def stop(self):
+        # a job cut off here stays "running" in the table and is requeued by the next start()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # -------------------------------------------------------
+    #  SUBMISSION / STATUS
+    # -------------------------------------------------------
+    async def submit(self, filename: str, content_type: Optional[str], file_bytes: bytes, params: dict,
+                     callback_url: Optional[str] = None) -> dict:
+        check_callback_url(callback_url)
+        counts = await asyncio.to_thread(count_jobs)
+        if counts.get("queued", 0) >= self.max_queued:
+            raise QueueFull(f"job queue is full ({counts['queued']} queued)")
+        job_id = uuid.uuid4().hex
+        await asyncio.to_thread(save_job, job_id, filename, content_type, file_bytes, params, callback_url)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return await self.get(job_id)
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        job = await asyncio.to_thread(get_job, job_id)
+        return describe_job(job) if job else None
+
+    async def stats(self) -> dict:
+        counts = await asyncio.to_thread(count_jobs)
+        return {
+            "workers": len(self._tasks),
+            "queued": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "completed_since_start": self.completed,
+            "failed_since_start": self.failed,
+        }
+
+    # -------------------------------------------------------
+    #  CONSUMERS
+    # -------------------------------------------------------
+    async def _consume(self):
+        while True:
+            try:
+                job = await asyncio.to_thread(claim_next_job)
+            except Exception as e:
+                print("Warning: job claim failed:", e)
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job: dict):
+        job_id = job["id"]
+        stages = dict(job["stages"])
+
+        async def report_stage(name: str, value):
+            stages[name] = value
+            await asyncio.to_thread(update_job_stage, job_id, name, stages)
+
+        try:
+            result = await self._handler(job, report_stage)
+        except (PoolSaturated, PoolUnavailable):
+            # the worker pools are busy / restarting: back off and retry later
+            await asyncio.to_thread(requeue_job, job_id)
+            await asyncio.sleep(RETRY_AFTER_SECONDS)
+            return
+        except Exception as e:
+            error = getattr(e, "detail", None) or str(e) or type(e).__name__
+            await asyncio.to_thread(finish_job, job_id, "failed", None, str(error))
+            self.failed += 1
+        else:
+            await asyncio.to_thread(finish_job, job_id, "done", result)
+            self.completed += 1
+        if job.get("callback_url"):
+            await self._notify(job["callback_url"], job_id)
+
+    async def _notify(self, url: str, job_id: str):
+        try:
+            payload = await self.get(job_id)
+            await asyncio.to_thread(_post_callback, url, payload)
+        except Exception as e:
+            print(f"Warning: job {job_id} callback to {url} failed:", e)
+
+
+job_queue = JobQueue()
@@ -0,0 +1,422 @@
+# app/keyword_model.py
+"""
+Corpus-level TF-IDF keyword model.
+
+Document frequencies come from the stored resume / JD corpus instead of
+the two documents being compared, so a term that every resume mentions
+weighs less than a rare one. The model is fitted once from the database,
+persisted with joblib next to it (KEYWORD_MODEL_PATH) and kept current
+incrementally: every newly stored resume or JD adds its terms to the
+document frequencies. Several server processes share the file: each one
+saves only the documents it added since its last save, merged into what
+is on disk under an exclusive flock, and picks up the others' documents
+in the same step. A full refit can also run on a schedule
+(KEYWORD_REFIT_SECONDS).
+
+Documents are turned into sparse term-count rows (cached per text, since
+counts do not depend on the idf); the idf is applied at scoring time, so
+scoring many resumes is one sparse matrix product. Tokenization and the
+weighting (smoothed idf, raw tf, L2 norm) match
+TfidfVectorizer(stop_words="english") fitted on the corpus, except that
+terms the corpus has never seen get the maximum idf instead of being
+dropped. Only fitted documents add columns to the vocabulary: unseen
+terms get transient columns in the TermSpace of one scoring call.
+"""
+import fcntl
+import hashlib
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import joblib
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+from app.db import DB_PATH, count_corpus, iter_corpus_texts
+
+KEYWORD_MODEL_PATH = os.getenv(
+    "KEYWORD_MODEL_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), "keyword_model.joblib"),
+)
+KEYWORD_CACHE_ITEMS = int(os.getenv("KEYWORD_CACHE_ITEMS", "10000"))
+# write the model back to disk after this many incremental updates
+KEYWORD_SAVE_EVERY = int(os.getenv("KEYWORD_SAVE_EVERY", "50"))
+# full refit from the database every N seconds (0 = incremental updates only)
+KEYWORD_REFIT_SECONDS = float(os.getenv("KEYWORD_REFIT_SECONDS", "0"))
+MODEL_FORMAT = 1
+
+# same tokenization / stop words as TfidfVectorizer(stop_words="english")
+_analyzer = TfidfVectorizer(stop_words="english").build_analyzer()
+
+
+def term_counts(text: str) -> Dict[str, int]:
+    return dict(Counter(_analyzer(text)))
+
+
+class TermSpace:
+    """
+    Columns for one scoring call: the model's vocabulary and idf as of its
+    creation, plus a transient column (maximum idf) for every other term.
+    Count matrices built in one space share column ids, so they can be
+    multiplied together.
+    """
+
+    def __init__(self, model: "KeywordModel"):
+        with model._lock:
+            self.vocab = model.vocab  # append-only; columns added after base count as transient here
+            self.terms = model.terms
+            self.base = len(model.vocab)
+            self.base_idf = model.idf()
+            # idf of a term with df 0
+            self.max_idf = np.log(1.0 + model.n_docs) + 1.0
+        self.extra: Dict[str, int] = {}
+
+    @property
+    def width(self) -> int:
+        return self.base + len(self.extra)
+
+    def _column(self, term: str) -> int:
+        col = self.vocab.get(term)
+        if col is not None and col < self.base:
+            return col
+        return self.base + self.extra.setdefault(term, len(self.extra))
+
+    def matrix(self, rows: List[tuple]) -> sparse.csr_matrix:
+        """Count matrix for rows from KeywordModel._row / _split."""
+        indptr, indices, data = [0], [], []
+        for cols, vals, unseen, unseen_vals in rows:
+            late = cols >= self.base
+            if late.any():
+                # fitted after this space was made: transient here
+                unseen = [self.terms[c] for c in cols[late]] + list(unseen)
+                unseen_vals = np.concatenate([vals[late], unseen_vals])
+                cols, vals = cols[~late], vals[~late]
+            indices.append(cols)
+            indices.append(np.fromiter((self._column(t) for t in unseen), dtype=np.int64, count=len(unseen)))
+            data.append(vals)
+            data.append(unseen_vals)
+            indptr.append(indptr[-1] + len(cols) + len(unseen))
+        indices = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64)
+        data = np.concatenate(data) if data else np.zeros(0)
+        return sparse.csr_matrix((data, indices, np.asarray(indptr, dtype=np.int64)), shape=(len(rows), self.width))
+
+    def tfidf(self, counts: sparse.csr_matrix) -> sparse.csr_matrix:
+        """L2-normalized tf-idf rows for a count matrix from this space."""
+        idf = np.concatenate([self.base_idf, np.full(len(self.extra), self.max_idf)])
+        counts = counts.copy()
+        counts.resize((counts.shape[0], len(idf)))
+        return normalize(counts @ sparse.diags(idf), norm="l2", copy=False).tocsr()
+
+
+class KeywordModel:
+    def __init__(self):
+        self.vocab: Dict[str, int] = {}
+        self.terms: List[str] = []
+        self.n_docs = 0
+        self.fitted_at: Optional[str] = None
+        self.updates_since_save = 0
+        # added since the last save: merged into the file by save()
+        self._pending: Counter = Counter()
+        # fit() replaces the file instead of merging into it
+        self._replace = False
+        self._df = np.zeros(0, dtype=np.int64)
+        self._idf: Optional[np.ndarray] = None
+        self._rows: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    # -------------------------------------------------------
+    #  VOCABULARY / DOCUMENT FREQUENCIES
+    # -------------------------------------------------------
+    def _add_columns(self, counts: Dict[str, int]) -> np.ndarray:
+        """Column ids for a fitted document's terms; its new terms get new columns."""
+        with self._lock:
+            cols = []
+            for term in counts:
+                col = self.vocab.get(term)
+                if col is None:
+                    col = len(self.vocab)
+                    self.vocab[term] = col
+                    self.terms.append(term)
+                cols.append(col)
+            if len(self.vocab) > len(self._df):
+                df = np.zeros(max(len(self.vocab), 2 * len(self._df), 1024), dtype=np.int64)
+                df[:len(self._df)] = self._df
+                self._df = df
+        return np.asarray(cols, dtype=np.int64)
+
+    def _split(self, counts: Dict[str, int]) -> tuple:
+        """(column ids, counts) of the vocabulary terms, (terms, counts) of the rest; the vocabulary is not touched."""
+        cols, vals, unseen, unseen_vals = [], [], [], []
+        for term, count in counts.items():
+            col = self.vocab.get(term)
+            if col is None:
+                unseen.append(term)
+                unseen_vals.append(count)
+            else:
+                cols.append(col)
+                vals.append(count)
+        return (np.asarray(cols, dtype=np.int64), np.asarray(vals, dtype=np.float64),
+                tuple(unseen), np.asarray(unseen_vals, dtype=np.float64))
+
+    def add_documents(self, docs: Iterable[Dict[str, int]]):
+        """Incremental fit: count each document's terms into the document frequencies."""
+        with self._lock:
+            for counts in docs:
+                cols = self._add_columns(counts)
+                self._df[cols] += 1
+                self._pending.update(counts.keys())
+                self.n_docs += 1
+                self.updates_since_save += 1
+            self._idf = None
+
+    def fit(self, docs: Iterable[Dict[str, int]]) -> "KeywordModel":
+        with self._lock:
+            self.vocab = {}
+            self.terms = []
+            self._df = np.zeros(0, dtype=np.int64)
+            self.n_docs = 0
+            self._rows.clear()
+            self.add_documents(docs)
+            self.fitted_at = datetime.utcnow().isoformat()
+            self._replace = True
+        return self
+
+    def idf(self) -> np.ndarray:
+        """Smoothed idf per column: ln((1 + n) / (1 + df)) + 1."""
+        with self._lock:
+            if self._idf is None or len(self._idf) != len(self.vocab):
+                df = self._df[:len(self.vocab)]
+                self._idf = np.log((1.0 + self.n_docs) / (1.0 + df)) + 1.0
+            return self._idf
+
+    # -------------------------------------------------------
+    #  TRANSFORM
+    # -------------------------------------------------------
+    def _row(self, text: str) -> tuple:
+        key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            row = self._rows.get(key)
+            if row is not None:
+                self._rows.move_to_end(key)
+                self.cache_hits += 1
+                return row
+        row = self._split(term_counts(text))
+        with self._lock:
+            self.cache_misses += 1
+            self._rows[key] = row
+            while len(self._rows) > KEYWORD_CACHE_ITEMS:
+                self._rows.popitem(last=False)
+        return row
+
+    def space(self) -> TermSpace:
+        return TermSpace(self)
+
+    def count_matrix(self, texts: List[str], space: TermSpace) -> sparse.csr_matrix:
+        """Raw term counts in space, one row per text (rows are cached per document)."""
+        return space.matrix([self._row(t) for t in texts])
+
+    def counts_to_matrix(self, counts_list: List[Dict[str, int]], space: TermSpace) -> sparse.csr_matrix:
+        return space.matrix([self._split(c) for c in counts_list])
+
+    def transform(self, texts: List[str]) -> sparse.csr_matrix:
+        space = self.space()
+        return space.tfidf(self.count_matrix(texts, space))
+
+    # -------------------------------------------------------
+    #  SCORING
+    # -------------------------------------------------------
+    def similarity(self, a_counts: Dict[str, int], b_counts: Dict[str, int]) -> float:
+        """TF-IDF cosine of two term-count dicts."""
+        space = self.space()
+        a = self.counts_to_matrix([a_counts], space)
+        b = self.counts_to_matrix([b_counts], space)
+        return float((space.tfidf(b) @ space.tfidf(a).T).toarray()[0, 0])
+
+    def score_batch(self, query_counts: Dict[str, int], texts: List[str]) -> np.ndarray:
+        """Cosine of one query (term counts) against every text."""
+        space = self.space()
+        query = self.counts_to_matrix([query_counts], space)
+        docs = self.count_matrix(texts, space)
+        return (space.tfidf(docs) @ space.tfidf(query).T).toarray().ravel()
+
+    # -------------------------------------------------------
+    #  PERSISTENCE
+    # -------------------------------------------------------
+    def _state(self) -> dict:
+        df = self._df[:len(self.vocab)]
+        terms = [t for t, col in self.vocab.items() if df[col] > 0]
+        return {
+            "format": MODEL_FORMAT,
+            "terms": terms,
+            "df": np.asarray([df[self.vocab[t]] for t in terms], dtype=np.int64),
+            "n_docs": self.n_docs,
+            "fitted_at": self.fitted_at,
+        }
+
+    def save(self, path: str = KEYWORD_MODEL_PATH):
+        """
+        Write the model, merged with the file's current contents: other
+        processes may have saved their own documents since this one loaded
+        it. The merged statistics also become this model's.
+        """
+        with open(path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with self._lock:
+                    pending, n_pending, replace = self._pending, self.updates_since_save, self._replace
+                    self._pending, self.updates_since_save, self._replace = Counter(), 0, False
+                    state = self._state() if replace or not os.path.exists(path) else None
+                try:
+                    if state is None:
+                        state = self.load_state(path)
+                        df = Counter(dict(zip(state["terms"], state["df"].tolist())))
+                        df.update(pending)
+                        state.update(terms=list(df), df=np.asarray(list(df.values()), dtype=np.int64),
+                                     n_docs=state["n_docs"] + n_pending)
+                    tmp = path + ".tmp"
+                    joblib.dump(state, tmp)
+                    os.replace(tmp, path)
+                except Exception:
+                    with self._lock:
+                        # not saved: keep the documents for the next attempt
+                        self._pending.update(pending)
+                        self.updates_since_save += n_pending
+                        self._replace = self._replace or replace
+                    raise
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        if not replace:
+            self._adopt(state)
+
+    def _adopt(self, state: dict):
+        """Take the saved statistics, plus whatever was added here while saving."""
+        with self._lock:
+            df = Counter(dict(zip(state["terms"], state["df"].tolist())))
+            df.update(self._pending)
+            self._add_columns(df)
+            self._df[:] = 0
+            for term, count in df.items():
+                self._df[self.vocab[term]] = count
+            self.n_docs = state["n_docs"] + self.updates_since_save
+            self._idf = None
+
+    @staticmethod
+    def load_state(path: str) -> dict:
+        state = joblib.load(path)
+        if state.get("format") != MODEL_FORMAT:
+            raise ValueError(f"unsupported keyword model format {state.get('format')!r}")
+        return state
+
+    @classmethod
+    def load(cls, path: str = KEYWORD_MODEL_PATH) -> "KeywordModel":
+        state = cls.load_state(path)
+        model = cls()
+        model.terms = list(state["terms"])
+        model.vocab = {t: i for i, t in enumerate(model.terms)}
+        model._df = np.asarray(state["df"], dtype=np.int64)
+        model.n_docs = state["n_docs"]
+        model.fitted_at = state["fitted_at"]
+        return model
+
+    def stats(self) -> dict:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "documents": self.n_docs,
+            "vocabulary": len(self.vocab),
+            "fitted_at": self.fitted_at,
+            "cached_rows": len(self._rows),
+            "cache_hit_rate": round(self.cache_hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# -------------------------------------------------------
+#  SHARED MODEL
+# -------------------------------------------------------
+_model: Optional[KeywordModel] = None
+_model_lock = threading.Lock()
+_refit_thread: Optional[threading.Thread] = None
+
+
+def fit_from_corpus() -> KeywordModel:
+    """Fit a fresh model on every stored resume and JD."""
+    return KeywordModel().fit(term_counts(t) for t in iter_corpus_texts())
+
+
+def get_keyword_model() -> KeywordModel:
+    """
+    Process-wide model: loaded from KEYWORD_MODEL_PATH, or fitted from the
+    database on first use (also when the saved model has fallen behind the
+    stored corpus, e.g. after a crash between saves).
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                model = None
+                if os.path.exists(KEYWORD_MODEL_PATH):
+                    try:
+                        model = KeywordModel.load(KEYWORD_MODEL_PATH)
+                        if model.n_docs != count_corpus():
+                            model = None
+                    except Exception as e:
+                        print("Warning: could not load keyword model, refitting:", e)
+                        model = None
+                if model is None:
+                    try:
+                        model = fit_from_corpus()
+                        model.save(KEYWORD_MODEL_PATH)
+                    except Exception as e:
+                        # no database / read-only disk: start from an empty corpus
+                        print("Warning: keyword model fit failed:", e)
+                        model = model or KeywordModel()
+                _model = model
+    return _model
+
+
+def record_documents(texts: List[str]):
+    """Add newly stored documents to the corpus statistics (saved every KEYWORD_SAVE_EVERY)."""
+    model = get_keyword_model()
+    model.add_documents(term_counts(t) for t in texts)
+    if model.updates_since_save >= KEYWORD_SAVE_EVERY:
+        try:
+            model.save(KEYWORD_MODEL_PATH)
+        except Exception as e:
+            print("Warning: keyword model save failed:", e)
+
+
+def save_keyword_model():
+    """Persist pending incremental updates (called on shutdown)."""
+    if _model is not None and _model.updates_since_save:
+        _model.save(KEYWORD_MODEL_PATH)
+
+
+def refit():
+    """Rebuild the model from the database and swap it in."""
+    global _model
+    model = fit_from_corpus()
+    model.save(KEYWORD_MODEL_PATH)
+    _model = model
+
+
+def _refit_loop(interval: float):
+    while True:
+        time.sleep(interval)
+        try:
+            refit()
+        except Exception as e:
+            print("Warning: scheduled keyword refit failed:", e)
+
+
+def start_refit_schedule(interval: float = KEYWORD_REFIT_SECONDS):
+    """Refit in a background thread every interval seconds (no-op when interval is 0)."""
+    global _refit_thread
+    if interval > 0 and _refit_thread is None:
+        _refit_thread = threading.Thread(target=_refit_loop, args=(interval,), name="keyword-refit", daemon=True)
+        _refit_thread.start()
@@ -1,20 +1,37 @@
 # app/main.py
+import asyncio
+import json
 import os
-from fastapi import FastAPI, File, UploadFile, Form
+from datetime import datetime
+from functools import partial
+from typing import List
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
-from app.extract import (
-    extract_text_from_pdf_bytes,
-    extract_text_from_docx_bytes,
-    extract_text_from_image_bytes,
-)
-from app.parse import split_into_sections, extract_contact, extract_skills
-from app.jd_match import compute_jd_fit
+from app.pipeline import extract_and_parse, content_digest, PARSER_VERSION
+from app.jd_match import compute_jd_fit, rank_resumes, score_grid, prepare_jd, embed_cache
+from app.keyword_model import get_keyword_model, start_refit_schedule, save_keyword_model
+from app.jd_store import create_jd, describe_jd, get_jd_features, list_stored_jds
+from app.resume_store import store_resume, search_resumes, get_resume_index
+from app.scoring import parse_weights
 from app.suggestions import generate_skill_suggestions, generate_text_suggestions
-from app.gemini_feedback import generate_resume_feedback
+from app.feedback import feedback_service
+from app import experience
 
 # DB helpers
-from app.db import init_db, save_result  # new
+from app.db import init_db, enqueue_result, enqueue_results, get_cached_extraction, save_cached_extraction  # new
+from app.db import flush_extraction_hits
+from app.db import writer as db_writer
+from app.db import query_results, score_histogram, top_skills, result_jd_hash, get_resumes
+from app import models
+from app.workers import pools, PoolSaturated, PoolUnavailable, RETRY_AFTER_SECONDS
+from app.jobs import job_queue, QueueFull
+from app.uploads import spool_upload, sniff_kind, UploadTooLarge, UnsupportedUpload
+from app import uploads
+from app import metrics
+from app.timing import collect, current, span
+from app.profiling import profile_request, requested_format, ProfilerBusy
 
 # ---------------------------------------------------------
 #  FASTAPI CONFIG
@@ -29,86 +46,787 @@ except Exception as e:
     # don't block app if DB init fails; log to console
     print("Warning: init_db failed:", e)
 
+# Load models at import time (before gunicorn --preload forks workers) or in the background
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "false").lower() in ("1", "true", "yes")
+WARMUP_MODELS = os.getenv("WARMUP_MODELS", "true").lower() in ("1", "true", "yes")
+if PRELOAD_MODELS:
+    models.preload()
+
 # Read environment flag (default off)
 SAVE_RESULTS = os.getenv("SAVE_RESULTS", "false").lower() in ("1", "true", "yes")
+# Reuse extract/parse output for byte-identical re-uploads (default on)
+EXTRACTION_CACHE = os.getenv("EXTRACTION_CACHE", "true").lower() in ("1", "true", "yes")
+# AI feedback: "sync" (wait for it), "lazy" (return scores now, poll /feedback/{id}) or "off"
+FEEDBACK_MODE = os.getenv("FEEDBACK_MODE", "sync").lower()
+FEEDBACK_MODES = ("sync", "lazy", "off")
+# /upload/stream also takes "stream": feedback text sent piece by piece as it is generated
+STREAM_FEEDBACK_MODES = FEEDBACK_MODES + ("stream",)
+# always add the per-stage "timings" block to /upload responses (else only when asked for)
+RESPONSE_TIMINGS = os.getenv("RESPONSE_TIMINGS", "false").lower() in ("1", "true", "yes")
 
 # ---------------------------------------------------------
-#  MAIN ROUTE
+#  WORKER POOLS (keep CPU-bound work off the event loop)
 # ---------------------------------------------------------
-@app.post("/upload")
-async def upload_resume(file: UploadFile = File(...), jd: str = Form(None)):
-    contents = await file.read()
-    content_type = file.content_type or ""
-    text = ""
-
-    # Extract text by file type
-    if "pdf" in content_type or file.filename.lower().endswith(".pdf"):
-        text = extract_text_from_pdf_bytes(contents)
-    elif file.filename.lower().endswith((".docx", ".doc")):
-        text = extract_text_from_docx_bytes(contents)
-    elif content_type.startswith("image/") or file.filename.lower().endswith((".png", ".jpg", ".jpeg")):
-        text = extract_text_from_image_bytes(contents)
-    else:
-        text = extract_text_from_pdf_bytes(contents)
-
-    # Parse
-    sections = split_into_sections(text)
-    contact = extract_contact(text)
-    skills = extract_skills(text)
+@app.on_event("startup")
+async def start_pools():
+    pools.start()
+    if WARMUP_MODELS:
+        models.start_warmup()
+    start_refit_schedule()
+    await job_queue.start(run_upload_job)
+    try:
+        await feedback_service.prune()
+    except Exception as e:
+        print("Warning: feedback cache prune failed:", e)
+
+@app.on_event("shutdown")
+async def stop_pools():
+    await job_queue.stop()
+    pools.shutdown()
+    try:
+        flush_extraction_hits()
+        db_writer.flush(timeout=10)
+    except Exception as e:
+        print("Warning: DB writer flush failed:", e)
+    try:
+        save_keyword_model()
+    except Exception as e:
+        print("Warning: keyword model save failed:", e)
+
+@app.exception_handler(PoolSaturated)
+async def pool_saturated_handler(request: Request, exc: PoolSaturated):
+    return JSONResponse(status_code=429, content={"detail": str(exc)},
+                        headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+
+@app.exception_handler(QueueFull)
+async def queue_full_handler(request: Request, exc: QueueFull):
+    return JSONResponse(status_code=429, content={"detail": str(exc)},
+                        headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+
+@app.exception_handler(UploadTooLarge)
+async def upload_too_large_handler(request: Request, exc: UploadTooLarge):
+    return JSONResponse(status_code=413, content={"detail": str(exc)})
+
+@app.exception_handler(UnsupportedUpload)
+async def unsupported_upload_handler(request: Request, exc: UnsupportedUpload):
+    return JSONResponse(status_code=415, content={"detail": str(exc)})
+
+@app.exception_handler(PoolUnavailable)
+async def pool_unavailable_handler(request: Request, exc: PoolUnavailable):
+    return JSONResponse(status_code=503, content={"detail": str(exc)},
+                        headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+
+# ---------------------------------------------------------
+#  INSTRUMENTATION (timing spans, request metrics, opt-in profiling)
+# ---------------------------------------------------------
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    profile_format = requested_format(request.headers.get("x-profile"))
+    session = None
+    with collect() as timings:
+        if profile_format:
+            try:
+                with profile_request() as session:
+                    response = await call_next(request)
+                    # drain streamed bodies inside the profile; the dump replaces them anyway
+                    async for _ in response.body_iterator:
+                        pass
+            except ProfilerBusy as e:
+                return JSONResponse(status_code=429, content={"detail": str(e)},
+                                    headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+        else:
+            response = await call_next(request)
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+
+    def observe():
+        metrics.REQUEST_SECONDS.observe(timings.elapsed(), request.method, route, str(response.status_code))
+        metrics.observe_spans(timings.spans)
+
+    if session is not None:
+        observe()
+        media_type = "application/octet-stream" if profile_format == "pstats" else "text/plain"
+        return Response(content=session.render(profile_format), media_type=media_type,
+                        headers={"X-Profiled-Status": str(response.status_code)})
+    # the body (all of it, for /upload/stream) is still to be sent: time the request to its last chunk
+    response.body_iterator = _observe_when_sent(response.body_iterator, observe)
+    return response
+
+async def _observe_when_sent(body_iterator, observe):
+    try:
+        async for chunk in body_iterator:
+            yield chunk
+    finally:
+        observe()
+
+def _take_timings(parsed: dict):
+    """Move a pool worker's extraction spans into the current request's timings."""
+    spans = parsed.pop("timings", None)
+    timings = current()
+    if spans and timings is not None:
+        timings.merge(spans, prefix="extraction.")
+
+# ---------------------------------------------------------
+#  EXTRACTION WITH CONTENT-ADDRESSED CACHE
+# ---------------------------------------------------------
+async def _cache_lookup(digest: str):
+    if not EXTRACTION_CACHE:
+        return None
+    try:
+        return await pools.run_io(get_cached_extraction, digest, PARSER_VERSION)
+    except (PoolSaturated, PoolUnavailable):
+        raise
+    except Exception as e:
+        print("Warning: extraction cache lookup failed:", e)
+        return None
+
+async def _cache_store(digest: str, parsed: dict):
+    if not EXTRACTION_CACHE:
+        return
+    # pages skipped by the OCR time budget / a tesseract failure may succeed next time
+    if any(p.get("method") == "skipped" for p in parsed.get("extraction", {}).get("pages", [])):
+        return
+    try:
+        await pools.run_io(save_cached_extraction, digest, PARSER_VERSION, parsed)
+    except Exception as e:
+        print("Warning: extraction cache store failed:", e)
+
+async def extract_cached(source, filename: str, content_type: str, digest: str = None, kind: str = None) -> dict:
+    """
+    Extract + parse an upload (bytes or a spooled file path), skipping all
+    PDF/DOCX/OCR work for content seen before.
+    """
+    digest = digest or content_digest(source)
+    with span("extraction.cache_lookup"):
+        parsed = await _cache_lookup(digest)
+    if parsed is not None:
+        metrics.EXTRACTION_CACHE.inc("hit")
+        parsed["cached"] = True
+        return parsed
+    metrics.EXTRACTION_CACHE.inc("miss" if EXTRACTION_CACHE else "disabled")
+    parsed = await pools.run_cpu(extract_and_parse, source, filename, content_type, kind)
+    _take_timings(parsed)
+    await _cache_store(digest, parsed)
+    parsed["cached"] = False
+    return parsed
+
+def _log_write_error(future):
+    if future.exception() is not None:
+        print("Warning: failed to save results to DB:", future.exception())
+
+async def resolve_jd(jd: str = None, jd_id: int = None):
+    """(jd_text, precomputed features or None) from either raw JD text or a stored jd_id."""
+    if jd_id is not None:
+        features = await pools.run_io(get_jd_features, jd_id)
+        if features is None:
+            raise HTTPException(status_code=404, detail=f"Unknown jd_id {jd_id}")
+        return features.text, features
+    if jd and jd.strip():
+        return jd, None
+    return None, None
+
+def check_semantic_mode(semantic_mode: str = None):
+    if semantic_mode not in (None, "whole", "chunked"):
+        raise HTTPException(status_code=400, detail="semantic_mode must be 'whole' or 'chunked'.")
+
+def check_feedback_mode(feedback_mode: str = None, modes: tuple = FEEDBACK_MODES):
+    if feedback_mode is not None and feedback_mode not in modes:
+        raise HTTPException(status_code=400, detail=f"feedback_mode must be one of {', '.join(modes)}.")
+
+# ---------------------------------------------------------
+#  UPLOAD ANALYSIS (shared by /upload and /jobs)
+# ---------------------------------------------------------
+async def _no_report(stage: str, value):
+    return None
+
+async def analyze_upload(source, filename: str, content_type: str, jd: str = None,
+                         jd_features=None, semantic_mode: str = None, feedback_mode: str = None,
+                         on_stage=_no_report, digest: str = None, kind: str = None) -> dict:
+    """
+    Full single-resume analysis of an upload (bytes, or a spooled file path
+    with its digest and sniffed kind). on_stage(name, partial) is awaited
+    after each stage (extraction, jd_match, suggestions, ai_feedback) so
+    the job queue can publish partial results; with feedback_mode "stream"
+    every piece of feedback text is also reported, as "ai_feedback.delta".
+    """
+    digest = digest or content_digest(source)
+
+    # Extract text by file type + parse (process pool: pdfplumber / OCR / regexes)
+    with span("extraction"):
+        parsed = await extract_cached(source, filename, content_type, digest, kind)
+    text = parsed["text"]
+    sections = parsed["sections"]
+    contact = parsed["contact"]
+    skills = parsed["skills"]
+    extraction = {**parsed["extraction"], "cached": parsed["cached"]}
+    await on_stage("extraction", {
+        "text_snippet": text[:2000],
+        "extraction": extraction,
+        "sections": sections,
+        "contact": contact,
+        "skills": skills,
+    })
 
     # JD Matching & suggestions
     jd_match = None
     suggestions = None
     ai_feedback = None
+    feedback_id = None
+    feedback_mode = feedback_mode or FEEDBACK_MODE
 
     if jd and len(jd.strip()) > 0:
-        jd_match = compute_jd_fit(jd, text, resume_skills=skills)
-
-        jd_keywords = [
-            "python", "sql", "excel", "pandas", "power bi", "tableau",
-            "communication", "analytics", "data visualization", "machine learning"
-        ]
+        if jd_features is None:
+            # required / nice-to-have skills come from the JD itself
+            jd_features = await pools.run_io(prepare_jd, jd)
+        with span("jd_match"):
+            jd_match = await pools.run_io(partial(compute_jd_fit, jd, text, resume_skills=skills,
+                                                  jd_features=jd_features, resume_sections=sections,
+                                                  semantic_mode=semantic_mode))
+        await on_stage("jd_match", jd_match)
 
-        skill_suggest = generate_skill_suggestions(jd_keywords, skills)
-        text_suggest = generate_text_suggestions(jd_match["final_score"], skill_suggest["missing_skills"])
+        with span("suggestions"):
+            skill_suggest = generate_skill_suggestions(jd_features.get_requirements(), skills)
+            text_suggest = generate_text_suggestions(jd_match["final_score"], skill_suggest["missing_skills"])
 
         suggestions = {
             "skill_suggestions": skill_suggest,
             "text_suggestions": text_suggest,
         }
+        await on_stage("suggestions", suggestions)
 
-        # Gemini feedback (may raise if key missing; handled below)
-        try:
-            ai_feedback = generate_resume_feedback(jd, text, jd_match, suggestions)
-        except Exception as e:
-            ai_feedback = f"⚠️ Gemini feedback could not be generated: {e}"
+        # AI feedback (cached per prompt; may raise if key missing / backend busy; handled below)
+        if feedback_mode == "lazy":
+            feedback_id = feedback_service.submit(jd, text, jd_match, suggestions)
+        elif feedback_mode == "sync":
+            try:
+                with span("ai_feedback"):
+                    ai_feedback = await feedback_service.generate(jd, text, jd_match, suggestions)
+            except Exception as e:
+                ai_feedback = f"⚠️ Gemini feedback could not be generated: {e}"
+            await on_stage("ai_feedback", ai_feedback)
+        elif feedback_mode == "stream":
+            parts = []
+            try:
+                with span("ai_feedback"):
+                    async for piece in feedback_service.stream(jd, text, jd_match, suggestions):
+                        parts.append(piece)
+                        await on_stage("ai_feedback.delta", piece)
+                ai_feedback = "".join(parts)
+            except Exception as e:
+                ai_feedback = f"⚠️ Gemini feedback could not be generated: {e}"
+            await on_stage("ai_feedback", ai_feedback)
 
         # --- CONDITIONAL SAVE: only if SAVE_RESULTS is true ---
         if SAVE_RESULTS:
             try:
                 missing = suggestions["skill_suggestions"].get("missing_skills", [])
                 matched = suggestions["skill_suggestions"].get("matched_skills", [])
-                save_result(
-                    filename=file.filename,
-                    jd_text=jd,
-                    ats_score=jd_match.get("final_score", 0),
-                    breakdown=jd_match.get("breakdown", {}),
-                    missing_skills=missing,
-                    matched_skills=matched,
-                    ai_feedback=ai_feedback or ""
-                )
+                with span("persistence"):
+                    # batched background writer: awaiting the row id does not hold a thread, but
+                    # queueing blocks while the writer is WRITE_QUEUE_SIZE behind, so not on the loop
+                    result_id = await asyncio.wrap_future(await asyncio.to_thread(
+                        enqueue_result,
+                        filename=filename,
+                        jd_text=jd,
+                        ats_score=jd_match.get("final_score", 0),
+                        breakdown=jd_match.get("breakdown", {}),
+                        missing_skills=missing,
+                        matched_skills=matched,
+                        ai_feedback=ai_feedback or ""
+                    ))
+                    # keep the resume for reverse search (/search)
+                    await pools.run_io(partial(store_resume, filename, text, skills,
+                                               content_sha256=digest, result_id=result_id))
             except Exception as e:
                 # Do not fail the API if DB save fails; log and continue
                 print("Warning: failed to save result to DB:", e)
 
     # Final response
     return {
-        "filename": file.filename,
+        "filename": filename,
         "text_snippet": text[:2000],
+        "extraction": extraction,
         "sections": sections,
         "contact": contact,
         "skills": skills,
         "jd_match": jd_match,
         "suggestions": suggestions,
         "ai_feedback": ai_feedback,
+        "feedback_id": feedback_id,
     }
+
+# ---------------------------------------------------------
+#  MAIN ROUTE
+# ---------------------------------------------------------
+@app.post("/upload")
+async def upload_resume(file: UploadFile = File(...), jd: str = Form(None), jd_id: int = Form(None),
+                        semantic_mode: str = Form(None), feedback_mode: str = Form(None),
+                        timings: bool = Form(False)):
+    check_semantic_mode(semantic_mode)
+    check_feedback_mode(feedback_mode)
+    jd, jd_features = await resolve_jd(jd, jd_id)
+    # stream to a spool file (413 / 415 before any extraction work)
+    with span("upload.spool"):
+        spooled = await spool_upload(file)
+    try:
+        result = await analyze_upload(spooled.path, file.filename, file.content_type, jd, jd_features,
+                                      semantic_mode, feedback_mode, digest=spooled.sha256, kind=spooled.kind)
+    finally:
+        spooled.cleanup()
+    collector = current()
+    if (timings or RESPONSE_TIMINGS) and collector is not None:
+        # milliseconds per span; top level so it never feeds into jd_match / the feedback prompt
+        result["timings"] = {**collector.as_ms(), "total": round(collector.elapsed() * 1000, 2)}
+    return result
+
+# ---------------------------------------------------------
+#  STREAMING UPLOAD (each stage sent as soon as it is ready)
+# ---------------------------------------------------------
+STREAM_FORMATS = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+def format_event(event: str, data, stream_format: str) -> str:
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+    return json.dumps({"event": event, "data": data}, default=str) + "\n"
+
+@app.post("/upload/stream")
+async def upload_resume_stream(file: UploadFile = File(...), jd: str = Form(None), jd_id: int = Form(None),
+                               semantic_mode: str = Form(None), feedback_mode: str = Form("stream"),
+                               stream_format: str = Form("ndjson"), timings: bool = Form(False)):
+    """
+    /upload as a stream of events, NDJSON lines ({"event", "data"}) or
+    Server-Sent Events: extraction, jd_match, suggestions, then the AI
+    feedback as "ai_feedback.delta" pieces ({"text": ...}) and the full
+    "ai_feedback" text, and finally "result" (the /upload response) or
+    "error". Scores arrive as soon as they are computed instead of after
+    the feedback.
+    """
+    check_semantic_mode(semantic_mode)
+    check_feedback_mode(feedback_mode, STREAM_FEEDBACK_MODES)
+    if stream_format not in STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"stream_format must be one of {', '.join(STREAM_FORMATS)}.")
+    jd, jd_features = await resolve_jd(jd, jd_id)
+    # 413 / 415 are still plain HTTP errors: the stream only starts once the upload is spooled
+    with span("upload.spool"):
+        spooled = await spool_upload(file)
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def report(stage: str, value):
+        if stage == "ai_feedback.delta":
+            value = {"text": value}
+        events.put_nowait((stage, value))
+
+    async def run():
+        # the request's timing collector is gone once the response starts: collect here, like jobs do
+        with collect() as collector:
+            try:
+                result = await analyze_upload(spooled.path, file.filename, file.content_type, jd, jd_features,
+                                              semantic_mode, feedback_mode, on_stage=report,
+                                              digest=spooled.sha256, kind=spooled.kind)
+                if timings or RESPONSE_TIMINGS:
+                    result["timings"] = {**collector.as_ms(), "total": round(collector.elapsed() * 1000, 2)}
+                events.put_nowait(("result", result))
+            except Exception as e:
+                detail = e.detail if isinstance(e, HTTPException) else str(e) or type(e).__name__
+                events.put_nowait(("error", {"detail": detail}))
+            finally:
+                spooled.cleanup()
+                metrics.observe_spans(collector.spans)
+                events.put_nowait(None)
+
+    async def body():
+        task = asyncio.ensure_future(run())
+        try:
+            while True:
+                item = await events.get()
+                if item is None:
+                    break
+                yield format_event(item[0], item[1], stream_format)
+        finally:
+            # client went away: stop the analysis (shared feedback calls carry on, see FeedbackService)
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(body(), media_type=STREAM_FORMATS[stream_format],
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# ---------------------------------------------------------
+#  AI FEEDBACK (lazy mode: poll until ready)
+# ---------------------------------------------------------
+@app.get("/feedback/stats")
+def feedback_stats():
+    return feedback_service.stats()
+
+@app.get("/feedback/{feedback_id}")
+async def get_feedback(feedback_id: str):
+    status = await feedback_service.status(feedback_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown feedback id {feedback_id}")
+    return status
+
+# ---------------------------------------------------------
+#  ASYNC JOBS (submit now, poll /jobs/{id} or get a callback)
+# ---------------------------------------------------------
+async def run_upload_job(job: dict, report_stage) -> dict:
+    params = job["params"]
+    with collect() as timings:
+        jd, jd_features = await resolve_jd(params.get("jd"), params.get("jd_id"))
+        try:
+            return await analyze_upload(job["file"], job["filename"], job["content_type"], jd, jd_features,
+                                        params.get("semantic_mode"), params.get("feedback_mode"),
+                                        on_stage=report_stage,
+                                        kind=sniff_kind(job["file"][:1024]))
+        finally:
+            metrics.observe_spans(timings.spans)
+
+@app.post("/jobs", status_code=202)
+async def submit_upload_job(file: UploadFile = File(...), jd: str = Form(None), jd_id: int = Form(None),
+                            semantic_mode: str = Form(None), feedback_mode: str = Form(None),
+                            callback_url: str = Form(None)):
+    check_semantic_mode(semantic_mode)
+    check_feedback_mode(feedback_mode)
+    if jd_id is not None:
+        await resolve_jd(None, jd_id)  # 404 now rather than a failed job later
+    # size / type checks up front; the (bounded) bytes are then kept in the jobs table
+    spooled = await spool_upload(file)
+    try:
+        contents = await pools.run_io(spooled.read_bytes)
+    finally:
+        spooled.cleanup()
+    try:
+        job = await job_queue.submit(file.filename, file.content_type, contents,
+                                     {"jd": jd, "jd_id": jd_id, "semantic_mode": semantic_mode,
+                                      "feedback_mode": feedback_mode},
+                                     callback_url=callback_url)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {**job, "poll_url": f"/jobs/{job['job_id']}"}
+
+@app.get("/jobs/stats")
+async def job_stats():
+    return await job_queue.stats()
+
+@app.get("/jobs/{job_id}")
+async def get_upload_job(job_id: str):
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return job
+
+# ---------------------------------------------------------
+#  BATCH RANKING ROUTE
+# ---------------------------------------------------------
+# largest JD x resume grid one /score/grid call may ask for
+GRID_MAX_CELLS = int(os.getenv("GRID_MAX_CELLS", "250000"))
+
+def check_weights(weights: str = None):
+    try:
+        parse_weights(weights)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"weights: {e}")
+
+async def extract_uploads(files: List[UploadFile]) -> tuple:
+    """
+    (resumes, errors) for a batch of uploads: cache hits are reused and
+    only the misses go to the process pool. A rejected or failed file is
+    reported in errors, not fatal for the batch.
+    """
+    spooled = []
+    parsed = []
+    try:
+        for f in files:
+            try:
+                s = await spool_upload(f)
+            except (UploadTooLarge, UnsupportedUpload) as e:
+                spooled.append(None)
+                parsed.append(e)
+                continue
+            spooled.append(s)
+            parsed.append(await _cache_lookup(s.sha256))
+
+        # only the cache misses go to the process pool (as file paths)
+        misses = [i for i, p in enumerate(parsed) if p is None]
+        fresh = await pools.map_cpu(extract_and_parse, [
+            (spooled[i].path, spooled[i].filename, spooled[i].content_type, spooled[i].kind) for i in misses
+        ])
+        for i, p in zip(misses, fresh):
+            parsed[i] = p
+            if not isinstance(p, Exception):
+                _take_timings(p)
+                await _cache_store(spooled[i].sha256, p)
+    finally:
+        for s in spooled:
+            if s is not None:
+                s.cleanup()
+
+    resumes = []
+    errors = []
+    for f, p in zip(files, parsed):
+        if isinstance(p, Exception):
+            errors.append({"filename": f.filename, "error": str(p)})
+            continue
+        resumes.append({"filename": f.filename, "text": p["text"], "skills": p["skills"],
+                        "sections": p["sections"]})
+    return resumes, errors
+
+@app.post("/rank")
+async def rank_uploaded_resumes(files: List[UploadFile] = File(...), jd: str = Form(None),
+                                jd_id: int = Form(None), top_k: int = Form(None),
+                                semantic_mode: str = Form(None), weights: str = Form(None)):
+    check_semantic_mode(semantic_mode)
+    check_weights(weights)
+    jd, jd_features = await resolve_jd(jd, jd_id)
+    if not jd:
+        raise HTTPException(status_code=400, detail="A job description (jd or jd_id) is required for ranking.")
+
+    resumes, errors = await extract_uploads(files)
+    if jd_features is None:
+        # once for ranking and the saved skill suggestions
+        jd_features = await pools.run_io(prepare_jd, jd)
+
+    ranked = await pools.run_io(partial(rank_resumes, jd, resumes, top_k=top_k, jd_features=jd_features,
+                                        semantic_mode=semantic_mode, weights=weights))
+
+    if SAVE_RESULTS and ranked:
+        # one queued write for the whole batch; the response does not wait for it
+        jd_skills = jd_features.get_requirements()
+        rows = []
+        for r in ranked:
+            skill_suggest = generate_skill_suggestions(jd_skills, resumes[r["index"]]["skills"])
+            rows.append({
+                "filename": r["filename"],
+                "jd_text": jd,
+                "ats_score": r["final_score"],
+                "breakdown": r["breakdown"],
+                "missing_skills": skill_suggest["missing_skills"],
+                "matched_skills": skill_suggest["matched_skills"],
+                "ai_feedback": "",
+            })
+        (await asyncio.to_thread(enqueue_results, rows)).add_done_callback(_log_write_error)
+
+    return {
+        "count": len(resumes),
+        "ranked": ranked,
+        "errors": errors,
+    }
+
+# ---------------------------------------------------------
+#  GRID SCORING (every JD against every resume)
+# ---------------------------------------------------------
+@app.post("/score/grid")
+async def score_jd_resume_grid(files: List[UploadFile] = File(None), resume_ids: List[int] = Form(None),
+                               jd_ids: List[int] = Form(None), jds: List[str] = Form(None),
+                               weights: str = Form(None), profiles: List[str] = Form(None),
+                               top_k: int = Form(None), semantic_mode: str = Form(None)):
+    """
+    Score M JDs (stored jd_ids, then raw jds texts) against N resumes
+    (stored resume_ids, then uploaded files) in one shot. weights applies
+    to every JD; profiles gives one weights spec per JD instead.
+    """
+    check_semantic_mode(semantic_mode)
+    check_weights(weights)
+    for profile in profiles or []:
+        check_weights(profile)
+    jd_ids = jd_ids or []
+    jd_texts = [t for t in jds or [] if t and t.strip()]
+    files = files or []
+    resume_ids = resume_ids or []
+    n_jds, n_resumes = len(jd_ids) + len(jd_texts), len(resume_ids) + len(files)
+    if not n_jds or not n_resumes:
+        raise HTTPException(status_code=400, detail="At least one JD (jd_ids / jds) and one resume "
+                                                    "(resume_ids / files) are required.")
+    if n_jds * n_resumes > GRID_MAX_CELLS:
+        raise HTTPException(status_code=400, detail=f"Grid of {n_jds} x {n_resumes} exceeds {GRID_MAX_CELLS} cells.")
+    if profiles and len(profiles) != n_jds:
+        raise HTTPException(status_code=400, detail=f"profiles needs one entry per JD ({n_jds}).")
+
+    features = [(await resolve_jd(jd_id=jd_id))[1] for jd_id in jd_ids]
+    features += [await pools.run_io(prepare_jd, text) for text in jd_texts]
+
+    resumes = []
+    if resume_ids:
+        stored = {r["id"]: r for r in await pools.run_io(get_resumes, resume_ids)}
+        unknown = [rid for rid in resume_ids if rid not in stored]
+        if unknown:
+            raise HTTPException(status_code=404, detail=f"Unknown resume_ids {unknown}")
+        resumes = [{"resume_id": rid, "filename": stored[rid]["filename"], "text": stored[rid]["text"],
+                    "skills": stored[rid]["skills"]} for rid in resume_ids]
+    uploaded, errors = await extract_uploads(files)
+    resumes += uploaded
+    if not resumes:
+        raise HTTPException(status_code=400, detail="No resume could be read.")
+
+    grid = await pools.run_io(partial(score_grid, features, resumes, weights=profiles or weights,
+                                      semantic_mode=semantic_mode))
+    result = grid.to_dict(top_k)
+    for row in result["ranked"]:
+        for r in row:
+            r["filename"] = resumes[r["index"]]["filename"]
+    return {
+        "jds": [{"jd_id": jd_id} for jd_id in jd_ids] + [{"jd_id": None} for _ in jd_texts],
+        "resumes": [{"resume_id": r.get("resume_id"), "filename": r["filename"]} for r in resumes],
+        **result,
+        "errors": errors,
+    }
+
+# ---------------------------------------------------------
+#  JD REGISTRY
+# ---------------------------------------------------------
+@app.post("/jds")
+async def create_job_description(text: str = Form(...), title: str = Form(None)):
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="JD text is empty.")
+    return await pools.run_io(create_jd, text, title)
+
+@app.get("/jds")
+async def list_job_descriptions(limit: int = 50, offset: int = 0):
+    return {"jds": await pools.run_io(partial(list_stored_jds, limit=limit, offset=offset))}
+
+@app.get("/jds/{jd_id}")
+async def get_job_description(jd_id: int):
+    jd = await pools.run_io(describe_jd, jd_id)
+    if jd is None:
+        raise HTTPException(status_code=404, detail=f"Unknown jd_id {jd_id}")
+    return jd
+
+# ---------------------------------------------------------
+#  REVERSE SEARCH (stored resumes for a JD)
+# ---------------------------------------------------------
+SEARCH_MAX_K = 100
+# vector-prefilter candidates that are fully scored per search
+SEARCH_MAX_SHORTLIST = 2000
+
+@app.post("/search")
+async def search_candidates(jd: str = Form(None), jd_id: int = Form(None), k: int = Form(10),
+                            shortlist: int = Form(None)):
+    if not 1 <= k <= SEARCH_MAX_K:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {SEARCH_MAX_K}.")
+    if shortlist is not None and not k <= shortlist <= SEARCH_MAX_SHORTLIST:
+        raise HTTPException(status_code=400, detail=f"shortlist must be between k and {SEARCH_MAX_SHORTLIST}.")
+    jd, jd_features = await resolve_jd(jd, jd_id)
+    if not jd:
+        raise HTTPException(status_code=400, detail="A job description (jd or jd_id) is required for search.")
+    return await pools.run_io(partial(search_resumes, jd, k=k, shortlist=shortlist, jd_features=jd_features))
+
+# ---------------------------------------------------------
+#  ANALYTICS (stored results)
+# ---------------------------------------------------------
+ANALYTICS_MAX_PAGE = 500
+
+async def analytics_filters(date_from: str = None, date_to: str = None, min_score: float = None,
+                            max_score: float = None, jd_id: int = None, jd_hash: str = None) -> dict:
+    """Validated filter kwargs for the db analytics queries (jd_id is resolved to its results key)."""
+    for name, value in (("date_from", date_from), ("date_to", date_to)):
+        if value is not None:
+            try:
+                datetime.fromisoformat(value)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"{name} must be an ISO date or datetime.")
+    if min_score is not None and max_score is not None and min_score > max_score:
+        raise HTTPException(status_code=400, detail="min_score must not exceed max_score.")
+    if jd_id is not None:
+        jd, _ = await resolve_jd(jd_id=jd_id)
+        jd_hash = result_jd_hash(jd)
+    return {"date_from": date_from, "date_to": date_to, "min_score": min_score, "max_score": max_score,
+            "jd_hash": jd_hash}
+
+@app.get("/results")
+async def list_results(limit: int = 50, cursor: int = None, date_from: str = None, date_to: str = None,
+                       min_score: float = None, max_score: float = None, jd_id: int = None,
+                       jd_hash: str = None, filename: str = None):
+    if not 1 <= limit <= ANALYTICS_MAX_PAGE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {ANALYTICS_MAX_PAGE}.")
+    filters = await analytics_filters(date_from, date_to, min_score, max_score, jd_id, jd_hash)
+    return await pools.run_io(partial(query_results, limit=limit, cursor=cursor, filename=filename, **filters))
+
+@app.get("/analytics/histogram")
+async def results_histogram(bucket_width: int = 10, date_from: str = None, date_to: str = None,
+                            min_score: float = None, max_score: float = None, jd_id: int = None,
+                            jd_hash: str = None):
+    if not 1 <= bucket_width <= 100:
+        raise HTTPException(status_code=400, detail="bucket_width must be between 1 and 100.")
+    filters = await analytics_filters(date_from, date_to, min_score, max_score, jd_id, jd_hash)
+    return await pools.run_io(partial(score_histogram, bucket_width=bucket_width, **filters))
+
+@app.get("/analytics/skills")
+async def results_top_skills(kind: str = "missing", limit: int = 20, date_from: str = None, date_to: str = None,
+                             min_score: float = None, max_score: float = None, jd_id: int = None,
+                             jd_hash: str = None):
+    if kind not in ("missing", "matched"):
+        raise HTTPException(status_code=400, detail="kind must be 'missing' or 'matched'.")
+    if not 1 <= limit <= ANALYTICS_MAX_PAGE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {ANALYTICS_MAX_PAGE}.")
+    filters = await analytics_filters(date_from, date_to, min_score, max_score, jd_id, jd_hash)
+    return await pools.run_io(partial(top_skills, kind=kind, limit=limit, **filters))
+
+# ---------------------------------------------------------
+#  CACHE STATS
+# ---------------------------------------------------------
+@app.get("/cache/stats")
+def cache_stats():
+    return {"embeddings": embed_cache.stats(), "keywords": get_keyword_model().stats(),
+            "experience": experience.stats()}
+
+def _metric_gauges(jobs: dict) -> list:
+    embeddings = embed_cache.stats()
+    keywords = get_keyword_model().stats()
+    feedback = feedback_service.stats()
+    terms = experience.stats()
+    pool = pools.stats()
+    upload = uploads.stats()
+    return [
+        ("ats_cache_hit_ratio", "Hit rate per cache since start.", [
+            ({"cache": "embeddings"}, embeddings["hit_rate"]),
+            ({"cache": "keywords"}, keywords["cache_hit_rate"]),
+            ({"cache": "feedback"}, feedback["hit_rate"]),
+            ({"cache": "experience_resumes"}, terms["resume_terms"]["hit_rate"]),
+        ]),
+        ("ats_cache_items", "Entries held per cache.", [
+            ({"cache": "embeddings_memory"}, embeddings["memory_items"]),
+            ({"cache": "embeddings_disk"}, embeddings["disk_items"]),
+            ({"cache": "keywords"}, keywords["cached_rows"]),
+            ({"cache": "feedback_memory"}, feedback["memory_items"]),
+            ({"cache": "experience_jds"}, terms["jd_terms"]["items"]),
+            ({"cache": "experience_resumes"}, terms["resume_terms"]["items"]),
+        ]),
+        ("ats_pool_pending", "Tasks pending per worker pool.",
+         [({"pool": name}, pool[name]["pending"]) for name in ("cpu", "io")]),
+        ("ats_pool_rejected", "Tasks rejected (pool saturated) per worker pool since start.",
+         [({"pool": name}, pool[name]["rejected"]) for name in ("cpu", "io")]),
+        ("ats_jobs", "Upload jobs per status.",
+         [({"status": status}, jobs[status]) for status in ("queued", "running", "done", "failed")]),
+        ("ats_db_write_queue", "Rows waiting for the batched DB writer.", [({}, db_writer.stats()["queued"])]),
+        ("ats_feedback_in_flight", "AI feedback calls in flight.", [({}, feedback["in_flight"])]),
+        ("ats_uploads_active", "Uploads currently spooled.", [({}, upload["active"])]),
+        ("ats_uploads_active_bytes", "Bytes of uploads currently spooled.", [({}, upload["active_bytes"])]),
+    ]
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    jobs = await job_queue.stats()
+    # stats() calls take locks / may load the keyword model: keep them off the loop
+    gauges = await asyncio.to_thread(_metric_gauges, jobs)
+    return Response(content=metrics.render(gauges), media_type="text/plain; version=0.0.4")
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+@app.get("/ready")
+def ready():
+    status = models.status()
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content=status)
+    return status
+
+@app.get("/search/stats")
+async def search_stats():
+    index = await pools.run_io(get_resume_index)
+    return index.stats()
+
+@app.get("/pools/stats")
+def pool_stats():
+    return {**pools.stats(), "db_writer": db_writer.stats()}
+
+@app.get("/uploads/stats")
+def upload_stats():
+    return uploads.stats()
@@ -0,0 +1,123 @@
+# app/metrics.py
+"""
+Minimal Prometheus text-format metrics (no client library needed).
+
+Histograms and counters live in this process and are updated as requests
+run; gauges (cache hit rates, queue depths) are read from the components'
+stats() when /metrics is scraped and passed to render(). With several
+API worker processes each one reports its own numbers.
+"""
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# seconds; covers cached sub-millisecond stages up to slow OCR / Gemini calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[tuple, list] = {}   # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str):
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for labelvalues, series in items:
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, ('le', _number(bound)))} "
+                             f"{count}")
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, ('le', '+Inf'))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_labels(self.labelnames, values)} {_number(v)}" for values, v in items]
+        return lines
+
+
+# ---------------------------------------------------------
+#  APPLICATION METRICS
+# ---------------------------------------------------------
+REQUEST_SECONDS = Histogram("ats_http_request_seconds", "HTTP request latency.", ("method", "route", "status"))
+STAGE_SECONDS = Histogram("ats_stage_seconds", "Time spent per analysis stage / timing span.", ("stage",))
+EXTRACTION_CACHE = Counter("ats_extraction_cache_lookups_total", "Extraction cache lookups.", ("result",))
+
+REGISTRY = [REQUEST_SECONDS, STAGE_SECONDS, EXTRACTION_CACHE]
+
+
+def observe_spans(spans: Dict[str, float]):
+    """Feed a finished request's / job's timing spans (seconds) into the stage histogram."""
+    for name, seconds in spans.items():
+        STAGE_SECONDS.observe(seconds, name)
+
+
+# (name, help, [(labels, value)]) read from component stats at scrape time
+Gauge = Tuple[str, str, Iterable[Tuple[Dict[str, str], float]]]
+
+
+def render_gauges(gauges: Iterable[Gauge]) -> List[str]:
+    lines = []
+    for name, documentation, samples in gauges:
+        lines += [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"]
+        for labels, value in samples:
+            lines.append(f"{name}{_labels(list(labels), list(labels.values()))} {_number(value)}")
+    return lines
+
+
+def render(gauges: Iterable[Gauge] = ()) -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    lines += render_gauges(gauges)
+    return "\n".join(lines) + "\n"
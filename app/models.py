@@ -0,0 +1,106 @@
+# app/models.py
+"""
+Process-wide model registry.
+
+Every model is loaded at most once per process, on first use or by the
+background warm-up started with the API. Loading the models before
+forking workers (PRELOAD_MODELS=true together with gunicorn --preload)
+lets the workers share the weights copy-on-write.
+"""
+import os
+import threading
+import time
+from typing import Optional
+
+from app.embeddings import EMBED_BACKEND, get_backend, model_id
+
+SPACY_MODEL = os.getenv("SPACY_MODEL", "en_core_web_sm")
+EMBED_MODEL_NAME = os.getenv("EMBED_MODEL_NAME", "all-MiniLM-L6-v2")
+# what cached / stored embeddings are tagged with (model name plus backend, see app.embeddings)
+EMBED_MODEL_ID = model_id(EMBED_MODEL_NAME, EMBED_BACKEND)
+
+# POS tags + lemmas are all app.experience needs; the parser and
+# NER are the expensive parts of en_core_web_sm, so they are never loaded
+SPACY_EXCLUDE = ["parser", "ner", "senter"]
+
+_lock = threading.Lock()
+_models = {}
+_load_seconds = {}
+_errors = {}
+_warmup_thread: Optional[threading.Thread] = None
+
+
+def _get(name: str, loader):
+    model = _models.get(name)
+    if model is not None:
+        return model
+    with _lock:
+        model = _models.get(name)
+        if model is None:
+            t0 = time.perf_counter()
+            try:
+                model = loader()
+            except Exception as e:
+                _errors[name] = str(e)
+                raise
+            _models[name] = model
+            _load_seconds[name] = round(time.perf_counter() - t0, 3)
+            _errors.pop(name, None)
+    return model
+
+
+def _load_nlp():
+    import spacy
+    return spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDE)
+
+
+def _load_embed_model():
+    return get_backend(EMBED_BACKEND, EMBED_MODEL_NAME)
+
+
+def get_nlp():
+    """spaCy pipeline with only tok2vec / tagger / attribute_ruler / lemmatizer."""
+    return _get("spacy", _load_nlp)
+
+
+def get_embed_model():
+    """EMBED_MODEL_NAME on the EMBED_BACKEND backend: encode(texts, batch_size) -> normalized rows."""
+    return _get("embeddings", _load_embed_model)
+
+
+# -------------------------------------------------------
+#  WARM-UP / READINESS
+# -------------------------------------------------------
+def preload():
+    """Load every model now (call before forking workers)."""
+    get_nlp()
+    get_embed_model()
+
+
+def _warmup():
+    try:
+        preload()
+    except Exception as e:
+        print("Warning: model warm-up failed:", e)
+
+
+def start_warmup():
+    """Load models in a background thread so the server accepts connections immediately."""
+    global _warmup_thread
+    if _warmup_thread is None and not is_ready():
+        _warmup_thread = threading.Thread(target=_warmup, name="model-warmup", daemon=True)
+        _warmup_thread.start()
+
+
+def is_ready() -> bool:
+    return "spacy" in _models and "embeddings" in _models
+
+
+def status() -> dict:
+    return {
+        "ready": is_ready(),
+        "embedding_backend": EMBED_BACKEND,
+        "loaded": sorted(_models),
+        "load_seconds": dict(_load_seconds),
+        "errors": dict(_errors),
+    }
@@ -1,55 +1,265 @@
 # app/parse.py
+"""
+Resume text parsing.
+
+analyze_document() makes one pass over the text with a single compiled
+pattern that finds section headers (any synonym of a canonical section
+name, in English and a few other European languages), emails, phone
+numbers, URLs and LinkedIn / GitHub profile links, and returns a
+Document with character offsets for all of them. The older helpers
+(split_into_sections, section_spans, extract_contact) are views of that
+Document; the last few documents are kept, so calling several of them on
+the same text still costs a single pass.
+"""
 import re
-import spacy
-nlp = spacy.load("en_core_web_sm")
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.skills import get_default_matcher, matcher_for
+
+# canonical section name -> header synonyms (matched case-insensitively; "and" also matches "&")
+SECTION_SYNONYMS = {
+    "experience": [
+        "experience", "work experience", "professional experience", "relevant experience", "employment",
+        "employment history", "work history", "career history", "professional background",
+        "experiencia", "experiencia laboral", "experiencia profesional", "expérience",
+        "expérience professionnelle", "expériences professionnelles", "berufserfahrung", "erfahrung",
+        "experiência", "experiência profissional", "esperienza", "esperienze lavorative",
+        "esperienza professionale",
+    ],
+    "education": [
+        "education", "academic background", "academic qualifications", "education and training",
+        "educación", "formación", "formación académica", "éducation", "formation", "ausbildung", "bildung",
+        "bildungsweg", "educação", "formação", "formação acadêmica", "istruzione", "formazione",
+    ],
+    "skills": [
+        "skills", "technical skills", "core skills", "key skills", "skill set", "skillset", "competencies",
+        "core competencies", "technologies", "tech stack", "tools and technologies", "habilidades",
+        "competencias", "conocimientos", "compétences", "compétences techniques", "kenntnisse",
+        "fähigkeiten", "it-kenntnisse", "competências", "competenze",
+    ],
+    "projects": [
+        "projects", "personal projects", "key projects", "academic projects", "proyectos", "projets",
+        "projekte", "projetos", "progetti",
+    ],
+    "certifications": [
+        "certifications", "certificates", "licenses", "licenses and certifications",
+        "certifications and licenses", "certificaciones", "certificados", "zertifikate",
+        "zertifizierungen", "certificações", "certificazioni",
+    ],
+    "summary": [
+        "summary", "professional summary", "career summary", "summary of qualifications", "profile",
+        "professional profile", "about me", "resumen", "resumen profesional", "perfil", "perfil profesional",
+        "profil", "profil professionnel", "zusammenfassung", "kurzprofil", "sobre mim", "resumo", "profilo",
+    ],
+    "objective": [
+        "objective", "career objective", "objetivo", "objetivo profesional", "objectif", "berufsziel",
+        "obiettivo",
+    ],
+    "contact": [
+        "contact", "contact information", "contact details", "personal details", "personal information",
+        "contacto", "datos personales", "coordonnées", "kontakt", "kontaktdaten", "persönliche daten",
+        "contato", "contatti",
+    ],
+    "publications": [
+        "publications", "publicaciones", "publikationen", "veröffentlichungen", "publicações", "pubblicazioni",
+    ],
+    "achievements": [
+        "achievements", "awards", "honors", "honours", "accomplishments", "awards and honors",
+        "awards and achievements", "logros", "premios", "réalisations", "distinctions", "auszeichnungen",
+        "erfolge", "conquistas", "prêmios", "riconoscimenti",
+    ],
+    "languages": ["languages", "idiomas", "langues", "sprachen", "sprachkenntnisse", "línguas", "lingue"],
+    "interests": [
+        "interests", "hobbies", "hobbies and interests", "intereses", "centres d'intérêt", "interessen",
+        "interesses", "interessi",
+    ],
+    "volunteering": [
+        "volunteering", "volunteer experience", "volunteer work", "voluntariado", "bénévolat", "ehrenamt",
+        "volontariato",
+    ],
+    "references": ["references", "referencias", "références", "referenzen", "referências", "referenze"],
+}
+SECTION_HEADERS = list(SECTION_SYNONYMS)
+
+# phone candidates are checked for this many digits (keeps "2019 - 2021" out)
+PHONE_MIN_DIGITS = 9
+PHONE_MAX_DIGITS = 15
+# analyzed documents kept for the split / spans / contact views of the same text
+DOCUMENT_CACHE_ITEMS = 64
+
+_HEADER_LOOKUP = {}
+for _canonical, _synonyms in SECTION_SYNONYMS.items():
+    for _synonym in _synonyms:
+        _HEADER_LOOKUP[" ".join(_synonym.lower().replace("&", " and ").split())] = _canonical
+_HEADER_MAX_WORDS = max(len(re.split(r"[ '-]+", h)) for h in _HEADER_LOOKUP)
+
+# One scan over "\n" + text. Each branch opens with its own character
+# ("\n", "@", "+" / "(" / a digit, "/"), so the compiled pattern gets a
+# first-character set and the scan jumps between those characters instead
+# of trying every branch at every position:
+#   header  a line holding only a few words (optionally bulleted / followed
+#           by ":"), or a few words and a separator with the section's first
+#           content after it ("Skills: Python"). The words are looked up in
+#           _HEADER_LOOKUP afterwards; a dict lookup stays linear where an
+#           alternation of every synonym is retried at each line start. The
+#           title is matched inside a lookahead (an atomic group) so long
+#           prose lines fail at once instead of backtracking word by word.
+#   email   anchored on "@"; the local part is picked up behind it
+#   phone   a run of digits and separators holding at least 9 digits (so
+#           "2019 - 2021" is not one)
+#   url     anchored on its first "/" after a scheme or a domain ending
+#           (so "A/B" or "CI/CD" are not URLs); the host and scheme are
+#           picked up behind it
+_TITLE = rf"[^\W\d_]+(?:(?:[ \t]*&[ \t]*|[ \t]+|['-])[^\W\d_]+){{0,{_HEADER_MAX_WORDS - 1}}}"
+_ANALYZER_RE = re.compile(
+    rf"\n(?P<header>[ \t]*(?:[#*•▪■=_~-]+[ \t]*)?(?=(?P<title>{_TITLE}))(?P=title)"
+    r"[ \t]*(?:[:|][ \t]*|[–—-][ \t]+|(?=\r?$)))"
+    r"|@(?P<email>[\w-]+(?:\.[\w-]+)+)"
+    r"|[+(\d](?:(?<=\d)(?=(?:[ \t().-]*\d){8})|(?=(?:[ \t().-]*\d){9}))(?P<phone>[\d \t().-]{7,20}\d)(?![\w-])"
+    r"|/(?:(?<=:/)|(?<=\.[a-zA-Z]{2}/)|(?<=\.[a-zA-Z]{3}/)|(?<=\.[a-zA-Z]{4}/))(?P<url>[^\s<>\"'()\[\]]*)",
+    re.MULTILINE,
+)
+_EMAIL_LOCAL_RE = re.compile(r"[\w.+-]{1,64}\Z")
+_URL_HOST_RE = re.compile(r"(?:[a-zA-Z][\w+.-]*:/?)?(?:[\w-]+\.)+[a-zA-Z]{2,}\Z|[a-zA-Z][\w+.-]*:\Z")
+_URL_TRAILING = ".,;:!?"
+
+
+class Span(NamedTuple):
+    value: str
+    start: int            # character offsets into the analyzed text
+    end: int
+
+
+class Section(NamedTuple):
+    name: str             # canonical section name ("header" for the text before the first one)
+    title: Optional[str]  # header as written
+    start: int            # start of the header line
+    content_start: int    # first character after the header (and its separator)
+    end: int
+
+
+class Document(NamedTuple):
+    text: str
+    sections: Tuple[Section, ...]
+    emails: Tuple[Span, ...]
+    phones: Tuple[Span, ...]
+    urls: Tuple[Span, ...]
+    linkedin: Tuple[Span, ...]
+    github: Tuple[Span, ...]
+
+    def section_texts(self) -> Dict[str, str]:
+        """{section name: non-empty stripped lines joined by newlines}; repeated sections are merged."""
+        out: Dict[str, List[str]] = {"header": []}
+        for s in self.sections:
+            lines = out.setdefault(s.name, [])
+            lines.extend(l.strip() for l in self.text[s.content_start:s.end].splitlines() if l.strip())
+        return {name: "\n".join(lines) for name, lines in out.items()}
+
+    def section_spans(self) -> List[Tuple[str, int, int]]:
+        return [(s.name, s.start, s.end) for s in self.sections if s.end > s.start]
+
+    def section_at(self, offset: int) -> Optional[str]:
+        for s in self.sections:
+            if s.start <= offset < s.end:
+                return s.name
+        return None
+
+    def contact(self) -> dict:
+        return {
+            "email": self.emails[0].value if self.emails else None,
+            "phone": self.phones[0].value if self.phones else None,
+            "linkedin": self.linkedin[0].value if self.linkedin else None,
+            "github": self.github[0].value if self.github else None,
+            "urls": [u.value for u in self.urls],
+        }
+
+    def to_dict(self) -> dict:
+        """JSON-friendly form (offsets included, text left out)."""
+        return {
+            "sections": [s._asdict() for s in self.sections],
+            **{field: [list(x) for x in getattr(self, field)]
+               for field in ("emails", "phones", "urls", "linkedin", "github")},
+        }
+
+
+def _phone_digits_ok(value: str) -> bool:
+    digits = sum(ch.isdigit() for ch in value)
+    return PHONE_MIN_DIGITS <= digits <= PHONE_MAX_DIGITS
+
+
+def _analyze(text: str) -> Document:
+    # an offset into the scanned string is one past the same offset into text
+    scanned = "\n" + text
+    sections = []
+    emails, phones, urls, linkedin, github = [], [], [], [], []
+    current, current_title, current_start, content_start = "header", None, 0, 0
+    for m in _ANALYZER_RE.finditer(scanned):
+        kind, start, end = m.lastgroup, m.start(), m.end()
+        if kind in ("header", "title"):
+            title = m.group("title")
+            name = _HEADER_LOOKUP.get(" ".join(title.lower().replace("&", " and ").split()))
+            if name is None:
+                continue
+            # the match starts at the newline, i.e. at the header line's offset in text
+            sections.append(Section(current, current_title, current_start, content_start, start))
+            current, current_title = name, title
+            current_start, content_start = start, end - 1
+        elif kind == "email":
+            local = _EMAIL_LOCAL_RE.search(scanned, max(0, start - 64), start)
+            if local:
+                emails.append(Span(scanned[local.start():end], local.start() - 1, end - 1))
+        elif kind == "phone":
+            value = scanned[start:end]
+            if not scanned[start - 1].isalnum() and _phone_digits_ok(value):
+                phones.append(Span(value, start - 1, end - 1))
+        else:
+            host = _URL_HOST_RE.search(scanned, max(0, start - 80), start)
+            if host is None:
+                continue
+            value = scanned[host.start():end].rstrip(_URL_TRAILING)
+            span = Span(value, host.start() - 1, host.start() - 1 + len(value))
+            urls.append(span)
+            low = value.lower()
+            if "linkedin.com/" in low:
+                linkedin.append(span)
+            elif "github.com/" in low:
+                github.append(span)
+    sections.append(Section(current, current_title, current_start, content_start, len(text)))
+    # the implicit "header" section is dropped when a section header opens the text
+    sections = [s for s in sections if s.name != "header" or s.end > s.start]
+    return Document(text, tuple(sections), tuple(emails), tuple(phones), tuple(urls), tuple(linkedin), tuple(github))
+
+
+@lru_cache(maxsize=DOCUMENT_CACHE_ITEMS)
+def analyze_document(text: str) -> Document:
+    """Sections, contacts and links of a text, with offsets (one regex pass; cached per text)."""
+    return _analyze(text)
 
-SECTION_HEADERS = [
-    "experience","work experience","professional experience",
-    "education","skills","projects","certifications","summary","objective",
-    "contact","publications","achievements"
-]
 
 def split_into_sections(text: str) -> dict:
-    text = text.replace("\r", "\n")
-    lines = [l.strip() for l in text.splitlines() if l.strip()]
-    # naive header detection
-    sections = {}
-    current = "header"
-    sections[current] = []
-    for line in lines:
-        low = line.lower()
-        matched = None
-        for h in SECTION_HEADERS:
-            if low.startswith(h):
-                matched = h
-                break
-        if matched:
-            current = matched
-            sections.setdefault(current, [])
-            # if header line contains more than header text, skip storing header itself
-            continue
-        sections.setdefault(current, []).append(line)
-    # convert lists to text
-    return {k: "\n".join(v) for k, v in sections.items()}
+    return analyze_document(text).section_texts()
+
 
 def extract_contact(text: str) -> dict:
-    # simple email/phone extraction
-    email = None
-    phone = None
-    m = re.search(r'[\w\.-]+@[\w\.-]+', text)
-    if m:
-        email = m.group(0)
-    m2 = re.search(r'(\+?\d[\d\-\s]{7,}\d)', text)
-    if m2:
-        phone = m2.group(0)
-    return {"email": email, "phone": phone}
+    return analyze_document(text).contact()
+
+
+def section_spans(text: str) -> list:
+    """
+    Character spans of the sections found by split_into_sections, as
+    [(name, start, end)] over the original text.
+    """
+    return analyze_document(text).section_spans()
+
+
+def extract_skill_matches(text: str, skills_db: list = None) -> list:
+    """Every skill mention with canonical name, offsets and the section it sits in."""
+    matcher = matcher_for(tuple(skills_db)) if skills_db else get_default_matcher()
+    return matcher.find(text, section_spans(text))
+
 
 def extract_skills(text: str, skills_db: list = None) -> list:
-    # very basic: look for comma/bullet separated tokens in 'skills' section or fallback to keyword match
-    skills_db = skills_db or ["python","sql","excel","aws","docker","git","tensorflow","pandas","nlp","java","c++","spark"]
-    text_low = text.lower()
-    found = []
-    for s in skills_db:
-        if s.lower() in text_low:
-            found.append(s)
-    return found
+    # one pass of the compiled skill dictionary (see app.skills); canonical names, first mention first
+    matcher = matcher_for(tuple(skills_db)) if skills_db else get_default_matcher()
+    return matcher.extract(text)
@@ -0,0 +1,65 @@
+# app/pipeline.py
+"""
+Resume-side processing steps shared by the API routes.
+
+Functions here are module-level and take/return plain data so they can be
+shipped to the process pool in app.workers.
+"""
+import hashlib
+from typing import Optional
+
+from app.extract import Source, extract_document
+from app.parse import analyze_document, extract_skills
+from app.timing import collect, span
+from app.uploads import peak_rss_kb
+
+# Bump when extraction or parsing output changes so stale cache rows are ignored
+PARSER_VERSION = "3"
+
+
+def content_digest(source: Source) -> str:
+    """SHA-256 of the file's bytes (given the bytes or a path)."""
+    if isinstance(source, (bytes, bytearray)):
+        return hashlib.sha256(source).hexdigest()
+    digest = hashlib.sha256()
+    with open(source, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def extract_and_parse(source: Source, filename: str, content_type: Optional[str] = None,
+                      kind: Optional[str] = None) -> dict:
+    """
+    Extract text from an uploaded file (bytes or a spooled file path) and
+    run the basic resume parsers on it. "timings" holds the seconds spent
+    per step (this usually runs in a pool process, so the spans travel back
+    with the result; it is not part of the cached output).
+    """
+    with collect() as timings:
+        with span("extract"):
+            doc = extract_document(source, filename, content_type, kind)
+        # split extraction time into text layer vs OCR
+        for page in doc.get("pages", []):
+            if page["method"] != "skipped":
+                timings.add("extract.text_layer" if page["method"] == "text" else "extract.ocr", page["seconds"])
+        if doc.get("kind") == "image":
+            timings.add("extract.ocr", doc["seconds"])
+        # peak RSS of the process that did the extraction (a pool worker)
+        doc["peak_rss_kb"] = peak_rss_kb()
+        text = doc.pop("text")
+        # sections and contact details come out of the same single pass
+        with span("sections"):
+            analysis = analyze_document(text)
+            sections = analysis.section_texts()
+            contact = analysis.contact()
+        with span("skills"):
+            skills = extract_skills(text)
+    return {
+        "text": text,
+        "extraction": doc,
+        "sections": sections,
+        "contact": contact,
+        "skills": skills,
+        "timings": timings.spans,
+    }
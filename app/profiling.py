@@ -0,0 +1,110 @@
+# app/profiling.py
+"""
+Opt-in, request-scoped cProfile.
+
+With PROFILING_ENABLED=true a request carrying an "X-Profile" header is
+run under cProfile and answered with the profile instead of its normal
+body: "X-Profile: text" (or "1") returns the top PROFILE_TOP_N functions
+by cumulative time as text, "X-Profile: pstats" a binary pstats dump (for
+snakeviz / pstats.Stats). Only one request is profiled at a time.
+
+The event-loop thread is profiled for the whole request; functions the
+request hands to the thread pool are profiled in their worker thread and
+merged in (see app.workers). Process-pool work (extraction with
+CPU_WORKERS > 0) is not visible - profile with CPU_WORKERS=0 to include it.
+Other requests running at the same time also show up in the loop-thread
+profile, so profile on a quiet instance.
+"""
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, List, Optional
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "60"))
+PROFILE_FORMATS = ("text", "pstats")
+
+
+class ProfilerBusy(Exception):
+    """Another request is being profiled (maps to HTTP 429)."""
+
+
+class ProfileSession:
+    def __init__(self):
+        self.main = cProfile.Profile()
+        self.threads: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def add_thread_profile(self, profile: cProfile.Profile):
+        with self._lock:
+            self.threads.append(profile)
+
+    def stats(self) -> pstats.Stats:
+        stats = pstats.Stats(self.main, stream=io.StringIO())
+        for profile in self.threads:
+            stats.add(profile)
+        return stats
+
+    def render(self, fmt: str = "text", top_n: int = PROFILE_TOP_N) -> bytes:
+        stats = self.stats()
+        if fmt == "pstats":
+            return marshal.dumps(stats.stats)
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats("cumulative").print_stats(top_n)
+        return out.getvalue().encode("utf-8")
+
+
+_session: ContextVar[Optional[ProfileSession]] = ContextVar("profile_session", default=None)
+_busy = threading.Lock()
+
+
+def requested_format(header_value: Optional[str]) -> Optional[str]:
+    """Profile format asked for by an X-Profile header value (None = do not profile)."""
+    if not PROFILING_ENABLED or not header_value:
+        return None
+    value = header_value.strip().lower()
+    if value in ("1", "true", "yes"):
+        return "text"
+    return value if value in PROFILE_FORMATS else None
+
+
+@contextmanager
+def profile_request():
+    """Profile the current thread (the event loop) and mark the context so thread-pool work is profiled too."""
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusy("another request is being profiled")
+    session = ProfileSession()
+    token = _session.set(session)
+    session.main.enable()
+    try:
+        yield session
+    finally:
+        session.main.disable()
+        _session.reset(token)
+        _busy.release()
+
+
+def wrap_for_thread(fn: Callable) -> Callable:
+    """fn, profiled in whatever thread runs it when the calling context is being profiled."""
+    session = _session.get()
+    if session is None:
+        return fn
+
+    @wraps(fn)
+    def profiled(*args, **kwargs):
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.disable()
+            session.add_thread_profile(profile)
+
+    return profiled
@@ -0,0 +1,103 @@
+# app/resume_store.py
+"""
+Stored candidate pool and reverse search (top-k resumes for a JD).
+
+Resumes saved through the API keep their text, skills and embedding in the
+resumes table; their embeddings are also added to an in-process
+VectorIndex, which is built from the table on first use and caught up
+from it (rows past the highest id indexed so far) on every store and
+search, so resumes saved by other worker processes are found too. A
+search does a cheap vector prefilter over the whole pool and then runs
+the full scoring (one score_grid row) only on the shortlist.
+"""
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+from app.db import save_resume, iter_resume_embeddings, get_resumes
+from app.jd_match import JDFeatures, embed_texts, prepare_jd, preprocess, score_grid
+from app.keyword_model import record_documents
+from app.models import EMBED_MODEL_ID
+from app.vector_index import VectorIndex
+
+# vector-prefilter candidates per requested result
+SHORTLIST_FACTOR = 5
+
+_index: Optional[VectorIndex] = None
+# highest resumes.id in _index (ids become visible in order: SQLite has one writer at a time)
+_indexed_up_to = 0
+_index_lock = threading.Lock()
+
+
+def get_resume_index() -> VectorIndex:
+    """The process-wide index, with every resume stored so far (by any process) added."""
+    global _index, _indexed_up_to
+    with _index_lock:
+        if _index is None:
+            _index = VectorIndex()
+        for ids, blobs in iter_resume_embeddings(EMBED_MODEL_ID, after_id=_indexed_up_to):
+            _index.add(ids, np.vstack([np.frombuffer(b, dtype=np.float32) for b in blobs]))
+            _indexed_up_to = ids[-1]
+    return _index
+
+
+def store_resume(filename: str, text: str, skills: list, content_sha256: Optional[str] = None,
+                 result_id: Optional[int] = None) -> int:
+    """Persist a resume for later searches and add it to the index and the keyword corpus."""
+    # same preprocessing as compute_jd_fit, so this is an embedding-cache hit after scoring
+    embedding = embed_texts([preprocess(text)])[0]
+    resume_id, is_new = save_resume(
+        filename=filename,
+        content_sha256=content_sha256,
+        text=text,
+        skills=skills,
+        embedding_model=EMBED_MODEL_ID,
+        embedding=np.asarray(embedding, dtype=np.float32).tobytes(),
+        result_id=result_id,
+    )
+    # a re-saved file keeps its existing row (already indexed)
+    if is_new:
+        get_resume_index()  # picks up the new row along with any other process's
+        record_documents([text])
+    return resume_id
+
+
+def search_resumes(jd_text: Optional[str] = None, k: int = 10, shortlist: Optional[int] = None,
+                   jd_features: Optional[JDFeatures] = None) -> dict:
+    """Top-k stored resumes for a JD: vector prefilter, then full scoring of the shortlist."""
+    t0 = time.perf_counter()
+    jd = jd_features or prepare_jd(jd_text)
+    index = get_resume_index()
+    shortlist = max(k, shortlist or k * SHORTLIST_FACTOR)
+    candidates = index.search(jd.embedding, shortlist)
+    t_prefilter = time.perf_counter() - t0
+
+    similarity = dict(candidates)
+    stored = get_resumes([rid for rid, _ in candidates])
+    grid = score_grid([jd], stored)
+    results = []
+    for i, r in enumerate(stored):
+        fit = grid.result(0, i)
+        results.append({
+            "resume_id": r["id"],
+            "filename": r["filename"],
+            "result_id": r["result_id"],
+            "created_at": r["created_at"],
+            "vector_similarity": round(similarity[r["id"]], 4),
+            **fit,
+        })
+    results.sort(key=lambda r: r["final_score"], reverse=True)
+    results = results[:k]
+    for pos, r in enumerate(results, start=1):
+        r["rank"] = pos
+    return {
+        "pool_size": len(index),
+        "shortlisted": len(candidates),
+        "results": results,
+        "timings": {
+            "prefilter_seconds": round(t_prefilter, 4),
+            "total_seconds": round(time.perf_counter() - t0, 4),
+        },
+    }
@@ -0,0 +1,245 @@
+# app/scoring.py
+"""
+Vectorized scoring core.
+
+JDs and resumes are rows of matrices - dense embeddings, sparse TF-IDF
+rows, binary skill / noun indicators - and each of the four score
+components for an M JDs x N resumes grid is one matrix product:
+
+    keyword     jd_tfidf @ resume_tfidf.T          (rows are L2-normalized)
+    semantic    jd_embeddings @ resume_embeddings.T (rows are L2-normalized)
+    skills      share of the JD's skills the resume has (nice-to-have ones
+                weigh NICE_TO_HAVE_WEIGHT)
+    experience  min(1, JD terms in the resume's term set / max(10, |jd terms|))
+                (noun lemmas and noun phrases, see app.experience)
+
+The final score is a weighted sum of the component grids with one weight
+vector per JD row, so every JD can use its own weights profile. The
+scalar scorers in app.jd_match compute the same numbers for one pair.
+"""
+import os
+from typing import AbstractSet, Dict, Iterable, List, NamedTuple, Optional, Sequence, Union
+
+import numpy as np
+from scipy import sparse
+
+from app.skills import NICE_TO_HAVE_WEIGHT
+
+COMPONENTS = ("keyword", "semantic", "skills", "experience")
+# component -> key in the result "breakdown"
+BREAKDOWN_KEYS = {
+    "keyword": "keyword_overlap",
+    "semantic": "semantic_similarity",
+    "skills": "skill_coverage",
+    "experience": "experience_relevance",
+}
+# experience relevance is "nouns found / max(this, JD noun count)"
+MIN_NOUN_DENOMINATOR = 10
+
+
+class ScoreWeights(NamedTuple):
+    keyword: float
+    semantic: float
+    skills: float
+    experience: float
+
+    def normalized(self) -> "ScoreWeights":
+        total = sum(self)
+        return ScoreWeights(*(w / total for w in self))
+
+
+WEIGHT_PROFILES = {
+    "balanced": ScoreWeights(0.3, 0.3, 0.3, 0.1),
+    "keyword": ScoreWeights(0.5, 0.2, 0.2, 0.1),
+    "semantic": ScoreWeights(0.2, 0.5, 0.2, 0.1),
+    "skills": ScoreWeights(0.2, 0.2, 0.5, 0.1),
+    "experience": ScoreWeights(0.2, 0.2, 0.3, 0.3),
+}
+
+WeightsSpec = Union[None, str, ScoreWeights, Dict[str, float], Sequence[float]]
+
+
+def parse_weights(spec: WeightsSpec) -> ScoreWeights:
+    """
+    Weights from a profile name ("skills"), "keyword=0.4,semantic=0.4,..."
+    (missing components weigh 0), a dict or a 4-sequence; normalized to
+    sum to 1 so final scores stay on 0-100. None means DEFAULT_WEIGHTS.
+    """
+    if spec is None:
+        return DEFAULT_WEIGHTS
+    if isinstance(spec, str):
+        spec = spec.strip()
+        if spec in WEIGHT_PROFILES:
+            return WEIGHT_PROFILES[spec]
+        if "=" not in spec:
+            raise ValueError(f"unknown weights profile {spec!r} (known: {', '.join(WEIGHT_PROFILES)})")
+        pairs = {}
+        for part in spec.split(","):
+            name, _, value = part.partition("=")
+            try:
+                pairs[name.strip()] = float(value)
+            except ValueError:
+                raise ValueError(f"bad weight {part.strip()!r}")
+        spec = pairs
+    if isinstance(spec, dict):
+        unknown = set(spec) - set(COMPONENTS)
+        if unknown:
+            raise ValueError(f"unknown score components {sorted(unknown)} (known: {', '.join(COMPONENTS)})")
+        spec = [spec.get(c, 0.0) for c in COMPONENTS]
+    values = [float(v) for v in spec]
+    if len(values) != len(COMPONENTS) or any(v < 0 for v in values) or not sum(values) > 0:
+        raise ValueError("weights must be 4 non-negative numbers with a positive sum")
+    return ScoreWeights(*values).normalized()
+
+
+# profile name or "keyword=...,semantic=...,skills=...,experience=..."
+DEFAULT_WEIGHTS = parse_weights(os.getenv("SCORE_WEIGHTS", "balanced"))
+
+
+def weights_matrix(weights: Union[WeightsSpec, List[WeightsSpec]], rows: int) -> np.ndarray:
+    """(rows, 4) weights: one spec for every row, or a list with one spec per row."""
+    if isinstance(weights, list) and (not weights or not isinstance(weights[0], (int, float))):
+        if len(weights) != rows:
+            raise ValueError(f"got {len(weights)} weight specs for {rows} JDs")
+        return np.asarray([parse_weights(w) for w in weights], dtype=np.float64).reshape(rows, len(COMPONENTS))
+    return np.tile(np.asarray(parse_weights(weights), dtype=np.float64), (rows, 1))
+
+
+# -------------------------------------------------------
+#  MATRIX BUILDERS
+# -------------------------------------------------------
+def vocabulary(rows: Iterable[Iterable[str]]) -> Dict[str, int]:
+    vocab: Dict[str, int] = {}
+    for row in rows:
+        for term in row:
+            vocab.setdefault(term, len(vocab))
+    return vocab
+
+
+def indicator_matrix(rows: List[Iterable[str]], vocab: Dict[str, int], counts: bool = False) -> sparse.csr_matrix:
+    """
+    One row per item over vocab columns: 1 where the item holds the term
+    (its number of occurrences with counts=True). Terms outside vocab are
+    ignored.
+    """
+    indptr = [0]
+    indices = []
+    data = []
+    for row in rows:
+        cols = {}
+        for term in row:
+            col = vocab.get(term)
+            if col is not None:
+                cols[col] = cols.get(col, 0) + 1
+        indices.extend(cols)
+        data.extend(cols.values() if counts else [1] * len(cols))
+        indptr.append(len(indices))
+    return sparse.csr_matrix((np.asarray(data, dtype=np.float64), np.asarray(indices, dtype=np.int64),
+                              np.asarray(indptr, dtype=np.int64)), shape=(len(rows), len(vocab)))
+
+
+# -------------------------------------------------------
+#  COMPONENT GRIDS (M JDs x N resumes)
+# -------------------------------------------------------
+def keyword_grid(jd_tfidf: sparse.csr_matrix, resume_tfidf: sparse.csr_matrix) -> np.ndarray:
+    """TF-IDF cosine (both sides' rows from the same app.keyword_model.TermSpace)."""
+    return (jd_tfidf @ resume_tfidf.T).toarray()
+
+
+def semantic_grid(jd_embeddings: np.ndarray, resume_embeddings: np.ndarray) -> np.ndarray:
+    """Cosine of L2-normalized embeddings."""
+    return np.asarray(jd_embeddings, dtype=np.float32) @ np.asarray(resume_embeddings, dtype=np.float32).T
+
+
+def skill_coverage_grid(jd_skills: List[List[str]], resume_skills: List[List[str]],
+                        jd_nice_skills: Optional[List[List[str]]] = None,
+                        nice_weight: float = NICE_TO_HAVE_WEIGHT) -> np.ndarray:
+    """
+    Weighted share of each JD's skills (case-insensitive) found in each
+    resume's skills: required skills count 1, nice-to-have ones (disjoint
+    from the required ones, see app.skills.JDSkills) nice_weight. 0 for
+    JDs without skills.
+    """
+    jd_lower = [[s.lower() for s in skills] for skills in jd_skills]
+    nice_lower = [[s.lower() for s in skills] for skills in jd_nice_skills or [[] for _ in jd_skills]]
+    vocab = vocabulary(jd_lower + nice_lower)
+    resume_matrix = indicator_matrix([[s.lower() for s in skills] for skills in resume_skills], vocab).T
+    jd_matrix = indicator_matrix(jd_lower, vocab) + nice_weight * indicator_matrix(nice_lower, vocab)
+    overlap = (jd_matrix @ resume_matrix).toarray()
+    total = np.asarray([len(r) + nice_weight * len(n) for r, n in zip(jd_lower, nice_lower)], dtype=np.float64)
+    return np.divide(overlap, total[:, None], out=np.zeros_like(overlap), where=total[:, None] > 0)
+
+
+def experience_grid(jd_terms: List[Sequence[str]], resume_terms: List[AbstractSet[str]]) -> np.ndarray:
+    """
+    JD experience terms found in each resume's term set (both from
+    app.experience), over max(10, JD term count), capped at 1: one sparse
+    product of the JD-term and resume-term indicators.
+    """
+    vocab = vocabulary(jd_terms)
+    present = indicator_matrix(resume_terms, vocab)
+    matches = (indicator_matrix(jd_terms, vocab) @ present.T).toarray()
+    denominator = np.maximum(MIN_NOUN_DENOMINATOR, [len(t) for t in jd_terms]).astype(np.float64)
+    return np.minimum(1.0, matches / denominator[:, None])
+
+
+def combine_grid(components: Dict[str, np.ndarray], weights: np.ndarray) -> np.ndarray:
+    """Final scores (0-100): per-JD weighted sum of the component grids; weights is (M, 4)."""
+    stacked = np.stack([components[c] for c in COMPONENTS])          # (4, M, N)
+    return np.einsum("cmn,mc->mn", stacked, weights) * 100
+
+
+# -------------------------------------------------------
+#  RESULT GRID
+# -------------------------------------------------------
+class ScoreGrid:
+    """Component and final score matrices for M JDs x N resumes."""
+
+    def __init__(self, components: Dict[str, np.ndarray], weights: np.ndarray,
+                 section_similarity: Optional[List[List[dict]]] = None,
+                 experience_terms: Optional[tuple] = None):
+        self.components = components
+        self.weights = weights
+        self.final = combine_grid(components, weights)
+        self.section_similarity = section_similarity   # [jd][resume] -> per-section scores (chunked mode)
+        self.experience_terms = experience_terms       # ([jd terms], [resume term sets]) for matched terms
+
+    @property
+    def shape(self) -> tuple:
+        return self.final.shape
+
+    def result(self, jd: int, resume: int) -> dict:
+        """One cell, shaped like app.jd_match.combine_scores output."""
+        result = {
+            "final_score": round(float(self.final[jd, resume]), 1),
+            "breakdown": {BREAKDOWN_KEYS[c]: round(float(self.components[c][jd, resume]) * 100, 1)
+                          for c in COMPONENTS},
+        }
+        if self.experience_terms is not None:
+            jd_terms, resume_terms = self.experience_terms
+            result["experience_matches"] = [t for t in jd_terms[jd] if t in resume_terms[resume]]
+        if self.section_similarity is not None:
+            result["section_similarity"] = self.section_similarity[jd][resume]
+        return result
+
+    def ranked(self, jd: int, top_k: Optional[int] = None) -> List[dict]:
+        """Resumes for one JD, best first, each with "index" (column) and "rank"."""
+        # stable sort on the rounded score keeps upload order among ties
+        scores = np.round(self.final[jd], 1)
+        order = np.argsort(-scores, kind="stable")
+        if top_k:
+            order = order[:top_k]
+        out = []
+        for pos, i in enumerate(order, start=1):
+            out.append({**self.result(jd, int(i)), "index": int(i), "rank": pos})
+        return out
+
+    def to_dict(self, top_k: Optional[int] = None) -> dict:
+        """JSON-friendly: rounded matrices (rows = JDs, columns = resumes) plus per-JD rankings."""
+        return {
+            "shape": list(self.shape),
+            "weights": [dict(zip(COMPONENTS, np.round(w, 4).tolist())) for w in self.weights],
+            "final_score": np.round(self.final, 1).tolist(),
+            "breakdown": {BREAKDOWN_KEYS[c]: np.round(self.components[c] * 100, 1).tolist() for c in COMPONENTS},
+            "ranked": [self.ranked(j, top_k) for j in range(self.shape[0])],
+        }
@@ -0,0 +1,313 @@
+# app/skills.py
+"""
+Dictionary-driven skill matcher.
+
+The skill dictionary maps a canonical skill name to its synonyms
+("kubernetes": ["k8s"]). All surface forms are compiled into one
+Aho-Corasick automaton, so a document is scanned once no matter how many
+skills the dictionary holds. Matches must sit on token boundaries, which
+keeps "java" out of "javascript" and "git" out of "digital".
+
+The same matcher reads job descriptions: extract_jd_skills() splits the
+skills a JD mentions into required and nice-to-have ones (by the wording
+of the line or heading they appear under) and caches the result per JD
+text hash.
+"""
+import bisect
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict, deque
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+DEFAULT_SKILLS_PATH = os.path.join(os.path.dirname(__file__), "data", "skills.json")
+SKILLS_DB_PATH = os.getenv("SKILLS_DB_PATH", DEFAULT_SKILLS_PATH)
+# a nice-to-have skill counts this much towards skill coverage (a required one counts 1)
+NICE_TO_HAVE_WEIGHT = float(os.getenv("NICE_TO_HAVE_WEIGHT", "0.5"))
+# JDs whose extracted requirements are kept in memory
+JD_SKILLS_CACHE_ITEMS = int(os.getenv("JD_SKILLS_CACHE_ITEMS", "512"))
+
+
+class SkillMatch(NamedTuple):
+    skill: str            # canonical name
+    surface: str          # text as it appeared in the document
+    start: int            # character offsets into the original text
+    end: int
+    section: Optional[str]
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum()
+
+
+class SkillMatcher:
+    def __init__(self, dictionary: Dict[str, Iterable[str]]):
+        # state tables: goto transitions, failure links, outputs (pattern length, canonical)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, str]]] = [[]]
+        self.skills = sorted(dictionary)
+        for canonical, synonyms in dictionary.items():
+            canonical = canonical.strip().lower()
+            for form in {canonical, *(s.strip().lower() for s in synonyms or [])}:
+                if form:
+                    self._add(" ".join(form.split()), canonical)
+        self._build()
+
+    # -------------------------------------------------------
+    #  CONSTRUCTION
+    # -------------------------------------------------------
+    def _add(self, pattern: str, canonical: str):
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((len(pattern), canonical))
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    @classmethod
+    def from_file(cls, path: str) -> "SkillMatcher":
+        """
+        Load a dictionary file: JSON ({"canonical": ["synonym", ...]} or a
+        list of names) or plain text, one skill per line as
+        "canonical: synonym, synonym".
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            if path.endswith(".json"):
+                data = json.load(f)
+                if isinstance(data, list):
+                    data = {name: [] for name in data}
+                return cls(data)
+            data = {}
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                name, _, syns = line.partition(":")
+                data[name] = [s for s in syns.split(",") if s.strip()]
+            return cls(data)
+
+    # -------------------------------------------------------
+    #  MATCHING
+    # -------------------------------------------------------
+    def find(self, text: str, section_spans: Optional[List[Tuple[str, int, int]]] = None) -> List[SkillMatch]:
+        """
+        All skill mentions in text, leftmost-longest, with character offsets.
+        Whitespace runs in the text match a single space in a pattern.
+        section_spans ([(name, start, end)], see app.parse.section_spans)
+        is used to tag each match with the section it came from.
+        """
+        if not text:
+            return []
+        candidates = []
+        positions = []  # normalized index -> original index
+        state = 0
+        prev_space = True
+        for i, ch in enumerate(text):
+            if ch.isspace():
+                if prev_space:
+                    continue
+                ch = " "
+                prev_space = True
+            else:
+                ch = ch.lower()
+                prev_space = False
+            positions.append(i)
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            if self._out[state]:
+                end_norm = len(positions)
+                for length, canonical in self._out[state]:
+                    start = positions[end_norm - length]
+                    candidates.append((start, i + 1, canonical))
+
+        matches = []
+        last_end = -1
+        # leftmost first, longest first; drop overlaps and non-boundary hits
+        for start, end, canonical in sorted(candidates, key=lambda m: (m[0], -m[1])):
+            if start < last_end:
+                continue
+            if start > 0 and _is_word_char(text[start - 1]) and _is_word_char(text[start]):
+                continue
+            if end < len(text) and _is_word_char(text[end]) and _is_word_char(text[end - 1]):
+                continue
+            matches.append(SkillMatch(canonical, text[start:end], start, end,
+                                      _section_at(section_spans, start)))
+            last_end = end
+        return matches
+
+    def extract(self, text: str) -> List[str]:
+        """Unique canonical skills in order of first mention."""
+        seen = {}
+        for m in self.find(text):
+            seen.setdefault(m.skill, None)
+        return list(seen)
+
+
+def _section_at(section_spans, offset: int) -> Optional[str]:
+    if not section_spans:
+        return None
+    for name, start, end in section_spans:
+        if start <= offset < end:
+            return name
+    return None
+
+
+# -------------------------------------------------------
+#  SHARED MATCHERS
+# -------------------------------------------------------
+_default_matcher: Optional[SkillMatcher] = None
+
+
+def get_default_matcher() -> SkillMatcher:
+    """Matcher for SKILLS_DB_PATH, compiled once per process."""
+    global _default_matcher
+    if _default_matcher is None:
+        _default_matcher = SkillMatcher.from_file(SKILLS_DB_PATH)
+    return _default_matcher
+
+
+@lru_cache(maxsize=32)
+def matcher_for(skills: Tuple[str, ...]) -> SkillMatcher:
+    """Matcher for an ad-hoc skill list (no synonyms)."""
+    return SkillMatcher({s: [] for s in skills})
+
+
+# -------------------------------------------------------
+#  JD REQUIREMENTS (required vs nice-to-have skills)
+# -------------------------------------------------------
+_NICE_TO_HAVE_RE = re.compile(
+    r"\b(?:nice[ -]to[ -]haves?|good[ -]to[ -]have|preferred|bonus|(?:is|are|as|a big|a) plus|desirable|desired"
+    r"|ideally|optional|would be (?:great|nice|helpful|an advantage)|an advantage)\b",
+    re.IGNORECASE,
+)
+# headings that (re)open a required block
+_REQUIRED_RE = re.compile(
+    r"\b(?:requirements?|required|must[ -]haves?|must|minimum|basic qualifications|qualifications"
+    r"|what you(?:'ll| will)? need|you have|responsibilities|skills)\b",
+    re.IGNORECASE,
+)
+_HEADING_MAX_WORDS = 6
+# a heading inside a line, after . ; , | or a bullet: "Preferred: React. Required: Python"
+_INLINE_HEADING_RE = re.compile(
+    rf"(?<=[.;,|•])\s+(?=(?:[\w-]+\s+){{0,2}}(?:{_NICE_TO_HAVE_RE.pattern}|{_REQUIRED_RE.pattern})\s*:)",
+    re.IGNORECASE,
+)
+
+
+class JDSkills(NamedTuple):
+    """Skills a JD asks for, with the set lookups precomputed."""
+    required: Tuple[str, ...]
+    nice_to_have: Tuple[str, ...]
+    required_set: FrozenSet[str]
+    nice_set: FrozenSet[str]
+
+    @classmethod
+    def of(cls, required: Iterable[str], nice_to_have: Iterable[str] = ()) -> "JDSkills":
+        required = tuple(dict.fromkeys(s.lower() for s in required))
+        required_set = frozenset(required)
+        # a skill asked for both ways is required
+        nice = tuple(s for s in dict.fromkeys(s.lower() for s in nice_to_have) if s not in required_set)
+        return cls(required, nice, required_set, frozenset(nice))
+
+    def __bool__(self) -> bool:
+        return bool(self.required or self.nice_to_have)
+
+    def coverage(self, resume_skills: Iterable[str], nice_weight: float = NICE_TO_HAVE_WEIGHT) -> float:
+        """Weighted share of the JD's skills the resume has (required 1, nice-to-have nice_weight)."""
+        total = len(self.required) + nice_weight * len(self.nice_to_have)
+        if not total:
+            return 0.0
+        have = {s.lower() for s in resume_skills}
+        return (len(self.required_set & have) + nice_weight * len(self.nice_set & have)) / total
+
+
+def _segments(line: str) -> List[Tuple[int, str]]:
+    """(offset, text) of a line's parts, split before inline headings."""
+    cuts = [0] + [m.end() for m in _INLINE_HEADING_RE.finditer(line)]
+    return [(a, line[a:b]) for a, b in zip(cuts, cuts[1:] + [len(line)])]
+
+
+def _line_kinds(text: str) -> Tuple[List[int], List[bool]]:
+    """(segment start offsets, nice-to-have flag per segment) for a JD; segments are lines split at inline headings."""
+    starts, nice = [], []
+    block_nice = False
+    pos = 0
+    for line in text.splitlines(keepends=True):
+        for offset, segment in _segments(line):
+            stripped = segment.strip().strip("#*-•").strip()
+            is_nice = bool(_NICE_TO_HAVE_RE.search(stripped))
+            # a heading ("Nice to have:", "Requirements") sets the kind of the lines under it;
+            # "Bonus: Kafka" or "Docker is a plus" only mark their own segment
+            title = stripped.rstrip(":").strip()
+            if title and len(title.split()) <= _HEADING_MAX_WORDS and ":" not in title and (
+                    stripped.endswith(":") or _NICE_TO_HAVE_RE.match(title) or _REQUIRED_RE.match(title)):
+                block_nice = is_nice
+            # "Required: Python" states its own kind, whatever block it sits in
+            label, colon, _ = stripped.partition(":")
+            labelled = bool(colon) and len(label.split()) <= _HEADING_MAX_WORDS and bool(
+                _NICE_TO_HAVE_RE.search(label) or _REQUIRED_RE.search(label))
+            starts.append(pos + offset)
+            nice.append(is_nice or (block_nice and not labelled))
+        pos += len(line)
+    return starts, nice
+
+
+def _split_requirements(text: str, matcher: SkillMatcher) -> JDSkills:
+    starts, nice = _line_kinds(text)
+    required, nice_to_have = [], []
+    for m in matcher.find(text):
+        line = bisect.bisect_right(starts, m.start) - 1
+        (nice_to_have if line >= 0 and nice[line] else required).append(m.skill)
+    return JDSkills.of(required, nice_to_have)
+
+
+_jd_skills: "OrderedDict[str, JDSkills]" = OrderedDict()
+_jd_skills_lock = threading.Lock()
+
+
+def extract_jd_skills(text: str, matcher: Optional[SkillMatcher] = None) -> JDSkills:
+    """
+    Required and nice-to-have skills of a JD. A skill counts as
+    nice-to-have when its line, or the heading it sits under, says so
+    ("Nice to have:", "... is a plus", "Preferred qualifications"); lines
+    with inline headings ("Preferred: React. Required: Python") are
+    judged part by part. One
+    matcher pass per JD text (default dictionary results are cached by
+    the text's SHA-256).
+    """
+    if matcher is not None:
+        return _split_requirements(text or "", matcher)
+    key = hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+    with _jd_skills_lock:
+        found = _jd_skills.get(key)
+        if found is not None:
+            _jd_skills.move_to_end(key)
+            return found
+    found = _split_requirements(text or "", get_default_matcher())
+    with _jd_skills_lock:
+        _jd_skills[key] = found
+        while len(_jd_skills) > JD_SKILLS_CACHE_ITEMS:
+            _jd_skills.popitem(last=False)
+    return found
@@ -1,15 +1,21 @@
 # app/suggestions.py
-from typing import List
+from typing import List, Union
 
-def generate_skill_suggestions(jd_skills: List[str], resume_skills: List[str]):
-    """Find missing and matched skills."""
-    jd_lower = [s.lower() for s in jd_skills]
-    res_lower = [s.lower() for s in resume_skills]
-    missing = [s for s in jd_lower if s not in res_lower]
-    matched = [s for s in jd_lower if s in res_lower]
+from app.skills import JDSkills
+
+def generate_skill_suggestions(jd_skills: Union[JDSkills, List[str]], resume_skills: List[str]):
+    """
+    Find missing and matched skills. jd_skills is a JDSkills (see
+    app.skills.extract_jd_skills) or a plain list, all of it required;
+    missing nice-to-have skills are listed apart.
+    """
+    if not isinstance(jd_skills, JDSkills):
+        jd_skills = JDSkills.of(jd_skills)
+    res_lower = {s.lower() for s in resume_skills}
     return {
-        "missing_skills": missing,
-        "matched_skills": matched,
+        "missing_skills": [s for s in jd_skills.required if s not in res_lower],
+        "matched_skills": [s for s in jd_skills.required + jd_skills.nice_to_have if s in res_lower],
+        "missing_nice_to_have": [s for s in jd_skills.nice_to_have if s not in res_lower],
     }
 
 def generate_text_suggestions(score: float, missing_skills: List[str]):
@@ -0,0 +1,82 @@
+# app/timing.py
+"""
+Request-scoped timing spans.
+
+    with collect() as timings:          # one per request / job
+        ...
+        with span("jd_match.semantic"):
+            ...
+    timings.as_ms()  -> {"jd_match.semantic": 12.3, ...}
+
+Spans add their wall time to the collector of the current context (a
+ContextVar, so concurrent requests never mix) and are no-ops when nothing
+is collecting. Work handed to the thread pool keeps the caller's context
+(see app.workers); work done in the process pool collects into its own
+collector and ships the result back as plain data (see
+app.pipeline.extract_and_parse) to be merged in.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+
+class Timings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: Dict[str, float] = {}   # name -> seconds (repeated spans accumulate)
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def merge(self, spans: Dict[str, float], prefix: str = ""):
+        for name, seconds in (spans or {}).items():
+            self.add(prefix + name, seconds)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def as_ms(self) -> Dict[str, float]:
+        with self._lock:
+            return {name: round(seconds * 1000, 2) for name, seconds in self.spans.items()}
+
+
+_current: ContextVar[Optional[Timings]] = ContextVar("timings", default=None)
+
+
+def current() -> Optional[Timings]:
+    return _current.get()
+
+
+@contextmanager
+def collect():
+    """Collect the spans of everything run in this context (nested collectors shadow outer ones)."""
+    timings = Timings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name: str):
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - t0)
+
+
+def record(name: str, seconds: float):
+    """Add an externally measured duration to the current collector."""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
@@ -0,0 +1,184 @@
+# app/uploads.py
+"""
+Streaming upload ingestion.
+
+Uploads are copied to a spool file in UPLOAD_CHUNK_BYTES chunks instead of
+being read into memory whole; the SHA-256 is computed on the way through.
+The file type is decided from its first bytes (not the client's
+filename / content type) and anything that is not a PDF, DOCX, PNG or JPEG
+is rejected after the first chunk (415), as is anything larger than
+UPLOAD_MAX_BYTES (413) - before any extraction work starts. Extractors then
+open the spool file by path, so the process pool receives a path instead
+of a pickled copy of the bytes.
+"""
+import hashlib
+import os
+import resource
+import sys
+import tempfile
+import threading
+import zipfile
+from dataclasses import dataclass, field
+from typing import Optional
+
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(256 * 1024)))
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or tempfile.gettempdir()
+
+# leading bytes -> kind understood by app.extract.extract_document
+MAGIC = [
+    (b"%PDF-", "pdf"),
+    (b"PK\x03\x04", "docx"),
+    (b"\x89PNG\r\n\x1a\n", "image"),
+    (b"\xff\xd8\xff", "image"),
+]
+# some PDF writers put a few bytes of junk before the header
+PDF_HEADER_WINDOW = 1024
+
+
+class UploadTooLarge(Exception):
+    """The upload exceeds UPLOAD_MAX_BYTES (maps to HTTP 413)."""
+
+
+class UnsupportedUpload(Exception):
+    """The upload is not a PDF, DOCX or PNG/JPEG image (maps to HTTP 415)."""
+
+
+def sniff_kind(head: bytes) -> Optional[str]:
+    for magic, kind in MAGIC:
+        if head.startswith(magic):
+            return kind
+    if b"%PDF-" in head[:PDF_HEADER_WINDOW]:
+        return "pdf"
+    return None
+
+
+@dataclass
+class SpooledUpload:
+    path: str
+    filename: str
+    content_type: Optional[str]
+    kind: str
+    size: int
+    sha256: str
+    _released: bool = field(default=False, repr=False)
+
+    def cleanup(self):
+        if self._released:
+            return
+        self._released = True
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        _stats.release(self.size)
+
+    def read_bytes(self) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read()
+
+
+class _SpoolStats:
+    def __init__(self):
+        self.active = 0
+        self.active_bytes = 0
+        self.peak_active = 0
+        self.peak_active_bytes = 0
+        self.accepted = 0
+        self.rejected_size = 0
+        self.rejected_type = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, size: int):
+        with self._lock:
+            self.active += 1
+            self.active_bytes += size
+            self.accepted += 1
+            self.peak_active = max(self.peak_active, self.active)
+            self.peak_active_bytes = max(self.peak_active_bytes, self.active_bytes)
+
+    def release(self, size: int):
+        with self._lock:
+            self.active -= 1
+            self.active_bytes -= size
+
+
+_stats = _SpoolStats()
+
+
+def _is_docx(path: str) -> bool:
+    try:
+        with zipfile.ZipFile(path) as zf:
+            return "word/document.xml" in zf.namelist()
+    except zipfile.BadZipFile:
+        return False
+
+
+async def spool_upload(upload, max_bytes: int = UPLOAD_MAX_BYTES, chunk_bytes: int = UPLOAD_CHUNK_BYTES,
+                       spool_dir: str = UPLOAD_SPOOL_DIR) -> SpooledUpload:
+    """
+    Stream a FastAPI UploadFile into a spool file. Raises UploadTooLarge /
+    UnsupportedUpload as soon as the limit is crossed or the first chunk
+    shows an unsupported type; the partial file is removed in that case.
+    Call cleanup() on the result when done.
+    """
+    declared = getattr(upload, "size", None)
+    if declared is not None and declared > max_bytes:
+        _stats.rejected_size += 1
+        raise UploadTooLarge(f"{upload.filename}: {declared} bytes exceeds the {max_bytes} byte limit")
+
+    digest = hashlib.sha256()
+    size = 0
+    kind = None
+    fd, path = tempfile.mkstemp(prefix="upload-", dir=spool_dir)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await upload.read(chunk_bytes)
+                if not chunk:
+                    break
+                if kind is None:
+                    kind = sniff_kind(chunk)
+                    if kind is None:
+                        _stats.rejected_type += 1
+                        raise UnsupportedUpload(f"{upload.filename}: not a PDF, DOCX or PNG/JPEG file")
+                size += len(chunk)
+                if size > max_bytes:
+                    _stats.rejected_size += 1
+                    raise UploadTooLarge(f"{upload.filename}: exceeds the {max_bytes} byte limit")
+                digest.update(chunk)
+                out.write(chunk)
+        if kind is None:
+            _stats.rejected_type += 1
+            raise UnsupportedUpload(f"{upload.filename}: empty file")
+        if kind == "docx" and not _is_docx(path):
+            _stats.rejected_type += 1
+            raise UnsupportedUpload(f"{upload.filename}: ZIP archive is not a Word document")
+    except BaseException:
+        os.remove(path)
+        raise
+    _stats.acquire(size)
+    return SpooledUpload(path=path, filename=upload.filename, content_type=upload.content_type,
+                         kind=kind, size=size, sha256=digest.hexdigest())
+
+
+def peak_rss_kb(who=resource.RUSAGE_SELF) -> int:
+    rss = resource.getrusage(who).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def stats() -> dict:
+    return {
+        "max_bytes": UPLOAD_MAX_BYTES,
+        "chunk_bytes": UPLOAD_CHUNK_BYTES,
+        "active": _stats.active,
+        "active_bytes": _stats.active_bytes,
+        "peak_active": _stats.peak_active,
+        "peak_active_bytes": _stats.peak_active_bytes,
+        "accepted": _stats.accepted,
+        "rejected_size": _stats.rejected_size,
+        "rejected_type": _stats.rejected_type,
+        # API process only; process-pool workers report their own peak with each extraction
+        "peak_rss_kb": peak_rss_kb(),
+    }
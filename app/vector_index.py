@@ -0,0 +1,176 @@
+# app/vector_index.py
+"""
+Local approximate-nearest-neighbour index over normalized embeddings.
+
+Vectors live in one growing float32 matrix, so small pools are searched
+exactly (one matrix-vector product). Once the pool passes IVF_THRESHOLD
+an inverted-file layer is trained on top: k-means centroids, one posting
+list per centroid, and a query only scans the rows in its nprobe closest
+lists. New vectors are assigned to their nearest centroid as they arrive;
+the centroids are retrained when the pool has doubled since the last
+training. Training runs in a background thread: searches keep using the
+current lists (or the exact scan) until the new centroids are swapped in.
+"""
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+IVF_THRESHOLD = int(os.getenv("VECTOR_IVF_THRESHOLD", "20000"))
+IVF_NPROBE = int(os.getenv("VECTOR_IVF_NPROBE", "8"))
+KMEANS_ITERATIONS = 10
+# training points per centroid (the rest are only assigned, not trained on)
+KMEANS_POINTS_PER_CENTROID = 40
+
+
+def _kmeans(data: np.ndarray, k: int, iterations: int = KMEANS_ITERATIONS, seed: int = 0) -> np.ndarray:
+    """Spherical k-means (vectors and centroids kept unit length)."""
+    rng = np.random.default_rng(seed)
+    sample = k * KMEANS_POINTS_PER_CENTROID
+    if len(data) > sample:
+        data = data[rng.choice(len(data), sample, replace=False)]
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(data @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+        empty = np.bincount(assign, minlength=k) == 0
+        # re-seed empty clusters from random points
+        sums[empty] = data[rng.integers(len(data), size=int(empty.sum()))]
+        centroids = sums
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids /= norms
+    return centroids
+
+
+class VectorIndex:
+    def __init__(self, dim: Optional[int] = None, ivf_threshold: int = IVF_THRESHOLD,
+                 nprobe: int = IVF_NPROBE, background_training: bool = True):
+        self.dim = dim
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._vectors = np.zeros((0, dim or 0), dtype=np.float32)
+        self._size = 0
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[List[int]] = []
+        self._trained_at = 0
+        self._lock = threading.RLock()
+        self.background_training = background_training
+        self._training: Optional[threading.Thread] = None
+
+    def __len__(self):
+        return self._size
+
+    # -------------------------------------------------------
+    #  BUILDING
+    # -------------------------------------------------------
+    def _grow(self, needed: int):
+        capacity = len(self._ids)
+        if needed <= capacity:
+            return
+        new_cap = max(needed, capacity * 2, 1024)
+        ids = np.zeros(new_cap, dtype=np.int64)
+        vecs = np.zeros((new_cap, self.dim), dtype=np.float32)
+        ids[:self._size] = self._ids[:self._size]
+        vecs[:self._size] = self._vectors[:self._size]
+        self._ids, self._vectors = ids, vecs
+
+    def add(self, ids, vectors: np.ndarray):
+        """Append vectors (one row per id). Vectors should already be L2-normalized."""
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        ids = np.atleast_1d(np.asarray(ids, dtype=np.int64))
+        if len(ids) == 0:
+            return
+        with self._lock:
+            if self.dim is None or self._vectors.shape[1] == 0:
+                self.dim = vectors.shape[1]
+                self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+            start = self._size
+            self._grow(start + len(ids))
+            self._ids[start:start + len(ids)] = ids
+            self._vectors[start:start + len(ids)] = vectors
+            self._size += len(ids)
+
+            if self._centroids is not None:
+                assign = np.argmax(vectors @ self._centroids.T, axis=1)
+                for row, c in zip(range(start, self._size), assign):
+                    self._lists[c].append(row)
+                if self._size >= 2 * self._trained_at:
+                    self._start_training()
+            elif self._size >= self.ivf_threshold:
+                self._start_training()
+
+    def _start_training(self):
+        if self._training is not None:
+            return
+        if not self.background_training:
+            self._train()
+            return
+        self._training = threading.Thread(target=self._train, name="vector-index-train", daemon=True)
+        self._training.start()
+
+    def _train(self):
+        with self._lock:
+            n = self._size
+            # rows are append-only and _grow copies into a new array, so this view stays valid
+            data = self._vectors[:n]
+        try:
+            centroids = _kmeans(data, min(max(1, int(np.sqrt(n))), n))
+            assign = np.argmax(data @ centroids.T, axis=1)
+            with self._lock:
+                if self._size > n:
+                    # rows added while training
+                    late = np.argmax(self._vectors[n:self._size] @ centroids.T, axis=1)
+                    assign = np.concatenate([assign, late])
+                lists = [[] for _ in range(len(centroids))]
+                for row, c in enumerate(assign):
+                    lists[c].append(row)
+                self._centroids, self._lists, self._trained_at = centroids, lists, n
+        finally:
+            with self._lock:
+                self._training = None
+
+    def wait_for_training(self, timeout: Optional[float] = None):
+        training = self._training
+        if training is not None:
+            training.join(timeout)
+
+    # -------------------------------------------------------
+    #  SEARCH
+    # -------------------------------------------------------
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """Top-k (id, cosine similarity) for a normalized query vector."""
+        query = np.asarray(query, dtype=np.float32).ravel()
+        with self._lock:
+            if self._size == 0:
+                return []
+            if self._centroids is None:
+                rows = None
+                scores = self._vectors[:self._size] @ query
+            else:
+                probe = np.argsort(-(self._centroids @ query))[:self.nprobe]
+                rows = np.fromiter((r for c in probe for r in self._lists[c]), dtype=np.int64)
+                if len(rows) < k:
+                    # sparse lists: fall back to an exact scan rather than return too few
+                    rows = None
+                    scores = self._vectors[:self._size] @ query
+                else:
+                    scores = self._vectors[rows] @ query
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            picked = top if rows is None else rows[top]
+            return [(int(self._ids[r]), float(scores[t])) for r, t in zip(picked, top)]
+
+    def stats(self) -> dict:
+        return {
+            "size": self._size,
+            "dim": self.dim,
+            "mode": "ivf" if self._centroids is not None else "flat",
+            "lists": len(self._lists),
+            "nprobe": self.nprobe,
+            "training": self._training is not None,
+        }
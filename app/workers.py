@@ -0,0 +1,164 @@
+# app/workers.py
+"""
+Execution layer that keeps CPU-heavy and blocking work off the asyncio loop.
+
+- CPU pool (processes): PDF/DOCX extraction, OCR and parsing
+- IO pool (threads): model inference, Gemini calls, DB writes
+
+Both pools have a bounded number of pending tasks. When a pool is full the
+request is rejected straight away (429) instead of queueing forever; if the
+process pool died it is restarted and the request gets a 503.
+"""
+import asyncio
+import contextvars
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Callable, List, Sequence
+
+from app.extract import pool_ocr_workers, set_ocr_workers
+from app.profiling import wrap_for_thread
+
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(os.cpu_count() or 2)))
+IO_WORKERS = int(os.getenv("IO_WORKERS", "8"))
+MAX_PENDING_CPU = int(os.getenv("MAX_PENDING_CPU", str(max(4, CPU_WORKERS * 4))))
+MAX_PENDING_IO = int(os.getenv("MAX_PENDING_IO", str(IO_WORKERS * 8)))
+# "spawn" avoids forking a process that already holds torch / model threads
+CPU_START_METHOD = os.getenv("CPU_START_METHOD", "spawn")
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "2"))
+
+
+class PoolSaturated(Exception):
+    """Too many tasks are already pending on a pool (maps to HTTP 429)."""
+
+
+class PoolUnavailable(Exception):
+    """The pool is not running or a worker crashed (maps to HTTP 503)."""
+
+
+class _BoundedPool:
+    def __init__(self, name: str, max_pending: int):
+        self.name = name
+        self.max_pending = max_pending
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.executor = None
+        self._lock = threading.Lock()
+
+    def _admit(self, n: int = 1):
+        if self.executor is None:
+            raise PoolUnavailable(f"{self.name} pool is not running")
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PoolSaturated(f"{self.name} pool is saturated ({self.pending} pending)")
+            self.pending += n
+
+    def _release(self, n: int = 1):
+        with self._lock:
+            self.pending -= n
+            self.completed += n
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+class WorkerPools:
+    def __init__(self, cpu_workers: int = CPU_WORKERS, io_workers: int = IO_WORKERS,
+                 max_pending_cpu: int = MAX_PENDING_CPU, max_pending_io: int = MAX_PENDING_IO):
+        self.cpu_workers = cpu_workers
+        self.io_workers = io_workers
+        self.cpu = _BoundedPool("cpu", max_pending_cpu)
+        self.io = _BoundedPool("io", max_pending_io)
+
+    # -------------------------------------------------------
+    #  LIFECYCLE
+    # -------------------------------------------------------
+    def _new_cpu_executor(self):
+        if self.cpu_workers <= 0:
+            # in-process mode (dev / tests): CPU tasks share the IO threads
+            return ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="cpu")
+        ctx = multiprocessing.get_context(CPU_START_METHOD)
+        # each worker gets its share of the cores for OCR threads
+        return ProcessPoolExecutor(max_workers=self.cpu_workers, mp_context=ctx, initializer=set_ocr_workers,
+                                   initargs=(pool_ocr_workers(self.cpu_workers),))
+
+    def start(self):
+        if self.io.executor is None:
+            self.io.executor = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="io")
+        if self.cpu.executor is None:
+            self.cpu.executor = self._new_cpu_executor()
+
+    def shutdown(self, wait: bool = True):
+        for pool in (self.cpu, self.io):
+            if pool.executor is not None:
+                pool.executor.shutdown(wait=wait, cancel_futures=True)
+                pool.executor = None
+
+    def _restart_cpu(self):
+        old = self.cpu.executor
+        self.cpu.executor = self._new_cpu_executor()
+        if old is not None:
+            old.shutdown(wait=False, cancel_futures=True)
+
+    # -------------------------------------------------------
+    #  SUBMISSION
+    # -------------------------------------------------------
+    async def _run(self, pool: _BoundedPool, fn: Callable, *args):
+        pool._admit()
+        try:
+            loop = asyncio.get_running_loop()
+            if isinstance(pool.executor, ThreadPoolExecutor):
+                # keep the request's context (timing spans, profiling) in the worker thread
+                fn = partial(contextvars.copy_context().run, wrap_for_thread(fn))
+            return await loop.run_in_executor(pool.executor, fn, *args)
+        except BrokenProcessPool as e:
+            self._restart_cpu()
+            raise PoolUnavailable(f"{pool.name} worker crashed: {e}") from e
+        finally:
+            pool._release()
+
+    async def run_cpu(self, fn: Callable, *args):
+        """Run a picklable, module-level function in the process pool."""
+        return await self._run(self.cpu, fn, *args)
+
+    async def run_io(self, fn: Callable, *args):
+        """Run a blocking function (model inference, network, DB) in the thread pool."""
+        return await self._run(self.io, fn, *args)
+
+    async def map_cpu(self, fn: Callable, arg_tuples: Sequence[tuple],
+                      return_exceptions: bool = True) -> List:
+        """
+        Fan a batch out to the process pool. The batch is admitted as a unit
+        (so one large request is not rejected halfway) but counts fully
+        towards pending, which pushes back on the requests after it.
+        """
+        n = len(arg_tuples)
+        if n == 0:
+            return []
+        self.cpu._admit(n)
+        loop = asyncio.get_running_loop()
+        try:
+            futures = [loop.run_in_executor(self.cpu.executor, fn, *args) for args in arg_tuples]
+            results = await asyncio.gather(*futures, return_exceptions=return_exceptions)
+        finally:
+            self.cpu._release(n)
+        if any(isinstance(r, BrokenProcessPool) for r in results):
+            self._restart_cpu()
+            raise PoolUnavailable("cpu worker crashed during batch")
+        return results
+
+    def stats(self) -> dict:
+        return {"cpu": self.cpu.stats(), "io": self.io.stats()}
+
+
+pools = WorkerPools()
@@ -0,0 +1,248 @@
+# bench/corpus.py
+"""
+Synthetic resume / JD corpus for the benchmarks.
+
+Everything is generated offline and deterministically from a seed:
+resumes as text-layer PDFs, scanned (image-only) PDFs, DOCX files and PNG
+screenshots, and job descriptions of short / medium / long length. Skills
+are drawn from app/data/skills.json so the skill matcher has real work to
+do. Run as a script to write a corpus to disk:
+
+    python -m bench.corpus --out /tmp/corpus --resumes 40
+"""
+import argparse
+import io
+import json
+import os
+import random
+import textwrap
+import zipfile
+from typing import Dict, List
+from xml.sax.saxutils import escape
+
+from PIL import Image, ImageDraw, ImageFont
+
+SKILLS_PATH = os.path.join(os.path.dirname(__file__), "..", "app", "data", "skills.json")
+
+KINDS = ("pdf", "scanned_pdf", "docx", "png")
+CONTENT_TYPES = {
+    "pdf": "application/pdf",
+    "scanned_pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "png": "image/png",
+}
+EXTENSIONS = {"pdf": "pdf", "scanned_pdf": "pdf", "docx": "docx", "png": "png"}
+# words per JD
+JD_LENGTHS = {"short": 60, "medium": 250, "long": 900}
+
+FIRST_NAMES = ["Asha", "Ben", "Chen", "Dana", "Elif", "Farid", "Grace", "Hugo", "Ines", "Jon", "Kavya", "Liam"]
+LAST_NAMES = ["Rao", "Smith", "Li", "Okafor", "Yilmaz", "Haddad", "Kim", "Martin", "Silva", "Berg"]
+TITLES = ["Data Analyst", "Backend Engineer", "ML Engineer", "Product Analyst", "Data Engineer", "DevOps Engineer"]
+COMPANIES = ["Acme Corp", "Globex", "Initech", "Umbrella Labs", "Stark Analytics", "Wayne Systems"]
+VERBS = ["Built", "Designed", "Led", "Automated", "Migrated", "Optimized", "Maintained", "Launched", "Analyzed"]
+JD_VERBS = ["build", "design", "own", "automate", "migrate", "optimize", "maintain", "scale", "analyze"]
+OBJECTS = ["reporting pipelines", "customer dashboards", "REST services", "forecasting models", "ETL jobs",
+           "data warehouse tables", "A/B test analyses", "deployment tooling", "monitoring alerts"]
+RESULTS = ["cutting runtime by {n}%", "serving {n}k daily users", "saving {n} hours a week",
+           "improving accuracy by {n}%", "reducing cost by {n}%"]
+FILLER = ("team", "stakeholders", "product", "quality", "delivery", "ownership", "customers", "growth",
+          "communication", "collaboration", "reliability", "metrics", "roadmap", "impact")
+
+
+def load_skills() -> List[str]:
+    with open(SKILLS_PATH, encoding="utf-8") as f:
+        return sorted(json.load(f))
+
+
+# ---------------------------------------------------------
+#  TEXT
+# ---------------------------------------------------------
+def resume_text(rng: random.Random, skills: List[str], jobs: int = 3) -> str:
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    lines = [
+        name,
+        f"{name.split()[0].lower()}.{rng.randint(10, 99)}@example.com | +1 555 {rng.randint(100, 999)} "
+        f"{rng.randint(1000, 9999)}",
+        "",
+        "Summary",
+        f"{rng.choice(TITLES)} with {rng.randint(2, 12)} years of experience in "
+        f"{', '.join(rng.sample(skills, 3))}.",
+        "",
+        "Experience",
+    ]
+    for _ in range(jobs):
+        lines.append(f"{rng.choice(TITLES)}, {rng.choice(COMPANIES)} ({rng.randint(2012, 2020)} - "
+                     f"{rng.randint(2021, 2025)})")
+        for _ in range(rng.randint(2, 4)):
+            lines.append(f"- {rng.choice(VERBS)} {rng.choice(OBJECTS)} using {rng.choice(skills)}, "
+                         f"{rng.choice(RESULTS).format(n=rng.randint(5, 60))}.")
+        lines.append("")
+    lines += [
+        "Education",
+        f"B.Sc. Computer Science, State University ({rng.randint(2005, 2018)})",
+        "",
+        "Skills",
+        ", ".join(rng.sample(skills, rng.randint(6, 14))),
+    ]
+    return "\n".join(lines)
+
+
+def jd_text(rng: random.Random, skills: List[str], words: int) -> str:
+    required = rng.sample(skills, 6)
+    nice = rng.sample(skills, 4)
+    parts = [
+        f"We are hiring a {rng.choice(TITLES)} at {rng.choice(COMPANIES)}.",
+        f"Required skills: {', '.join(required)}.",
+        f"Nice to have: {', '.join(nice)}.",
+    ]
+    body = []
+    while len(" ".join(parts + body).split()) < words:
+        body.append(f"You will {rng.choice(JD_VERBS)} {rng.choice(OBJECTS)} with {rng.choice(skills)} "
+                    f"and work on {rng.choice(FILLER)} and {rng.choice(FILLER)}.")
+    return " ".join(parts[:1] + body + parts[1:])
+
+
+# ---------------------------------------------------------
+#  FILE FORMATS
+# ---------------------------------------------------------
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def text_pdf(text: str, lines_per_page: int = 50) -> bytes:
+    """Minimal PDF with a Helvetica text layer (one object per page)."""
+    lines = [l for raw in text.splitlines() for l in (textwrap.wrap(raw, 90) or [""])]
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+    objs = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in pages:
+        content = "BT /F1 10 Tf 50 760 Td 14 TL " + " ".join(f"({_pdf_escape(l)}) '" for l in page) + " ET"
+        objs.append(f"<< /Length {len(content)} >>\nstream\n{content}\nendstream")
+        objs.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {len(objs)} 0 R "
+                    f"/Resources << /Font << /F1 3 0 R >> >> >>")
+        kids.append(f"{len(objs)} 0 R")
+    objs[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1", "replace")
+    xref = len(out)
+    out += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode()
+    for off in offsets:
+        out += f"{off:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def render_page(text: str, width: int = 1240, margin: int = 60, line_height: int = 22) -> Image.Image:
+    """Text drawn onto a white page (what a scanner or screenshot would produce)."""
+    lines = [l for raw in text.splitlines() for l in (textwrap.wrap(raw, 100) or [""])]
+    img = Image.new("L", (width, max(2 * margin + line_height * len(lines), 400)), 255)
+    draw = ImageDraw.Draw(img)
+    font = ImageFont.load_default()
+    for i, line in enumerate(lines):
+        draw.text((margin, margin + i * line_height), line, fill=0, font=font)
+    return img
+
+
+def scanned_pdf(text: str) -> bytes:
+    buf = io.BytesIO()
+    render_page(text).save(buf, format="PDF", resolution=150)
+    return buf.getvalue()
+
+
+def png(text: str) -> bytes:
+    buf = io.BytesIO()
+    render_page(text).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+_DOCX_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml"
+ ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+</Types>"""
+_DOCX_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1"
+ Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+ Target="word/document.xml"/>
+</Relationships>"""
+
+
+def docx(text: str) -> bytes:
+    paragraphs = "".join(f"<w:p><w:r><w:t xml:space=\"preserve\">{escape(line)}</w:t></w:r></w:p>"
+                         for line in text.splitlines())
+    document = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                f"<w:body>{paragraphs}</w:body></w:document>")
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _DOCX_CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _DOCX_RELS)
+        zf.writestr("word/document.xml", document)
+    return buf.getvalue()
+
+
+RENDERERS = {"pdf": text_pdf, "scanned_pdf": scanned_pdf, "docx": docx, "png": png}
+
+
+# ---------------------------------------------------------
+#  CORPUS
+# ---------------------------------------------------------
+def generate_resumes(n: int, kinds=KINDS, seed: int = 0) -> List[Dict]:
+    """n resumes, cycling through kinds: dicts with name, kind, content_type, data and the source text."""
+    rng = random.Random(seed)
+    skills = load_skills()
+    resumes = []
+    for i in range(n):
+        kind = kinds[i % len(kinds)]
+        text = resume_text(rng, skills, jobs=rng.randint(2, 5))
+        resumes.append({
+            "name": f"resume_{i:04d}_{kind}.{EXTENSIONS[kind]}",
+            "kind": kind,
+            "content_type": CONTENT_TYPES[kind],
+            "data": RENDERERS[kind](text),
+            "text": text,
+        })
+    return resumes
+
+
+def generate_jds(n: int, seed: int = 0) -> List[Dict]:
+    """n JDs, cycling through the short / medium / long lengths."""
+    rng = random.Random(seed + 1)
+    skills = load_skills()
+    sizes = list(JD_LENGTHS.items())
+    return [{"size": size, "text": jd_text(rng, skills, words)}
+            for size, words in (sizes[i % len(sizes)] for i in range(n))]
+
+
+def write_corpus(out_dir: str, resumes: List[Dict], jds: List[Dict]):
+    os.makedirs(out_dir, exist_ok=True)
+    for r in resumes:
+        with open(os.path.join(out_dir, r["name"]), "wb") as f:
+            f.write(r["data"])
+    for i, jd in enumerate(jds):
+        with open(os.path.join(out_dir, f"jd_{i:03d}_{jd['size']}.txt"), "w", encoding="utf-8") as f:
+            f.write(jd["text"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic resume / JD corpus to a directory.")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--resumes", type=int, default=40)
+    parser.add_argument("--jds", type=int, default=6)
+    parser.add_argument("--kinds", default=",".join(KINDS), help=f"comma-separated subset of {','.join(KINDS)}")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    kinds = tuple(k.strip() for k in args.kinds.split(",") if k.strip())
+    write_corpus(args.out, generate_resumes(args.resumes, kinds, args.seed), generate_jds(args.jds, args.seed))
+    print(f"Wrote {args.resumes} resumes and {args.jds} JDs to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,449 @@
+# bench/run.py
+"""
+End-to-end benchmarks.
+
+Up to three phases over a synthetic corpus (bench.corpus):
+
+1. stages: each resume goes through the pipeline one step at a time -
+   extract, sections, skills, TF-IDF, embedding, spaCy, persistence - and
+   every step is timed on its own (the embedding step calls the encoder
+   directly, so the embedding cache does not hide its cost).
+2. throughput: /upload is driven through the FastAPI app in-process
+   (httpx ASGI transport, app startup / shutdown included) at each
+   --concurrency level.
+3. embedding backends (with --embed-backends): every listed backend (see
+   app.embeddings) encodes the corpus texts one at a time (latency) and in
+   batches (throughput); its vectors and JD x resume semantic scores are
+   compared with the first backend's (drift), so the fastest backend
+   within --drift-tolerance score points can be picked.
+
+Latencies are reported as p50 / p95 / p99 plus peak RSS. AI feedback
+uses the local stub backend unless FEEDBACK_BACKEND is set. The app runs
+in a scratch directory, so the database, keyword model and embedding
+cache of the checkout are never touched.
+
+    python -m bench.run                              # run and print
+    python -m bench.run --save-baseline              # also store as bench/baseline.json
+    python -m bench.run --baseline bench/baseline.json --fail-on-regression
+    python -m bench.run --skip-throughput --embed-backends torch,torch-int8,onnx,onnx-int8
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from bench.corpus import KINDS, generate_jds, generate_resumes
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+STAGES = ("extract", "sections", "skills", "tfidf", "embedding", "spacy", "persistence")
+# a metric counts as a regression when it is this much worse than the baseline
+DEFAULT_TOLERANCE = 0.2
+# largest semantic score change (0-100 points) an embedding backend may show against the reference
+DEFAULT_DRIFT_TOLERANCE = 1.0
+
+
+def summarize(samples_ms: list) -> dict:
+    if not samples_ms:
+        return {"n": 0}
+    a = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        "n": int(a.size),
+        "mean_ms": round(float(a.mean()), 3),
+        "p50_ms": round(float(np.percentile(a, 50)), 3),
+        "p95_ms": round(float(np.percentile(a, 95)), 3),
+        "p99_ms": round(float(np.percentile(a, 99)), 3),
+        "max_ms": round(float(a.max()), 3),
+    }
+
+
+def peak_rss_kb(who=resource.RUSAGE_SELF) -> int:
+    rss = resource.getrusage(who).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def _timed(samples: dict, stage: str, fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    samples[stage].append((time.perf_counter() - t0) * 1000)
+    return out
+
+
+# ---------------------------------------------------------
+#  PHASE 1: PER-STAGE LATENCY
+# ---------------------------------------------------------
+def bench_stages(resumes: list, jds: list, texts: list = None) -> dict:
+    """Per-stage latencies; the preprocessed resume texts are appended to texts."""
+    from app.db import save_result
+    from app.extract import extract_document
+    from app.jd_match import preprocess, prepare_jd
+    from app.keyword_model import get_keyword_model
+    from app.models import get_embed_model, get_nlp
+    from app.parse import analyze_document, extract_skills
+
+    samples = {stage: [] for stage in STAGES}
+    by_kind = {kind: [] for kind in KINDS}
+    errors = {}
+    keywords = get_keyword_model()
+    embed_model = get_embed_model()
+    nlp = get_nlp()
+    jd_features = [prepare_jd(jd["text"]) for jd in jds]
+
+    for i, r in enumerate(resumes):
+        t0 = time.perf_counter()
+        try:
+            doc = extract_document(r["data"], r["name"], r["content_type"])
+        except Exception as e:
+            errors.setdefault(r["kind"], str(e) or type(e).__name__)
+            continue
+        elapsed = (time.perf_counter() - t0) * 1000
+        samples["extract"].append(elapsed)
+        by_kind[r["kind"]].append(elapsed)
+        text = doc["text"]
+        if not text.strip():
+            errors.setdefault(r["kind"], "no text extracted")
+            continue
+        jd = jd_features[i % len(jd_features)]
+        clean = preprocess(text)
+        if texts is not None:
+            texts.append(clean)
+
+        # uncached: one section / contact pass per resume
+        _timed(samples, "sections", lambda: analyze_document.__wrapped__(text).section_texts())
+        skills = _timed(samples, "skills", extract_skills, text)
+        _timed(samples, "tfidf", lambda: keywords.score_batch(jd.terms, [clean]))
+        _timed(samples, "embedding", embed_model.encode, [clean])
+        _timed(samples, "spacy", nlp, clean.lower())
+        _timed(samples, "persistence", save_result, r["name"], jd.text, 50.0, {}, [], skills, "")
+
+    return {
+        "stages": {stage: summarize(values) for stage, values in samples.items()},
+        "extract_by_kind": {kind: summarize(values) for kind, values in by_kind.items() if values},
+        "errors": errors,
+    }
+
+
+# ---------------------------------------------------------
+#  PHASE 2: /upload THROUGHPUT (in-process ASGI)
+# ---------------------------------------------------------
+async def _drive(client, resumes: list, jds: list, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], {}
+
+    async def one(i: int):
+        r = resumes[i % len(resumes)]
+        async with semaphore:
+            t0 = time.perf_counter()
+            resp = await client.post("/upload", data={"jd": jds[i % len(jds)]["text"]},
+                                     files={"file": (r["name"], r["data"], r["content_type"])})
+            elapsed = (time.perf_counter() - t0) * 1000
+        statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+        if resp.status_code == 200:
+            latencies.append(elapsed)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    wall = time.perf_counter() - t0
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "ok": len(latencies),
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "wall_seconds": round(wall, 3),
+        "rps": round(len(latencies) / wall, 3) if wall else 0.0,
+        "latency": summarize(latencies),
+    }
+
+
+async def bench_throughput(resumes: list, jds: list, requests: int, concurrency_levels: list) -> dict:
+    import httpx
+    from app.main import app
+
+    await app.router.startup()
+    try:
+        # a failing request is counted as a 500 instead of aborting the run
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            # one untimed request so lazy model loading is not billed to the first level
+            await _drive(client, resumes, jds, 1, 1)
+            return {f"c{c}": await _drive(client, resumes, jds, requests, c) for c in concurrency_levels}
+    finally:
+        await app.router.shutdown()
+
+
+# ---------------------------------------------------------
+#  PHASE 3: EMBEDDING BACKENDS
+# ---------------------------------------------------------
+def _encode_all(backend, texts: list, batch_size: int) -> tuple:
+    """(per-text latencies in ms, batched texts/s, batched vectors)"""
+    backend.encode(texts[:1], batch_size=1)   # untimed: first call pays for lazy initialisation
+    latencies = []
+    for text in texts:
+        t0 = time.perf_counter()
+        backend.encode([text], batch_size=1)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    t0 = time.perf_counter()
+    vectors = backend.encode(texts, batch_size=batch_size)
+    seconds = time.perf_counter() - t0
+    return latencies, len(texts) / seconds if seconds else 0.0, vectors
+
+
+def bench_embedding_backends(names: list, resume_texts: list, jd_texts: list, batch_size: int, threads: int,
+                             drift_tolerance: float = DEFAULT_DRIFT_TOLERANCE) -> dict:
+    """Latency / throughput / drift per backend; drift is measured against the first backend that loads."""
+    from app.embeddings import get_backend
+    from app.models import EMBED_MODEL_NAME
+    from app.scoring import semantic_grid
+
+    texts = list(jd_texts) + list(resume_texts)
+    reference = None
+    out = {}
+    for name in names:
+        t0 = time.perf_counter()
+        try:
+            backend = get_backend(name, EMBED_MODEL_NAME, threads=threads)
+        except Exception as e:
+            out[name] = {"error": str(e) or type(e).__name__}
+            continue
+        load_seconds = time.perf_counter() - t0
+        latencies, rate, vectors = _encode_all(backend, texts, batch_size)
+        jd_vectors, resume_vectors = vectors[:len(jd_texts)], vectors[len(jd_texts):]
+        grid = semantic_grid(jd_vectors, resume_vectors) * 100
+        result = {
+            "load_seconds": round(load_seconds, 3),
+            "latency": summarize(latencies),
+            "texts_per_s": round(rate, 2),
+        }
+        if reference is None:
+            reference = (name, vectors, grid)
+            result["reference"] = True
+        else:
+            ref_name, ref_vectors, ref_grid = reference
+            # rows are L2-normalized: the row-wise dot product is the cosine to the reference vector
+            cosine = np.sum(vectors * ref_vectors, axis=1)
+            score_drift = np.abs(grid - ref_grid)
+            same_top = np.argmax(grid, axis=1) == np.argmax(ref_grid, axis=1)
+            result["drift"] = {
+                "vs": ref_name,
+                "cosine_mean": round(float(cosine.mean()), 6),
+                "cosine_min": round(float(cosine.min()), 6),
+                "score_drift_mean": round(float(score_drift.mean()), 4),
+                "score_drift_max": round(float(score_drift.max()), 4),
+                "top1_agreement": round(float(same_top.mean()), 4),
+                "within_tolerance": bool(score_drift.max() <= drift_tolerance),
+            }
+        out[name] = result
+        del backend
+    return {"batch_size": batch_size, "threads": threads, "texts": len(texts),
+            "drift_tolerance": drift_tolerance, "backends": out}
+
+
+# ---------------------------------------------------------
+#  BASELINE COMPARISON
+# ---------------------------------------------------------
+def _metrics(report: dict) -> dict:
+    """Flat {name: (value, higher_is_better)} view of a report."""
+    out = {}
+    for stage, s in report.get("stages", {}).items():
+        for p in ("p50_ms", "p95_ms"):
+            if p in s:
+                out[f"stage.{stage}.{p}"] = (s[p], False)
+    for level, t in report.get("throughput", {}).items():
+        out[f"upload.{level}.rps"] = (t["rps"], True)
+        for p in ("p50_ms", "p95_ms", "p99_ms"):
+            if p in t["latency"]:
+                out[f"upload.{level}.{p}"] = (t["latency"][p], False)
+    for name, b in report.get("embedding_backends", {}).get("backends", {}).items():
+        if "error" not in b:
+            out[f"embed.{name}.p50_ms"] = (b["latency"]["p50_ms"], False)
+            out[f"embed.{name}.texts_per_s"] = (b["texts_per_s"], True)
+    out["memory.peak_rss_kb"] = (report["memory"]["peak_rss_kb"], False)
+    return out
+
+
+def compare(report: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> list:
+    """One row per metric present in both reports; "regression" marks the ones worse than tolerance."""
+    current, base = _metrics(report), _metrics(baseline)
+    rows = []
+    for name, (value, higher_is_better) in current.items():
+        if name not in base or not base[name][0]:
+            continue
+        ref = base[name][0]
+        change = (value - ref) / ref
+        worse = -change if higher_is_better else change
+        rows.append({"metric": name, "baseline": ref, "current": value, "change": round(change, 4),
+                     "regression": worse > tolerance})
+    return rows
+
+
+# ---------------------------------------------------------
+#  REPORTING
+# ---------------------------------------------------------
+def print_report(report: dict):
+    print(f"\n== stages ({report['meta']['resumes']} resumes, {report['meta']['jds']} JDs) ==")
+    print(f"{'stage':<14}{'n':>5}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}")
+    for stage, s in report["stages"].items():
+        if s["n"]:
+            print(f"{stage:<14}{s['n']:>5}{s['p50_ms']:>11.2f}{s['p95_ms']:>11.2f}{s['p99_ms']:>11.2f}")
+    for kind, s in report["extract_by_kind"].items():
+        print(f"  extract/{kind:<14}{s['n']:>3}{s['p50_ms']:>11.2f}{s['p95_ms']:>11.2f}{s['p99_ms']:>11.2f}")
+    for kind, error in report["errors"].items():
+        print(f"  ! {kind}: {error}")
+    if report.get("throughput"):
+        print("\n== /upload throughput ==")
+        print(f"{'level':<8}{'ok':>6}{'req/s':>9}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}  statuses")
+        for level, t in report["throughput"].items():
+            lat = t["latency"]
+            if not lat["n"]:
+                print(f"{level:<8}{t['ok']:>6}{t['rps']:>9.2f}{'-':>11}{'-':>11}{'-':>11}  {t['statuses']}")
+                continue
+            print(f"{level:<8}{t['ok']:>6}{t['rps']:>9.2f}{lat['p50_ms']:>11.1f}{lat['p95_ms']:>11.1f}"
+                  f"{lat['p99_ms']:>11.1f}  {t['statuses']}")
+    if report.get("embedding_backends"):
+        eb = report["embedding_backends"]
+        print(f"\n== embedding backends ({eb['texts']} texts, batch {eb['batch_size']}, "
+              f"threads {eb['threads'] or 'default'}, drift tolerance {eb['drift_tolerance']} pts) ==")
+        print(f"{'backend':<12}{'load s':>8}{'p50 ms':>9}{'p95 ms':>9}{'texts/s':>10}{'cos min':>10}"
+              f"{'drift max':>11}{'top1':>7}")
+        for name, b in eb["backends"].items():
+            if "error" in b:
+                print(f"{name:<12}  ! {b['error']}")
+                continue
+            d = b.get("drift")
+            drift = (f"{d['cosine_min']:>10.4f}{d['score_drift_max']:>11.2f}{d['top1_agreement']:>7.0%}"
+                     f"{'' if d['within_tolerance'] else '  OUT OF TOLERANCE'}") if d else "   (reference)"
+            print(f"{name:<12}{b['load_seconds']:>8.2f}{b['latency']['p50_ms']:>9.2f}{b['latency']['p95_ms']:>9.2f}"
+                  f"{b['texts_per_s']:>10.1f}{drift}")
+    mem = report["memory"]
+    print(f"\npeak RSS: {mem['peak_rss_kb'] / 1024:.1f} MB (after stages {mem['after_stages_kb'] / 1024:.1f} MB, "
+          f"pool workers {mem['children_peak_rss_kb'] / 1024:.1f} MB)")
+
+
+def print_comparison(rows: list, tolerance: float):
+    print(f"\n== vs baseline (tolerance {tolerance:.0%}) ==")
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(f"{row['metric']:<28}{row['baseline']:>12.2f}{row['current']:>12.2f}{row['change']:>+9.1%}  {flag}")
+
+
+# ---------------------------------------------------------
+#  CLI
+# ---------------------------------------------------------
+def _setup_environment(workdir: str):
+    """Point the app at a scratch directory and the stub feedback backend (before app is imported)."""
+    os.environ.setdefault("FEEDBACK_BACKEND", "stub")
+    os.environ.setdefault("EMBED_CACHE_DIR", os.path.join(workdir, "embedding_cache"))
+    os.environ.setdefault("KEYWORD_MODEL_PATH", os.path.join(workdir, "keyword_model.joblib"))
+    os.environ.setdefault("WARMUP_MODELS", "false")
+    os.chdir(workdir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the resume pipeline and the /upload endpoint.")
+    parser.add_argument("--resumes", type=int, default=40, help="synthetic resumes (cycled through all kinds)")
+    parser.add_argument("--jds", type=int, default=6)
+    parser.add_argument("--kinds", default=",".join(KINDS), help=f"comma-separated subset of {','.join(KINDS)}")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=None, help="/upload requests per level (default: --resumes)")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated concurrency levels")
+    parser.add_argument("--skip-throughput", action="store_true")
+    parser.add_argument("--embed-backends", default=None,
+                        help="comma-separated embedding backends to compare, the first one as reference "
+                             "(e.g. torch,torch-int8,onnx,onnx-int8)")
+    parser.add_argument("--embed-batch-size", type=int, default=None, help="default: EMBED_BATCH_SIZE")
+    parser.add_argument("--embed-threads", type=int, default=None, help="default: EMBED_THREADS")
+    parser.add_argument("--drift-tolerance", type=float, default=DEFAULT_DRIFT_TOLERANCE,
+                        help="largest acceptable semantic score change in points (0-100)")
+    parser.add_argument("--workdir", default=None, help="scratch directory for the app's DB and caches")
+    parser.add_argument("--out", default=None, help="write the JSON report here")
+    parser.add_argument("--baseline", default=None, help="compare against this report")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, default=None,
+                        help=f"store this run as the baseline (default path {DEFAULT_BASELINE})")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    kinds = tuple(k.strip() for k in args.kinds.split(",") if k.strip())
+    unknown = set(kinds) - set(KINDS)
+    if unknown:
+        parser.error(f"unknown kinds: {', '.join(sorted(unknown))}")
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    # paths given on the command line are relative to where the command was run
+    out = os.path.abspath(args.out) if args.out else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    save_baseline = os.path.abspath(args.save_baseline) if args.save_baseline else None
+
+    resumes = generate_resumes(args.resumes, kinds, args.seed)
+    jds = generate_jds(args.jds, args.seed)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench-")
+    os.makedirs(workdir, exist_ok=True)
+    _setup_environment(workdir)
+
+    report = {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "resumes": len(resumes),
+            "jds": len(jds),
+            "kinds": list(kinds),
+            "seed": args.seed,
+            "feedback_backend": os.environ["FEEDBACK_BACKEND"],
+            "embed_backend": os.environ.get("EMBED_BACKEND", "torch"),
+            "workdir": workdir,
+        },
+    }
+    from app.db import init_db, writer
+    init_db()
+    texts = []
+    report.update(bench_stages(resumes, jds, texts))
+    writer.flush()
+    after_stages = peak_rss_kb()
+    if not args.skip_throughput:
+        report["throughput"] = asyncio.run(
+            bench_throughput(resumes, jds, args.requests or len(resumes), levels))
+    if args.embed_backends:
+        from app.embeddings import EMBED_BATCH_SIZE, EMBED_THREADS
+        from app.jd_match import preprocess
+        names = [b.strip() for b in args.embed_backends.split(",") if b.strip()]
+        report["embedding_backends"] = bench_embedding_backends(
+            names, texts, [preprocess(jd["text"]) for jd in jds],
+            args.embed_batch_size or EMBED_BATCH_SIZE,
+            EMBED_THREADS if args.embed_threads is None else args.embed_threads,
+            args.drift_tolerance)
+    report["memory"] = {
+        "peak_rss_kb": peak_rss_kb(),
+        "after_stages_kb": after_stages,
+        "children_peak_rss_kb": peak_rss_kb(resource.RUSAGE_CHILDREN),
+    }
+
+    print_report(report)
+    regressions = []
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        corpus_keys = ("resumes", "jds", "kinds", "seed", "feedback_backend")
+        if any(baseline.get("meta", {}).get(k) != report["meta"][k] for k in corpus_keys):
+            print("\nwarning: the baseline was run on a different corpus / backend; numbers may not be comparable")
+        rows = compare(report, baseline, args.tolerance)
+        print_comparison(rows, args.tolerance)
+        report["comparison"] = rows
+        regressions = [r for r in rows if r["regression"]]
+    for path in filter(None, (out, save_baseline)):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"report written to {path}")
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# keep test embeddings out of the app's on-disk cache (read when app.jd_match is imported)
+os.environ.setdefault("EMBED_CACHE_DIR", tempfile.mkdtemp(prefix="ats-test-embed-cache-"))
@@ -0,0 +1,96 @@
+"""Batch screener outputs: resuming after a crash picks up exactly the complete batches."""
+import csv
+import os
+
+import pytest
+
+from app.cli import CSVOutput, ParquetOutput, SQLiteOutput
+
+
+def rows(item_ids, jd="role", status="ok"):
+    out = []
+    for item_id in item_ids:
+        row = {"item_id": item_id, "jd": jd, "filename": item_id, "status": status}
+        if status == "error":
+            row["error"] = "could not read"
+        else:
+            row["final_score"] = 50.0
+        out.append(row)
+    return out
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def test_csv_resume_drops_partial_row_and_torn_checkpoint(tmp_path):
+    path = str(tmp_path / "run.csv")
+    output = CSVOutput(path)
+    output.write(rows(["a", "b"]))
+    output.write(rows(["c"]))
+    output.close()
+    complete = os.path.getsize(path)
+
+    # crash while writing the third batch: half a row on disk, checkpoint line cut short
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("d,role,d,,o")
+    with open(path + ".checkpoint", "a", encoding="utf-8") as f:
+        f.write('{"offset": 99999, "items": ["d"')
+
+    output = CSVOutput(path)
+    assert output.done() == ({"a", "b", "c"}, {"role"})
+    assert os.path.getsize(path) == complete
+    output.write(rows(["d"]))
+    output.close()
+    assert [r["item_id"] for r in read_csv(path)] == ["a", "b", "c", "d"]
+    assert CSVOutput(path).done() == ({"a", "b", "c", "d"}, {"role"})
+
+
+def test_csv_without_checkpoint_is_refused(tmp_path):
+    path = tmp_path / "run.csv"
+    path.write_text("item_id,jd\na,role\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        CSVOutput(str(path))
+
+
+def test_csv_error_rows_are_retried(tmp_path):
+    path = str(tmp_path / "run.csv")
+    output = CSVOutput(path)
+    output.write(rows(["a"]) + rows(["b"], status="error"))
+    output.close()
+
+    output = CSVOutput(path)
+    assert output.done() == ({"a"}, {"role"})
+    output.write(rows(["b"]))
+    output.close()
+    assert CSVOutput(path).done() == ({"a", "b"}, {"role"})
+
+
+def test_parquet_resume_ignores_leftover_tmp_part(tmp_path):
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "run.parquet")
+    output = ParquetOutput(path)
+    output.write(rows(["a", "b"]))
+    output.write(rows(["c"]) + rows(["e"], status="error"))
+    # crash while writing the third part: only its temporary file exists
+    with open(os.path.join(path, ".part-00002.parquet.tmp"), "wb") as f:
+        f.write(b"PAR1 torn")
+
+    output = ParquetOutput(path)
+    assert output.done() == ({"a", "b", "c"}, {"role"})
+    output.write(rows(["d", "e"]))
+    assert sorted(p for p in os.listdir(path) if p.startswith("part-")) == [
+        "part-00000.parquet", "part-00001.parquet", "part-00002.parquet"]
+    assert ParquetOutput(path).done() == ({"a", "b", "c", "d", "e"}, {"role"})
+
+
+def test_sqlite_error_rows_are_retried(tmp_path):
+    path = str(tmp_path / "run.db")
+    output = SQLiteOutput(path)
+    output.write(rows(["a"]) + rows(["b"], status="error"))
+    assert output.done() == ({"a"}, {"role"})
+    output.write(rows(["b"]))
+    assert output.done() == ({"a", "b"}, {"role"})
+    assert output.conn.execute("SELECT COUNT(*) FROM screening").fetchone()[0] == 2
+    output.close()
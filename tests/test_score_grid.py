@@ -0,0 +1,96 @@
+"""score_grid scores every pair in one matrix pass; it must agree with compute_jd_fit pair by pair."""
+import pytest
+
+from app import keyword_model
+from app.jd_match import compute_jd_fit, prepare_jd, preprocess, rank_resumes, score_grid
+from app.keyword_model import KeywordModel, term_counts
+from app.models import get_embed_model, get_nlp
+
+try:
+    get_nlp()
+    get_embed_model().encode(["warm-up"])
+except Exception as e:  # no spaCy / sentence-transformers model on this machine
+    pytest.skip(f"models unavailable: {e}", allow_module_level=True)
+
+JDS = [
+    "Data Engineer\nRequirements:\n- Python and SQL\n- Spark on AWS\nNice to have:\n- Docker, Kafka",
+    "Frontend developer building dashboards in React and TypeScript. Testing with Jest is a plus.",
+    "Preferred: Kubernetes. Required: Go, PostgreSQL and experience running production services.",
+]
+RESUMES = [
+    {"text": "Data engineer with five years of Python, SQL and Spark pipelines on AWS. Built Kafka consumers.",
+     "skills": ["python", "sql", "spark", "aws", "kafka"]},
+    {"text": "React and TypeScript developer. Designed dashboards and component libraries, tested with Jest.",
+     "skills": ["react", "typescript", "jest"]},
+    {"text": "Backend engineer: Go services on Kubernetes, PostgreSQL tuning, on-call for production systems.",
+     "skills": ["go", "kubernetes", "postgresql"]},
+    {"text": "Retail store manager. Scheduling, inventory and customer service.", "skills": []},
+]
+WEIGHTS = [None, "skills", "experience", "keyword=0.1,semantic=0.2,skills=0.3,experience=0.4"]
+
+
+@pytest.fixture(autouse=True)
+def keywords(monkeypatch):
+    # a small fixed corpus instead of the database-backed model
+    model = KeywordModel()
+    model.add_documents(term_counts(preprocess(t)) for t in JDS + [r["text"] for r in RESUMES])
+    monkeypatch.setattr(keyword_model, "_model", model)
+    return model
+
+
+@pytest.fixture(scope="module")
+def jds():
+    return [prepare_jd(text) for text in JDS]
+
+
+def assert_same_scores(cell: dict, expected: dict):
+    assert cell["final_score"] == pytest.approx(expected["final_score"], abs=0.1)
+    assert cell["breakdown"].keys() == expected["breakdown"].keys()
+    for name, value in expected["breakdown"].items():
+        assert cell["breakdown"][name] == pytest.approx(value, abs=0.1), name
+    assert sorted(cell["experience_matches"]) == sorted(expected["experience_matches"])
+
+
+@pytest.mark.parametrize("weights", WEIGHTS)
+def test_grid_matches_compute_jd_fit(jds, weights):
+    grid = score_grid(jds, RESUMES, weights=weights, semantic_mode="whole")
+    assert grid.shape == (len(JDS), len(RESUMES))
+    for j, (jd_text, jd) in enumerate(zip(JDS, jds)):
+        for i, resume in enumerate(RESUMES):
+            expected = compute_jd_fit(jd_text, resume["text"], resume_skills=resume["skills"],
+                                      jd_features=jd, semantic_mode="whole", weights=weights)
+            assert_same_scores(grid.result(j, i), expected)
+
+
+def test_grid_per_jd_weights(jds):
+    weights = WEIGHTS[1:]
+    grid = score_grid(jds, RESUMES, weights=weights, semantic_mode="whole")
+    for j, jd in enumerate(jds):
+        for i, resume in enumerate(RESUMES):
+            expected = compute_jd_fit(JDS[j], resume["text"], resume_skills=resume["skills"],
+                                      jd_features=jd, semantic_mode="whole", weights=weights[j])
+            assert_same_scores(grid.result(j, i), expected)
+
+
+def test_grid_chunked_matches_compute_jd_fit(jds):
+    grid = score_grid(jds, RESUMES, semantic_mode="chunked")
+    for j, jd in enumerate(jds):
+        for i, resume in enumerate(RESUMES):
+            expected = compute_jd_fit(JDS[j], resume["text"], resume_skills=resume["skills"],
+                                      jd_features=jd, semantic_mode="chunked")
+            cell = grid.result(j, i)
+            assert_same_scores(cell, expected)
+            assert cell["section_similarity"] == pytest.approx(expected["section_similarity"], abs=1e-6)
+
+
+@pytest.mark.parametrize("weights", [None, "semantic"])
+def test_rank_resumes_orders_by_compute_jd_fit(jds, weights):
+    ranked = rank_resumes(None, RESUMES, jd_features=jds[0], semantic_mode="whole", weights=weights)
+    assert [r["rank"] for r in ranked] == list(range(1, len(RESUMES) + 1))
+    for r in ranked:
+        resume = RESUMES[r["index"]]
+        expected = compute_jd_fit(JDS[0], resume["text"], resume_skills=resume["skills"],
+                                  jd_features=jds[0], semantic_mode="whole", weights=weights)
+        assert_same_scores(r, expected)
+    scores = [r["final_score"] for r in ranked]
+    assert scores == sorted(scores, reverse=True)
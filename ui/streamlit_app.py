@@ -1,10 +1,17 @@
 # ui/streamlit_app.py
+import json
+import time
 import streamlit as st
 import requests
-from pathlib import Path
 
-API_URL = "http://127.0.0.1:8000/upload"
-DB_PATH = Path("resume_results.db")
+API_BASE = "http://127.0.0.1:8000"
+API_URL = f"{API_BASE}/upload"
+STREAM_URL = f"{API_BASE}/upload/stream"
+HISTORY_PAGE_SIZE = 200
+REQUEST_TIMEOUT = 120       # seconds for a blocking /upload call
+JOB_POLL_SECONDS = 1.0
+JOB_MAX_WAIT_SECONDS = 600
+JOB_STAGES = ["extraction", "jd_match", "suggestions", "ai_feedback"]
 
 # --- Page config and minimal styling ---
 st.set_page_config(page_title="Fluentorr ATS Coach", layout="wide")
@@ -35,7 +42,11 @@ with col1:
     st.markdown("Upload your resume and paste the role's Job Description (JD). You'll get an ATS score, targeted suggestions, and a short AI-generated coach note.")
 with col2:
     st.write("")  # keep alignment
-    if DB_PATH.exists():
+    try:
+        has_history = bool(requests.get(f"{API_BASE}/results", params={"limit": 1}, timeout=5).json().get("items"))
+    except (requests.exceptions.RequestException, ValueError):
+        has_history = False
+    if has_history:
         st.success("History available")
     else:
         st.info("No saved history yet")
@@ -45,16 +56,37 @@ st.markdown("---")
 # --- Sidebar options ---
 st.sidebar.header("Options")
 save_to_db = st.sidebar.checkbox("Save report to local DB (opt-in)", value=False)
+use_jobs = st.sidebar.checkbox("Run as background job (poll for progress)", value=False,
+                               help="Submit to /jobs and poll instead of holding one long request open.")
+use_stream = st.sidebar.checkbox("Show results as they are ready", value=True, disabled=use_jobs,
+                                 help="Stream /upload/stream: scores first, then the AI note as it is written.")
 st.sidebar.markdown("**Quick actions**")
 if st.sidebar.button("View Analysis History"):
-    if DB_PATH.exists():
-        import sqlite3, pandas as pd
-        conn = sqlite3.connect(DB_PATH)
-        df = pd.read_sql_query("SELECT id, timestamp, filename, ats_score FROM results ORDER BY id DESC LIMIT 200", conn)
-        conn.close()
+    try:
+        page = requests.get(f"{API_BASE}/results", params={"limit": HISTORY_PAGE_SIZE}, timeout=10)
+        page.raise_for_status()
+        items = page.json()["items"]
+        histogram = requests.get(f"{API_BASE}/analytics/histogram", timeout=10).json()
+        missing = requests.get(f"{API_BASE}/analytics/skills", params={"kind": "missing", "limit": 10},
+                               timeout=10).json()
+    except requests.exceptions.RequestException as e:
+        items = None
+        st.error(f"Could not load history from the API: {e}")
+    if items:
+        import pandas as pd
         st.subheader("📊 Recent saved reports")
-        st.dataframe(df)
-    else:
+        st.dataframe(pd.DataFrame(items, columns=["id", "timestamp", "filename", "ats_score"]))
+        h1, h2 = st.columns(2)
+        with h1:
+            st.markdown("**Score distribution**")
+            st.bar_chart(pd.DataFrame(
+                {"reports": [b["count"] for b in histogram["buckets"]]},
+                index=[f"{b['from']}-{b['to']}" for b in histogram["buckets"]],
+            ))
+        with h2:
+            st.markdown("**Most often missing skills**")
+            st.dataframe(pd.DataFrame(missing["skills"], columns=["skill", "count", "share"]))
+    elif items is not None:
         st.info("No history found. Enable save & run an analysis.")
 
 # --- Upload form ---
@@ -63,81 +95,174 @@ with st.form("upload_form", clear_on_submit=False):
     jd_text = st.text_area("Paste Job Description (JD) — the role you want to target", height=160)
     submitted = st.form_submit_button("Upload & Analyze")
 
+def run_as_job(files, data):
+    """Submit to /jobs and poll until done; returns the /upload-shaped result or None."""
+    resp = requests.post(f"{API_BASE}/jobs", files=files, data=data, timeout=REQUEST_TIMEOUT)
+    if resp.status_code != 202:
+        st.error(f"Server error: {resp.status_code}")
+        return None
+    job_id = resp.json()["job_id"]
+    progress = st.progress(0)
+    status_line = st.empty()
+    deadline = time.time() + JOB_MAX_WAIT_SECONDS
+    while time.time() < deadline:
+        job = requests.get(f"{API_BASE}/jobs/{job_id}", timeout=REQUEST_TIMEOUT).json()
+        done_stages = [s for s in JOB_STAGES if s in job.get("stages", {})]
+        progress.progress(int(100 * len(done_stages) / len(JOB_STAGES)))
+        if job["status"] == "queued":
+            status_line.info(f"Queued (position {job.get('queue_position', '?')})")
+        else:
+            status_line.info(f"{job['status'].capitalize()} — completed: {', '.join(done_stages) or 'none yet'}")
+        if job["status"] == "done":
+            progress.progress(100)
+            status_line.empty()
+            return job["result"]
+        if job["status"] == "failed":
+            status_line.empty()
+            st.error(f"Analysis failed: {job.get('error')}")
+            return None
+        time.sleep(JOB_POLL_SECONDS)
+    st.warning(f"Job {job_id} is still running; check back later.")
+    return None
+
+# --- Result renderers (each fills one slot, so streamed events can replace what is shown) ---
+def render_scores(slot, jd_match):
+    with slot.container():
+        st.markdown("**🎯 Overall ATS Fit**")
+        if jd_match:
+            overall = jd_match["final_score"]
+            st.markdown(f"<div class='big-score'>{overall} / 100</div>", unsafe_allow_html=True)
+            # small visual progress bar
+            st.progress(int(min(max(overall, 0), 100)))
+            st.markdown("<div class='small muted'>Overall fit: weighted combination of keywords, semantic fit, skills, experience.</div>", unsafe_allow_html=True)
+            # show JD semantic quickly if present
+            breakdown = jd_match.get("breakdown", {})
+            sem = breakdown.get("semantic_similarity", None)
+            kw = breakdown.get("keyword_overlap", None)
+            if sem is not None or kw is not None:
+                st.write("")
+                c1, c2 = st.columns(2)
+                if kw is not None:
+                    c1.metric("Keyword overlap", f"{kw} / 100")
+                if sem is not None:
+                    c2.metric("Semantic similarity", f"{sem} / 100")
+        else:
+            st.markdown("<div class='big-score'>—</div>", unsafe_allow_html=True)
+            st.info("No JD provided — paste a Job Description to get a fit score.")
+
+def render_suggestions(slot, sugg):
+    with slot.container():
+        st.markdown("**💡 Top Suggestions (quick view)**")
+        if sugg:
+            skills_sugg = sugg.get("skill_suggestions", {})
+            missing = skills_sugg.get("missing_skills", [])
+            matched = skills_sugg.get("matched_skills", [])
+            nice = skills_sugg.get("missing_nice_to_have", [])
+
+            # concise chips
+            if missing:
+                st.markdown("**Missing skills:**")
+                st.markdown(", ".join([f"`{s}`" for s in missing[:8]]))
+            else:
+                st.success("All major JD skills covered 🎯")
+
+            st.markdown("**Matched skills:**")
+            st.markdown(", ".join([f"`{s}`" for s in matched[:8]]))
+
+            if nice:
+                st.markdown("**Nice to have:**")
+                st.markdown(", ".join([f"`{s}`" for s in nice[:8]]))
+
+            # Expand for tips
+            with st.expander("View improvement tips"):
+                for tip in sugg.get("text_suggestions", []):
+                    st.markdown(f"- {tip}")
+        else:
+            st.info("No suggestions available. Provide a JD to get tailored suggestions.")
+
+def render_feedback(slot, text, writing=False):
+    if not text:
+        slot.empty()
+        return
+    with slot.container():
+        st.markdown("<div class='card'>", unsafe_allow_html=True)
+        st.subheader("🧠 AI Resume Summary")
+        st.markdown(text + (" ▌" if writing else ""))
+        st.markdown("</div>", unsafe_allow_html=True)
+
+def run_streamed(files, data, slots):
+    """POST /upload/stream and render each event as it arrives; returns the /upload-shaped result or None."""
+    status_line = st.empty()
+    status_line.info("Extracting text...")
+    feedback = ""
+    with requests.post(STREAM_URL, files=files, data=data, stream=True, timeout=REQUEST_TIMEOUT) as resp:
+        if resp.status_code != 200:
+            status_line.empty()
+            st.error(f"Server error: {resp.status_code}")
+            return None
+        for line in resp.iter_lines():
+            if not line:
+                continue
+            message = json.loads(line)
+            event, payload = message["event"], message["data"]
+            if event == "extraction":
+                status_line.info("Scoring against the JD...")
+            elif event == "jd_match":
+                render_scores(slots["scores"], payload)
+            elif event == "suggestions":
+                render_suggestions(slots["suggestions"], payload)
+                status_line.info("Writing the AI note...")
+            elif event == "ai_feedback.delta":
+                feedback += payload["text"]
+                render_feedback(slots["feedback"], feedback, writing=True)
+            elif event == "ai_feedback":
+                render_feedback(slots["feedback"], payload)
+            elif event == "error":
+                status_line.empty()
+                st.error(f"Analysis failed: {payload.get('detail')}")
+                return None
+            elif event == "result":
+                status_line.empty()
+                return payload
+    status_line.empty()
+    st.error("The analysis stream ended early.")
+    return None
+
 # --- Main panel: show summary first, then details ---
 if submitted and uploaded:
     files = {"file": (uploaded.name, uploaded.getvalue(), uploaded.type)}
     data = {"jd": jd_text or ""}
-    with st.spinner("Analyzing your resume..."):
-        resp = requests.post(API_URL, files=files, data=data)
 
-    if resp.status_code != 200:
-        st.error(f"Server error: {resp.status_code}")
-    else:
-        out = resp.json()
+    # Top summary card with scores and suggestions, then the AI feedback card (Gemini)
+    with st.container():
+        st.markdown("<div class='card'>", unsafe_allow_html=True)
+        top_col1, top_col2 = st.columns([2, 3])
+        slots = {"scores": top_col1.empty(), "suggestions": top_col2.empty()}
+        st.markdown("</div>", unsafe_allow_html=True)
+    slots["feedback"] = st.empty()
 
-        # Top summary card with scores and suggestions
-        with st.container():
-            st.markdown("<div class='card'>", unsafe_allow_html=True)
-            top_col1, top_col2 = st.columns([2, 3])
-
-            # Left: Scores
-            with top_col1:
-                st.markdown("**🎯 Overall ATS Fit**")
-                if out.get("jd_match"):
-                    overall = out["jd_match"]["final_score"]
-                    st.markdown(f"<div class='big-score'>{overall} / 100</div>", unsafe_allow_html=True)
-                    # small visual progress bar
-                    st.progress(int(min(max(overall, 0), 100)))
-                    st.markdown("<div class='small muted'>Overall fit: weighted combination of keywords, semantic fit, skills, experience.</div>", unsafe_allow_html=True)
-                    # show JD semantic quickly if present
-                    breakdown = out["jd_match"].get("breakdown", {})
-                    sem = breakdown.get("semantic_similarity", None)
-                    kw = breakdown.get("keyword_overlap", None)
-                    if sem is not None or kw is not None:
-                        st.write("")
-                        c1, c2 = st.columns(2)
-                        if kw is not None:
-                            c1.metric("Keyword overlap", f"{kw} / 100")
-                        if sem is not None:
-                            c2.metric("Semantic similarity", f"{sem} / 100")
-                else:
-                    st.markdown("<div class='big-score'>—</div>", unsafe_allow_html=True)
-                    st.info("No JD provided — paste a Job Description to get a fit score.")
-
-            # Right: Suggestions summary
-            with top_col2:
-                st.markdown("**💡 Top Suggestions (quick view)**")
-                if out.get("suggestions"):
-                    sugg = out["suggestions"]
-                    skills_sugg = sugg.get("skill_suggestions", {})
-                    missing = skills_sugg.get("missing_skills", [])
-                    matched = skills_sugg.get("matched_skills", [])
+    out = None
+    try:
+        if use_jobs:
+            out = run_as_job(files, data)
+        elif use_stream:
+            out = run_streamed(files, data, slots)
+        else:
+            with st.spinner("Analyzing your resume..."):
+                resp = requests.post(API_URL, files=files, data=data, timeout=REQUEST_TIMEOUT)
+            if resp.status_code != 200:
+                st.error(f"Server error: {resp.status_code}")
+            else:
+                out = resp.json()
+    except requests.Timeout:
+        st.error(f"The server did not answer within {REQUEST_TIMEOUT}s. Try the background job option.")
+    except requests.ConnectionError:
+        st.error(f"Could not reach the API at {API_BASE}.")
 
-                    # concise chips
-                    if missing:
-                        st.markdown("**Missing skills:**")
-                        st.markdown(", ".join([f"`{s}`" for s in missing[:8]]))
-                    else:
-                        st.success("All major JD skills covered 🎯")
-
-                    st.markdown("**Matched skills:**")
-                    st.markdown(", ".join([f"`{s}`" for s in matched[:8]]))
-
-                    # Expand for tips
-                    with st.expander("View improvement tips"):
-                        for tip in sugg.get("text_suggestions", []):
-                            st.markdown(f"- {tip}")
-                else:
-                    st.info("No suggestions available. Provide a JD to get tailored suggestions.")
-
-            st.markdown("</div>", unsafe_allow_html=True)
-
-        # AI Feedback card (Gemini)
-        if out.get("ai_feedback"):
-            st.markdown("<div class='card'>", unsafe_allow_html=True)
-            st.subheader("🧠 AI Resume Summary")
-            st.markdown(out["ai_feedback"])
-            st.markdown("</div>", unsafe_allow_html=True)
+    if out is not None:
+        render_scores(slots["scores"], out.get("jd_match"))
+        render_suggestions(slots["suggestions"], out.get("suggestions"))
+        render_feedback(slots["feedback"], out.get("ai_feedback"))
 
         # Option: show parsed details (hidden by default, for debugging)
         with st.expander("🔎 Internal parsed outputs (hidden) — show only for debugging"):